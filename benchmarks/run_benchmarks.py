@@ -0,0 +1,261 @@
+"""
+Micro and macro benchmarks of the engine hot paths.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--output FILE] [--filter SUBSTRING] [--min-time SECONDS]
+                                        [--repeat N] [--compare BASELINE_FILE]
+
+Every benchmark case is timed over --repeat runs of as many calls as fit in --min-time seconds, and
+the results (seconds per call) are written to a JSON file together with the commit they were measured
+on, so that the numbers of two commits can be compared with --compare.
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from pypokerengine.api.emulator import Emulator
+from pypokerengine.engine.card import Card
+from pypokerengine.engine.hand_evaluator import HandEvaluator
+from pypokerengine.engine.poker_constants import PokerConstants as Const
+from pypokerengine.engine.round_manager import RoundManager
+from pypokerengine.engine.table import Table
+from pypokerengine.utils.card_utils import gen_cards, estimate_hole_card_win_rate
+from pypokerengine.utils.game_state_utils import deepcopy_game_state, restore_game_state
+from pypokerengine.utils.rng_utils import make_rng
+from examples.players.random_player import RandomPlayer
+from examples.players.mcts_player import MCTSPlayer, nyu_heuristic_function
+from examples.players.rollout_executor import TruncatedRollout
+
+MASTER_SEED = 0
+INITIAL_STACK = 200
+SMALL_BLIND = 5
+DEFAULT_OUTPUT = 'benchmark_results.json'
+
+BENCHMARKS = []
+
+
+def benchmark(name, params=None):
+    """
+    Registers the decorated function as a benchmark. The function is called once per parameter dict
+    (outside of the timed section) and returns the function of no argument whose calls are timed.
+    """
+    def register(setup):
+        for case_params in (params or [{}]):
+            BENCHMARKS.append((name, case_params, setup))
+        return setup
+    return register
+
+
+def setup_round(nb_player, rng):
+    """
+    Given the number of players and a random number generator, return an emulator on which seeded
+    RandomPlayers are registered, the game state at the start of the first round and its events.
+    """
+    emulator = Emulator(rng=rng)
+    emulator.set_game_rule(nb_player, 10, SMALL_BLIND, 0)
+    players_info = {}
+    for i in range(nb_player):
+        uuid = "uuid-%d" % i
+        players_info[uuid] = { "name": "p%d" % i, "stack": INITIAL_STACK }
+        emulator.register_player(uuid, RandomPlayer(rng=rng))
+    game_state = emulator.generate_initial_game_state(players_info)
+    game_state, events = emulator.start_new_round(game_state)
+    return emulator, game_state, events
+
+
+@benchmark('hand_evaluator.eval_hand')
+def bench_eval_hand(rng):
+    cards = [Card.from_id(card_id) for card_id in rng.sample(range(1, 53), 7)]
+    hole, community = cards[:2], cards[2:]
+    return lambda: HandEvaluator.eval_hand(hole, community)
+
+
+@benchmark('card.from_id_to_id')
+def bench_card_id_conversion(rng):
+    return lambda: [Card.from_id(card_id).to_id() for card_id in range(1, 53)]
+
+
+@benchmark('card.from_str_to_str')
+def bench_card_str_conversion(rng):
+    card_strs = [str(Card.from_id(card_id)) for card_id in range(1, 53)]
+    return lambda: [str(Card.from_str(card_str)) for card_str in card_strs]
+
+
+@benchmark('table.serialize_deserialize', [{ "nb_player": 2 }, { "nb_player": 9 }])
+def bench_table_serialization(rng, nb_player):
+    table = setup_round(nb_player, rng)[1]["table"]
+    return lambda: Table.deserialize(table.serialize())
+
+
+@benchmark('game_state_utils.deepcopy_game_state', [{ "nb_player": 2 }, { "nb_player": 9 }])
+def bench_deepcopy_game_state(rng, nb_player):
+    game_state = setup_round(nb_player, rng)[1]
+    return lambda: deepcopy_game_state(game_state)
+
+
+@benchmark('game_state_utils.restore_game_state', [{ "nb_player": 2 }, { "nb_player": 9 }])
+def bench_restore_game_state(rng, nb_player):
+    round_state = setup_round(nb_player, rng)[2][-1]["round_state"]
+    return lambda: restore_game_state(round_state)
+
+
+@benchmark('round_manager.apply_action', [{ "nb_player": 2 }, { "nb_player": 9 }])
+def bench_apply_action(rng, nb_player):
+    game_state = setup_round(nb_player, rng)[1]
+    return lambda: RoundManager.apply_action(game_state, 'call', 2 * SMALL_BLIND)
+
+
+@benchmark('round_manager.apply_action_inplace', [{ "nb_player": 2 }, { "nb_player": 9 }])
+def bench_apply_action_inplace(rng, nb_player):
+    game_state = setup_round(nb_player, rng)[1]
+    return lambda: RoundManager.undo_action(game_state,
+                                            RoundManager.apply_action_inplace(game_state, 'call', 2 * SMALL_BLIND))
+
+
+@benchmark('emulator.run_until_round_finish', [{ "nb_player": 2 }, { "nb_player": 6 }, { "nb_player": 9 }])
+def bench_run_until_round_finish(rng, nb_player):
+    emulator, game_state, _events = setup_round(nb_player, rng)
+    return lambda: emulator.run_until_round_finish(game_state)
+
+
+@benchmark('card_utils.estimate_hole_card_win_rate', [{ "nb_player": 2 }, { "nb_player": 6 }])
+def bench_estimate_hole_card_win_rate(rng, nb_player):
+    hole_card = gen_cards(["SA", "HK"])
+    return lambda: estimate_hole_card_win_rate(100, nb_player, hole_card, rng=rng)
+
+
+@benchmark('mcts_player.declare_action', [
+    { "nb_player": 2, "playouts": 10 }, { "nb_player": 2, "playouts": 100 },
+    { "nb_player": 6, "playouts": 10 }, { "nb_player": 6, "playouts": 100 }])
+def bench_mcts_decision(rng, nb_player, playouts, truncated_rollout=None):
+    _emulator, game_state, events = setup_round(nb_player, rng)
+    ask_event = events[-1]
+    round_state = ask_event["round_state"]
+    uuid = ask_event["uuid"]
+    player = MCTSPlayer(playouts, nyu_heuristic_function, seed=rng.randrange(2**63), truncated_rollout=truncated_rollout)
+    player.set_uuid(uuid)
+    player.set_opponents_model(RandomPlayer(rng=rng))
+    game_info = {
+        "player_num": nb_player,
+        "rule": { "max_round": 10, "small_blind_amount": SMALL_BLIND, "ante": 0 },
+        "seats": round_state["seats"]
+    }
+    player.receive_game_start_message(game_info)
+    player.receive_round_start_message(1, None, round_state["seats"])
+    hole_card = [str(card) for card in
+                 [p for p in game_state["table"].seats.players if p.uuid == uuid][0].hole_card]
+    return lambda: player.declare_action(ask_event["valid_actions"], hole_card, round_state)
+
+
+@benchmark('mcts_player.declare_action_truncated', [
+    { "nb_player": 2, "playouts": 100, "stop_street": Const.Street.RIVER },
+    { "nb_player": 6, "playouts": 100, "stop_street": Const.Street.RIVER },
+    { "nb_player": 6, "playouts": 100, "stop_street": Const.Street.TURN }])
+def bench_truncated_mcts_decision(rng, nb_player, playouts, stop_street):
+    return bench_mcts_decision(rng, nb_player, playouts, TruncatedRollout(stop_street))
+
+
+def time_case(func, min_time, repeat):
+    """
+    Given the function to time, the minimum duration of a run and the number of runs, return the number
+    of calls per run and the seconds per call of every run.
+    """
+    number = 1
+    while True:
+        started_at = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started_at
+        if elapsed >= min_time:
+            break
+        number = number * 10 if elapsed < min_time / 10 else int(number * min_time / elapsed) + 1
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        started_at = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started_at) / number)
+    return number, timings
+
+
+def run_benchmarks(name_filter=None, min_time=0.2, repeat=5):
+    results = []
+    for name, params, setup in BENCHMARKS:
+        if name_filter and name_filter not in name:
+            continue
+        rng = make_rng(MASTER_SEED, name, sorted(params.items()))
+        random.seed(MASTER_SEED)
+        number, timings = time_case(setup(rng, **params), min_time, repeat)
+        result = {
+            "name": name,
+            "params": params,
+            "number": number,
+            "repeat": repeat,
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "mean": statistics.mean(timings),
+            "stdev": statistics.stdev(timings) if repeat > 1 else 0.0
+        }
+        print("%-45s %-30s %12.3f us/call" % (name, format_params(params), result["median"] * 1e6))
+        results.append(result)
+    return results
+
+
+def format_params(params):
+    return ",".join(["%s=%s" % item for item in sorted(params.items())])
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=parentdir,
+                                       stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_results):
+    """
+    Given the results of this run and the results of a baseline run, print the ratio of the median time
+    per call of every case measured in both runs (below 1.0 means this run is faster).
+    """
+    baseline = dict(((r["name"], format_params(r["params"])), r) for r in baseline_results)
+    for result in results:
+        key = (result["name"], format_params(result["params"]))
+        if key in baseline:
+            print("%-45s %-30s %8.3fx" % (key[0], key[1], result["median"] / baseline[key]["median"]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--filter', default=None)
+    parser.add_argument('--min-time', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--compare', default=None)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filter, args.min_time, args.repeat)
+    report = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results
+    }
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(results, json.load(baseline_file)["results"])
@@ -1,6 +1,6 @@
-import json, re
-from os import listdir, mkdir
-from os.path import join, exists
+from os import mkdir, listdir
+from os.path import exists, join
+from concurrent.futures import ProcessPoolExecutor
 import os
 import inspect
 import csv
@@ -10,14 +10,14 @@ parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir) 
 from result_params import HEURISTICS, OPPONENT_ALGORITHMS, NUM_ROUNDS, \
     NUM_OTHER_PLAYERS, NUM_PLAYOUTS
+from data_parsing.result_store import PARAMETERS, LEGACY_FILE_NAME_PATTERN, ResultStore, legacy_records
+from data_parsing.running_stats import RunningStats
 
 INITIAL_STACK = 200
 BOT_NAME = 'Stonks'
 
-DECODER_DATA_IND = 0
-DECODER_SEEK_IND = 1
-
 GAMEPLAY_DATA_FILE_PATH = './gameplay_data'
+RESULT_STORE_FILE_NAME = 'results.ndjson'
 CSV_FILE_PATH = GAMEPLAY_DATA_FILE_PATH + '/CSVs/'
 
 
@@ -27,81 +27,102 @@ def get_average_profit(file_name, bot_name, initial_stack):
     the initial stack the bot started out with in each game, return the average
     profit of that bot.
     """
-    gameplay_data_file = open(file_name, 'r')
-    game_results = gameplay_data_file.read()
-    gameplay_data_file.close()
+    table = profit_table_of_records(legacy_records(file_name), bot_name, initial_stack)
+    return list(table.values())[0].mean
+
+
+def profit_table_of_records(records, bot_name, initial_stack):
+    """
+    Given game records, the name of our bot, and the initial stack the bot started out
+    with in each game, return the statistics of the bot's profit by parameter combination
+    (a tuple of the values of PARAMETERS).
+    """
+    table = {}
+    for record in records:
+        combination = tuple([record[name] for name in PARAMETERS])
+        table.setdefault(combination, RunningStats()).add(record["stacks"][bot_name] - initial_stack)
+    return table
 
 
-    results = game_results.split('}')
-    results = results[: len(results) - 1]
-    result_dicts = []
-    for result in results:
-        result += '}'
-        result_dicts.append(json.loads(result))
-    final_stacks = 0
-    num_results = len(result_dicts)
-    for dict in result_dicts:
-        final_stacks += dict[bot_name]
+def _profit_table_of_file(args):
+    file_path, byte_range, bot_name, initial_stack = args
+    if byte_range is None:
+        records = legacy_records(file_path)
+    else:
+        records = ResultStore(file_path).records_between(*byte_range)
+    return profit_table_of_records(records, bot_name, initial_stack)
+
+
+def build_profit_table(results_dir, store_file_name, bot_name, initial_stack, max_workers=None):
+    """
+    Given the directory holding the results, the name of the result store in it, the name
+    of our bot, and its initial stack, parse the store (split in one byte range per worker)
+    and every legacy result file in the directory once, in parallel, and return the
+    statistics of the bot's profit by parameter combination.
+    """
+    max_workers = max_workers or os.cpu_count()
+    store = ResultStore(join(results_dir, store_file_name))
+    tasks = [(store.file_path, byte_range, bot_name, initial_stack) for byte_range in store.byte_ranges(max_workers)]
+    for file_name in sorted(listdir(results_dir)):
+        if LEGACY_FILE_NAME_PATTERN.match(file_name):
+            tasks.append((join(results_dir, file_name), None, bot_name, initial_stack))
 
-    return (final_stacks / num_results) - initial_stack
+    profit_table = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for table in pool.map(_profit_table_of_file, tasks):
+            for combination, stats in table.items():
+                profit_table.setdefault(combination, RunningStats()).merge(stats)
+    return profit_table
 
 
-# Result File Name Format: <heuristic_function>_<other-player-algo>_<num-rounds>_<num-other-players>_<num-playouts>
-def write_avg_profit_data_to_CSV(bot_name, initial_stack, csv_file_name, heuristic_function='[a-zA-Z]+', opponent_algo='[a-zA-Z]+', round_count='[0-9]+',
-    other_player_count='[0-9]+', playouts_count='[0-9]+'):
+def write_avg_profit_data_to_CSV(profit_table, csv_file_name, heuristic_function=None, opponent_algo=None, round_count=None,
+    other_player_count=None, playouts_count=None):
     """
-    Given the name of a bot, the bot's initial stack, and the CSV file name to write to, 
-    gather average profit data based on specified regex patterns for metrics that apply
-    to previously generated JSON game results.
+    Given the profit statistics by parameter combination and the CSV file name to write to,
+    write the average profit, its variance and the number of games of every parameter
+    combination matching the specified metrics (None matches any value).
     """
     if not exists(CSV_FILE_PATH):
         mkdir(CSV_FILE_PATH)
 
-    # Get all files matching criteria
-    # Get average profit
-    # Write All profit computations to CSV
+    metrics = [heuristic_function, opponent_algo, round_count, other_player_count, playouts_count]
     csv_file = open(CSV_FILE_PATH + csv_file_name, 'w', newline='')
     writer = csv.writer(csv_file)
-    
-    file_name_pattern = r'{0}_{1}_{2}-rounds_{3}-others_{4}-playouts.json'.format(heuristic_function, opponent_algo, 
-        round_count, other_player_count, playouts_count)
-    
-    for file_name in listdir(GAMEPLAY_DATA_FILE_PATH):
-        should_get_data = bool(re.match(file_name_pattern, file_name))
-        if should_get_data:
-            file_path = join(GAMEPLAY_DATA_FILE_PATH, file_name)
-            avg_profit = get_average_profit(file_path, bot_name, initial_stack)
-            writer.writerow([avg_profit])
-    
+    writer.writerow(['average_profit', 'variance', 'count'])
+    for combination in sorted(profit_table):
+        if all([value is None or value == actual for value, actual in zip(metrics, combination)]):
+            stats = profit_table[combination]
+            writer.writerow([stats.mean, stats.variance(), stats.count])
     csv_file.close()
 
-def number_of_rounds():
+def number_of_rounds(profit_table):
     for heuristic in HEURISTICS:
         for opp_algorithm in OPPONENT_ALGORITHMS:
             for rounds in NUM_ROUNDS:
-                write_avg_profit_data_to_CSV(BOT_NAME, INITIAL_STACK, '{0}_{1}_average_profit_{2}_rounds.csv'.format(heuristic.__name__, opp_algorithm.__name__, rounds), 
+                write_avg_profit_data_to_CSV(profit_table, '{0}_{1}_average_profit_{2}_rounds.csv'.format(heuristic.__name__, opp_algorithm.__name__, rounds), 
                     heuristic_function=heuristic.__name__, opponent_algo=opp_algorithm.__name__, round_count=rounds, other_player_count=3, playouts_count=10000)
 
-def number_of_other_players():
+def number_of_other_players(profit_table):
     for heuristic in HEURISTICS:
         for opp_algorithm in OPPONENT_ALGORITHMS:
             for others in NUM_OTHER_PLAYERS:
-                write_avg_profit_data_to_CSV(BOT_NAME, INITIAL_STACK, '{0}_{1}_average_profit_{2}_others.csv'.format(heuristic.__name__, opp_algorithm.__name__, others), 
+                write_avg_profit_data_to_CSV(profit_table, '{0}_{1}_average_profit_{2}_others.csv'.format(heuristic.__name__, opp_algorithm.__name__, others), 
                     heuristic_function=heuristic.__name__, opponent_algo=opp_algorithm.__name__, round_count=10, other_player_count=others, playouts_count=10000)
 
-def number_of_playouts():
+def number_of_playouts(profit_table):
     for heuristic in HEURISTICS:
         for opp_algorithm in OPPONENT_ALGORITHMS:
             for playouts in NUM_PLAYOUTS:
-                write_avg_profit_data_to_CSV(BOT_NAME, INITIAL_STACK, '{0}_{1}_average_profit_{2}_playouts.csv'.format(heuristic.__name__, opp_algorithm.__name__, playouts), 
+                write_avg_profit_data_to_CSV(profit_table, '{0}_{1}_average_profit_{2}_playouts.csv'.format(heuristic.__name__, opp_algorithm.__name__, playouts), 
                     heuristic_function=heuristic.__name__, opponent_algo=opp_algorithm.__name__, round_count=10, other_player_count=3, playouts_count=playouts)
             
 
 if __name__ == "__main__":
-    number_of_rounds()
-    number_of_playouts()
-    number_of_other_players()
+    profit_table = build_profit_table(GAMEPLAY_DATA_FILE_PATH, RESULT_STORE_FILE_NAME, BOT_NAME, INITIAL_STACK)
+    number_of_rounds(profit_table)
+    number_of_playouts(profit_table)
+    number_of_other_players(profit_table)
     for heuristic in HEURISTICS:
         for opp_algo in OPPONENT_ALGORITHMS:
-            write_avg_profit_data_to_CSV(BOT_NAME, INITIAL_STACK, '{0}_{1}_average_profit_all_metrics.csv'.format(heuristic.__name__, opp_algo.__name__), 
-            heuristic_function=heuristic.__name__, opponent_algo=opp_algo.__name__)
\ No newline at end of file
+            write_avg_profit_data_to_CSV(profit_table, '{0}_{1}_average_profit_all_metrics.csv'.format(heuristic.__name__, opp_algo.__name__), 
+            heuristic_function=heuristic.__name__, opponent_algo=opp_algo.__name__)
@@ -0,0 +1,140 @@
+import json
+import math
+import os
+import re
+from os import listdir
+from os.path import join, exists
+
+DECODER_DATA_IND = 0
+DECODER_SEEK_IND = 1
+
+PARAMETERS = ['heuristic', 'opponent', 'rounds', 'others', 'playouts']
+# Legacy Result File Name Format: <heuristic_function>_<other-player-algo>_<num-rounds>-rounds_<num-other-players>-others_<num-playouts>-playouts.json
+LEGACY_FILE_NAME_PATTERN = re.compile(r'^([a-zA-Z_]+?)_([a-zA-Z]+)_([0-9]+)-rounds_([0-9]+)-others_([0-9]+)-playouts\.json$')
+
+
+class ResultStore(object):
+    """
+    Newline-delimited JSON file holding one record per game played: the game parameters (see PARAMETERS),
+    the seed the game was played with, its duration in seconds and the final stack of every player.
+    Every record is appended with a single write on a file opened in append mode, so records appended
+    concurrently by several processes never interleave.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def append(self, record):
+        line = (json.dumps(record, sort_keys=True) + '\n').encode('utf-8')
+        fd = os.open(self.file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def records(self, **params):
+        """
+        Given parameter values, yield every stored record whose parameters are equal to them.
+        A truncated last line (left by a crashed writer) is skipped.
+        """
+        return self.records_between(0, None, **params)
+
+    def records_between(self, start, end, **params):
+        """
+        Given byte offsets and parameter values, yield the records like records() but only those whose line
+        starts at or after start and before end (None reads to the end of the store), so that the ranges of
+        byte_ranges can be read independently.
+        """
+        if not exists(self.file_path):
+            return
+        with open(self.file_path, 'rb') as store_file:
+            if start > 0:
+                # the line holding the previous byte belongs to the previous range, unless it ends there
+                store_file.seek(start - 1)
+                store_file.readline()
+            while end is None or store_file.tell() < end:
+                line = store_file.readline()
+                if not line:
+                    return
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    continue
+                if matches(record, params):
+                    yield record
+
+    def byte_ranges(self, nb_range):
+        """
+        Given a number of ranges, return at most that many (start, end) byte offsets splitting the store in
+        contiguous ranges of about the same size.
+        """
+        size = os.path.getsize(self.file_path) if exists(self.file_path) else 0
+        range_size = max(1, int(math.ceil(1.0 * size / nb_range)))
+        return [(start, min(start + range_size, size)) for start in range(0, size, range_size)]
+
+
+def game_record(heuristic, opponent, rounds, others, playouts, seed, duration, stacks):
+    """
+    Given the parameters of a game, its seed, its duration and the final stack of every player (by name),
+    return the record of the game.
+    """
+    return {
+        "heuristic": heuristic,
+        "opponent": opponent,
+        "rounds": rounds,
+        "others": others,
+        "playouts": playouts,
+        "seed": seed,
+        "duration": duration,
+        "stacks": stacks
+    }
+
+
+def matches(record, params):
+    return all([record.get(name) == value for name, value in params.items()])
+
+
+def decode_concatenated_json(text):
+    """
+    Given a text made of JSON objects written one after the other with no separator, return the objects.
+    """
+    decoder = json.JSONDecoder()
+    objects = []
+    index = 0
+    while True:
+        while index < len(text) and text[index].isspace():
+            index += 1
+        if index == len(text):
+            return objects
+        decoded = decoder.raw_decode(text, index)
+        objects.append(decoded[DECODER_DATA_IND])
+        index = decoded[DECODER_SEEK_IND]
+
+
+def legacy_records(file_path):
+    """
+    Given the path of a legacy result file (one file per parameter combination, holding the concatenated
+    stacks of its games), return its games as records. Their seed and duration were not saved, so both
+    are None.
+    """
+    match = LEGACY_FILE_NAME_PATTERN.match(os.path.basename(file_path))
+    if match is None:
+        raise ValueError("[ %s ] is not a legacy result file name" % file_path)
+    heuristic, opponent, rounds, others, playouts = match.groups()
+    with open(file_path, 'r') as result_file:
+        stacks_list = decode_concatenated_json(result_file.read())
+    return [game_record(heuristic, opponent, int(rounds), int(others), int(playouts), None, None, stacks)
+            for stacks in stacks_list]
+
+
+def load_records(results_dir, store_file_name, **params):
+    """
+    Given the directory holding the results, the name of the result store in it and parameter values,
+    return the records of the store and of the legacy result files in the directory whose parameters
+    are equal to them.
+    """
+    records = list(ResultStore(join(results_dir, store_file_name)).records(**params))
+    for file_name in sorted(listdir(results_dir)):
+        if LEGACY_FILE_NAME_PATTERN.match(file_name):
+            records += [record for record in legacy_records(join(results_dir, file_name)) if matches(record, params)]
+    return records
@@ -0,0 +1,41 @@
+import math
+
+
+class RunningStats(object):
+    """
+    Count, mean and variance of a stream of samples, updated one sample at a time (Welford's algorithm)
+    without keeping the samples. Two partial statistics can be merged, so a stream can be split between
+    workers.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, sample):
+        self.count += 1
+        delta = sample - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (sample - self.mean)
+
+    def merge(self, other):
+        """
+        Adds the samples summarized by the other statistics to these ones.
+        """
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    def variance(self):
+        """
+        Returns the unbiased sample variance (0 with less than two samples).
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def standard_error(self):
+        return math.sqrt(self.variance() / self.count) if self.count > 0 else math.inf
@@ -1,15 +1,53 @@
+import math
+import random
+
 from pypokerengine.players import BasePokerPlayer
 from pypokerengine.api.emulator import Emulator
-from pypokerengine.utils.card_utils import gen_cards
-from pypokerengine.utils.game_state_utils import restore_game_state, attach_hole_card, attach_hole_card_from_deck
+from pypokerengine.utils.rng_utils import derive_seed, make_rng
+from .rollout_executor import SerialRolloutExecutor, determinize_game_state
 
 NB_SIMULATION = 1000
+MIN_SIMULATION = 50
+CONFIDENCE_Z = 3.0
 DEBUG_MODE = False
 def log(msg):
     if DEBUG_MODE: print("[debug_info] --> %s" % msg)
 
 class EmulatorPlayer(BasePokerPlayer):
 
+    subscribed_message_types = ["game_start_message", "round_result_message"]
+
+    def __init__(self, nb_simulation=NB_SIMULATION, confidence_z=CONFIDENCE_Z, min_simulation=MIN_SIMULATION,
+                 executor=None, seed=None, truncated_rollout=None):
+        """
+        Every candidate action is evaluated on the same sampled determinizations (deck order and opponents'
+        hole cards), so the actions are compared pairwise on each sample. Sampling stops after nb_simulation
+        determinizations, or earlier (checked every min_simulation samples) once the paired z-score of the
+        best action against every other action reaches confidence_z. Pass confidence_z=None to always run
+        all nb_simulation determinizations.
+
+        Rollouts are handed in batches to the executor (see rollout_executor; serial by default). Every
+        determinization is generated from its own seed derived from the master seed, so the results do not
+        depend on how the batches are spread over the executor's workers. Determinizations made outside
+        of the executor (see _setup_game_state) are drawn from a stream derived from the master seed too.
+
+        Rollouts are played to the end of the round unless truncated_rollout (a TruncatedRollout) is given.
+
+        The executor is started by every game and shut down once the player sees the last round of the
+        game (the last round, or the one after which the player or all of its opponents are out of chips).
+        Games can also end because the players left are short of the blinds, without the player being
+        told: start_poker closes its players at the end of the game, and callers driving a Dealer
+        themselves have to call close() once the game is over.
+        """
+        self.nb_simulation = nb_simulation
+        self.confidence_z = confidence_z
+        self.min_simulation = min_simulation
+        self.executor = SerialRolloutExecutor() if executor is None else executor
+        self.truncated_rollout = truncated_rollout
+        self.seed = random.randrange(2**63) if seed is None else seed
+        self.decision_count = 0
+        self.rng = make_rng(self.seed, "determinization")
+
     def set_opponents_model(self, model_player):
         self.opponents_model = model_player
 
@@ -18,6 +56,7 @@ class EmulatorPlayer(BasePokerPlayer):
         self.my_model = MyModel()
         nb_player = game_info['player_num']
         max_round = game_info['rule']['max_round']
+        self.max_round = max_round
         sb_amount = game_info['rule']['small_blind_amount']
         ante_amount = game_info['rule']['ante']
 
@@ -27,39 +66,57 @@ class EmulatorPlayer(BasePokerPlayer):
             uuid = player_info['uuid']
             player_model = self.my_model if uuid == self.uuid else self.opponents_model
             self.emulator.register_player(uuid, player_model)
+        self.executor.start((self.uuid, game_info, MyModel(), self.opponents_model, self.truncated_rollout), self.seed)
 
     def declare_action(self, valid_actions, hole_card, round_state):
         try_actions = [MyModel.FOLD, MyModel.CALL, MyModel.MIN_RAISE, MyModel.MAX_RAISE]
-        action_results = [0 for i in range(len(try_actions))]
+        simulation_results = [[] for _ in try_actions]
+        decision_seed = derive_seed(self.seed, self.decision_count)
+        self.decision_count += 1
 
         log("hole_card of emulator player is %s" % hole_card)
+        nb_done = 0
+        while nb_done < self.nb_simulation:
+            # common random numbers: every action is played out against the same determinizations
+            nb_batch = min(self.min_simulation, self.nb_simulation - nb_done)
+            seeds = [derive_seed(decision_seed, i) for i in range(nb_done, nb_done + nb_batch)]
+            batches = [(round_state, hole_card, try_actions, chunk) for chunk in split_seeds(seeds, self.executor.max_workers)]
+            for batch_results in self.executor.map(batches):
+                for action, results in enumerate(batch_results):
+                    simulation_results[action] += results
+            nb_done += nb_batch
+            if self._is_decided(simulation_results):
+                break
+
+        action_results = [1.0 * sum(results) / len(results) for results in simulation_results]
         for action in try_actions:
-            self.my_model.set_action(action)
-            simulation_results = []
-            for i in range(NB_SIMULATION):
-                game_state = self._setup_game_state(round_state, hole_card)
-                round_finished_state, _events = self.emulator.run_until_round_finish(game_state)
-                my_stack = [player for player in round_finished_state['table'].seats.players if player.uuid == self.uuid][0].stack
-                simulation_results.append(my_stack)
-            action_results[action] = 1.0 * sum(simulation_results) / NB_SIMULATION
-            log("average stack after simulation when declares %s : %s" % (
-                {0:'FOLD', 1:'CALL', 2:'MIN_RAISE', 3:'MAX_RAISE'}[action], action_results[action])
+            log("average stack after %d simulations when declares %s : %s" % (
+                len(simulation_results[action]), {0:'FOLD', 1:'CALL', 2:'MIN_RAISE', 3:'MAX_RAISE'}[action], action_results[action])
                 )
 
         best_action = max(zip(action_results, try_actions))[1]
         self.my_model.set_action(best_action)
         return self.my_model.declare_action(valid_actions, hole_card, round_state)
 
+    def _is_decided(self, simulation_results):
+        """
+        Given the results of every action on the same determinizations, return True if the best action
+        beats every other action by at least confidence_z standard errors of the paired differences.
+        """
+        if self.confidence_z is None:
+            return False
+        averages = [1.0 * sum(results) / len(results) for results in simulation_results]
+        best = averages.index(max(averages))
+        for action, results in enumerate(simulation_results):
+            if action == best:
+                continue
+            diffs = [b - r for b, r in zip(simulation_results[best], results)]
+            if paired_z_score(diffs) < self.confidence_z:
+                return False
+        return True
+
     def _setup_game_state(self, round_state, my_hole_card):
-        game_state = restore_game_state(round_state)
-        game_state['table'].deck.shuffle()
-        player_uuids = [player_info['uuid'] for player_info in round_state['seats']]
-        for uuid in player_uuids:
-            if uuid == self.uuid:
-                game_state = attach_hole_card(game_state, uuid, gen_cards(my_hole_card))  # attach my holecard
-            else:
-                game_state = attach_hole_card_from_deck(game_state, uuid)  # attach opponents holecard at random
-        return game_state
+        return determinize_game_state(round_state, self.uuid, my_hole_card, self.rng)
 
     def receive_round_start_message(self, round_count, hole_card, seats):
         pass
@@ -71,7 +128,35 @@ class EmulatorPlayer(BasePokerPlayer):
         pass
 
     def receive_round_result_message(self, winners, hand_info, round_state):
-        pass
+        stacks = dict((seat['uuid'], seat['stack']) for seat in round_state['seats'])
+        players_left = len([stack for stack in stacks.values() if stack > 0])
+        if round_state['round_count'] == self.max_round or stacks[self.uuid] == 0 or players_left < 2:
+            self.close()
+
+    def close(self):
+        """
+        Shuts the rollout executor (and its worker processes or threads) down until the next game starts.
+        """
+        self.executor.shutdown()
+
+def split_seeds(seeds, nb_chunk):
+    """
+    Split the seeds into at most nb_chunk contiguous, non-empty chunks of about the same size.
+    """
+    chunk_size = int(math.ceil(1.0 * len(seeds) / nb_chunk))
+    return [seeds[i:i + chunk_size] for i in range(0, len(seeds), chunk_size)]
+
+def paired_z_score(diffs):
+    """
+    Given the paired differences between two actions' results, return the mean difference divided by its
+    standard error. Identical results (all differences zero) count as decided, since either action is fine.
+    """
+    n = len(diffs)
+    mean = 1.0 * sum(diffs) / n
+    variance = sum([(d - mean) ** 2 for d in diffs]) / (n - 1) if n > 1 else 0
+    if variance == 0:
+        return math.inf if mean >= 0 else -math.inf
+    return mean / math.sqrt(variance / n)
 
 class MyModel(BasePokerPlayer):
 
@@ -5,13 +5,19 @@ NB_SIMULATION = 1000
 
 class HonestPlayer(BasePokerPlayer):
 
+    subscribed_message_types = ["game_start_message"]
+
+    def __init__(self, rng=None):
+        self.rng = rng
+
     def declare_action(self, valid_actions, hole_card, round_state):
         community_card = round_state['community_card']
         win_rate = estimate_hole_card_win_rate(
                 nb_simulation=NB_SIMULATION,
                 nb_player=self.nb_player,
                 hole_card=gen_cards(hole_card),
-                community_card=gen_cards(community_card)
+                community_card=gen_cards(community_card),
+                rng=self.rng
                 )
         if win_rate >= 1.0 / self.nb_player:
             action = valid_actions[1]  # fetch CALL action info
@@ -1,11 +1,16 @@
+import functools
+import inspect
 import random
 from pypokerengine.api import game
-from pypokerengine.api.emulator import Emulator
+from pypokerengine.api.emulator import Emulator, EventLevel
 from pypokerengine.engine.card import Card
 from pypokerengine.players import BasePokerPlayer
-from .emulator_player import EmulatorPlayer, MyModel
+from .emulator_player import EmulatorPlayer, MyModel, log
+from .search_stats import SearchStats
+from pypokerengine.utils.rng_utils import make_rng
 from pypokerengine.engine.poker_constants import PokerConstants as Const
 from pypokerengine.engine.hand_evaluator import HandEvaluator
+from pypokerengine.engine.action_checker import ActionChecker
 import math
 
 ACTIONS = [MyModel.FOLD, MyModel.CALL, MyModel.MIN_RAISE, MyModel.MAX_RAISE]
@@ -101,46 +106,102 @@ def custom_heuristic(hole_card, round_state):
         return MCTSPlayerModel.FOLD
 
 
-def random_action(hole_card, round_state):
-    return random.choice(ACTIONS)
+def random_action(hole_card, round_state, rng=None):
+    return (rng or random).choice(ACTIONS)
+
+
+def bind_rng(heuristic, rng):
+    """
+    Given a heuristic and a random number generator, return the heuristic drawing from rng if it takes an
+    rng argument (e.g. random_action), or the heuristic itself otherwise.
+    """
+    if 'rng' not in inspect.signature(heuristic).parameters:
+        return heuristic
+    return functools.partial(heuristic, rng=rng)
 
 
 class MCTSPlayer(EmulatorPlayer):
 
-    def __init__(self, number_of_playouts, heuristic_func):
-        super().__init__()
+    subscribed_message_types = ["game_start_message", "round_start_message"]
+
+    def __init__(self, number_of_playouts, heuristic_func, determinize_per_playout=False, action_abstraction=None,
+                 progressive_widening=None, stats_callback=None, seed=None, truncated_rollout=None,
+                 selection_policy=None):
+        """
+        When determinize_per_playout is True the player runs information-set MCTS: the opponents' hole
+        cards and the deck order are resampled on every playout, while a single tree over the public
+        action sequence is shared by all of those samples.
+
+        action_abstraction (an ActionAbstraction) decides which bets the root decision and the trees
+        branch on, and progressive_widening (a ProgressiveWidening) how fast they are added to the trees;
+        by default every node branches on FOLD, CALL, MIN_RAISE and MAX_RAISE at once. One tree is searched
+        per root action and the (action, amount) of the best one is declared.
+
+        If stats_callback is given, every decision is instrumented and the callback is called with one
+        structured record per decision (see SearchStats.to_record and search_stats.JsonLinesWriter).
+
+        seed seeds the determinizations of the player (see EmulatorPlayer), and the heuristics which
+        take an rng argument (e.g. random_action) draw from a stream derived from it.
+
+        If truncated_rollout (a TruncatedRollout) is given, playouts stop early and the position they
+        reach is scored by its equity instead of being played out to the end of the round.
+
+        Children are selected by UCB1 unless selection_policy (e.g. a PUCTSelection) is given.
+        """
+        super().__init__(seed=seed, truncated_rollout=truncated_rollout)
         self.number_of_playouts = number_of_playouts
         self.heuristic_func = heuristic_func
+        self.heuristic_rng = make_rng(self.seed, "heuristic")
+        self.determinize_per_playout = determinize_per_playout
+        self.action_abstraction = action_abstraction
+        self.progressive_widening = progressive_widening
+        self.stats_callback = stats_callback
+        self.selection_policy = selection_policy
 
     def declare_action(self, valid_actions, hole_card, round_state):
         # The below code is running the MCTS algorithm.
-        actions_and_results = {action: 0 for action in ACTIONS}
-        for action in actions_and_results:
-            self.my_model.set_action(action)
+        stats = SearchStats() if self.stats_callback is not None else None
+        action_abstraction = self.action_abstraction if self.action_abstraction is not None else ActionAbstraction()
+        root_actions = action_abstraction.abstract_actions(valid_actions, self._setup_game_state(round_state, hole_card))
+        actions_and_results = {}
+        for my_action in root_actions:
             emulator_game_state = self._setup_game_state(round_state, hole_card)
-            next_game_state, events = self.emulator.apply_action(emulator_game_state,
-                                                            *self.my_model.declare_action(valid_actions, hole_card,
-                                                                                          round_state))
+            next_game_state, events = self.emulator.apply_action(emulator_game_state, *my_action)
             new_args = None
             if not is_terminal_state(next_game_state, self.uuid):
                 new_args = [events[-1]["valid_actions"], hole_card, events[-1]["round_state"]]
             mcts_root = MCTSNode(self.emulator, next_game_state, self.uuid, hole_card, self.out_stack,
-                                 simulation_model=self.player_model, declare_action_args=new_args)
-
-            for _ in range(self.number_of_playouts):
-                leaf_node = mcts_root.select_leaf()
-                leaf_node.simulate_playout()
-            
-            actions_and_results[action] = mcts_root.get_node_value()
-        print(actions_and_results)
-        best_action = max(actions_and_results, key=actions_and_results.get)
-        self.my_model.set_action(best_action)
-        return self.my_model.declare_action(valid_actions, hole_card, round_state)
+                                 simulation_model=self.player_model, declare_action_args=new_args,
+                                 action_abstraction=self.action_abstraction,
+                                 progressive_widening=self.progressive_widening, stats=stats,
+                                 truncated_rollout=self.truncated_rollout, selection_policy=self.selection_policy)
+
+            if self.determinize_per_playout:
+                mcts_root.simulate_determinized_playout(next_game_state)
+                for _ in range(self.number_of_playouts - 1):
+                    determinized_state = self._setup_game_state(round_state, hole_card)
+                    determinized_state, _ = self.emulator.apply_action(determinized_state, *my_action, event_level=EventLevel.NONE)
+                    mcts_root.simulate_determinized_playout(determinized_state)
+            else:
+                for _ in range(self.number_of_playouts):
+                    leaf_node = mcts_root.select_leaf()
+                    leaf_node.simulate_playout()
+
+            actions_and_results[my_action] = mcts_root.get_node_value()
+            if stats is not None:
+                stats.add_root(list(my_action), mcts_root)
+        log("MCTS values of root actions : %s" % actions_and_results)
+        best_action = max(root_actions, key=actions_and_results.get)
+        if stats is not None:
+            self.stats_callback(stats.to_record(uuid=self.uuid, round_count=round_state['round_count'],
+                                                street=round_state['street'], best_action=list(best_action)))
+        return best_action
 
     def receive_game_start_message(self, game_info):
         self.my_model = MCTSPlayerModel(self.uuid)
         nb_player = game_info['player_num']
         max_round = game_info['rule']['max_round']
+        self.max_round = max_round
         sb_amount = game_info['rule']['small_blind_amount']
         ante_amount = game_info['rule']['ante']
 
@@ -150,7 +211,7 @@ class MCTSPlayer(EmulatorPlayer):
             uuid = player_info['uuid']
             player_model = MCTSPlayerModel(self.uuid) if uuid == self.uuid else self.opponents_model
             if uuid == self.uuid:
-                player_model.set_heuristic(self.heuristic_func)
+                player_model.set_heuristic(bind_rng(self.heuristic_func, self.heuristic_rng))
                 self.player_model = player_model
             self.emulator.register_player(uuid, player_model)
 
@@ -160,9 +221,143 @@ class MCTSPlayer(EmulatorPlayer):
         self.out_stack = [player for player in seats if player['uuid'] == self.uuid][0]['stack']
 
 
+class ActionAbstraction(object):
+    """
+    Maps the valid actions of a game state onto the concrete (action, amount) pairs that a MCTSNode
+    branches on. Candidates are corrected the same way the engine corrects them and duplicates are
+    dropped, so no two children of a node lead to the same game state. Folding is also dropped when
+    checking is free, since it can never be better than checking.
+    """
+
+    def __init__(self, actions=None):
+        self.actions = ACTIONS if actions is None else actions
+        self.model = MyModel()
+
+    def abstract_actions(self, valid_actions, game_state):
+        """
+        Given the valid actions and the game state of the player who acts next, return the de-duplicated
+        list of (action, amount) pairs to branch on, in the order they should be tried.
+        """
+        players = game_state["table"].seats.players
+        player_pos = game_state["next_player"]
+        sb_amount = game_state["small_blind_amount"]
+        is_check_free = players[player_pos].paid_sum() == valid_actions[1]['amount']
+        abstract_actions = []
+        for action, amount in self.candidate_actions(valid_actions, game_state):
+            action, amount = ActionChecker.correct_action(players, player_pos, sb_amount, action, amount)
+            if action == 'fold' and is_check_free:
+                continue
+            if (action, amount) not in abstract_actions:
+                abstract_actions.append((action, amount))
+        return abstract_actions
+
+    def candidate_actions(self, valid_actions, game_state):
+        """
+        Return the (action, amount) pairs this abstraction considers, before correction and de-duplication.
+        """
+        candidates = []
+        for action in self.actions:
+            self.model.set_action(action)
+            candidates.append(self.model.declare_action(valid_actions, None, None))
+        return candidates
+
+
+class PotFractionAbstraction(ActionAbstraction):
+    """
+    ActionAbstraction that adds raises sized as fractions of the current pot (clamped to the legal raise
+    range) between the minimum and the maximum raise.
+    """
+
+    def __init__(self, pot_fractions=(0.5, 1.0, 2.0)):
+        super().__init__()
+        self.pot_fractions = pot_fractions
+
+    def candidate_actions(self, valid_actions, game_state):
+        fold, call, min_raise, max_raise = super().candidate_actions(valid_actions, game_state)
+        raise_range = valid_actions[2]['amount']
+        if raise_range['min'] == -1:
+            return [fold, call, min_raise, max_raise]
+
+        pot = sum([player.pay_info.amount for player in game_state["table"].seats.players])
+        pot_raises = []
+        for fraction in self.pot_fractions:
+            amount = valid_actions[1]['amount'] + int(fraction * pot)
+            amount = min(max(amount, raise_range['min']), raise_range['max'])
+            pot_raises.append((valid_actions[2]['action'], amount))
+        return [fold, call, min_raise] + sorted(pot_raises, key=lambda a: a[1]) + [max_raise]
+
+
+class ProgressiveWidening(object):
+    """
+    Limits the number of children of a MCTSNode to ceil(constant * num_playouts ** exponent), so that
+    further actions of the abstraction are only added as the node is visited more often.
+    """
+
+    def __init__(self, constant=1.0, exponent=0.5):
+        self.constant = constant
+        self.exponent = exponent
+
+    def max_children(self, num_playouts):
+        return max(1, int(math.ceil(self.constant * num_playouts ** self.exponent)))
+
+
+class PUCTSelection(object):
+    """
+    PUCT selection (as in AlphaZero) in place of UCB1: a child is scored by its value relative to the
+    initial stack plus constant * prior * sqrt(parent playouts) / (1 + child playouts), its prior being
+    given by prior (e.g. a HeuristicPrior). Children which were not played out yet, and the actions
+    which are not expanded yet, are valued at their parent's value, so an action is only expanded once
+    its prior makes it look better than the children already searched.
+    """
+
+    def __init__(self, prior, constant=1.0):
+        self.prior = prior
+        self.constant = constant
+
+    def action_priors(self, node, actions):
+        return self.prior.action_priors(node, actions)
+
+    def score(self, parent, value, prior, num_playouts):
+        exploitation_value = 1.0 * value / parent.initial_stack
+        exploration_value = self.constant * prior * math.sqrt(parent.num_playouts) / (1 + num_playouts)
+        return exploitation_value + exploration_value
+
+
+class HeuristicPrior(object):
+    """
+    Prior probabilities of the children of a MCTSNode derived from a heuristic such as nyu_heuristic_function
+    or custom_heuristic. On our agent's decisions the action the heuristic picks (as MCTSPlayerModel plays
+    it) gets weight on top of an even share of the rest, while the opponents' actions are all equally likely.
+    """
+
+    def __init__(self, heuristic, weight=0.5):
+        self.heuristic = heuristic
+        self.weight = weight
+        self.model = MCTSPlayerModel(None)
+
+    def action_priors(self, node, actions):
+        """
+        Given a node and the (action, amount) pairs it branches on, return their prior probabilities.
+        """
+        priors = [1.0 / len(actions) for _ in actions]
+        if node.declare_action_args is None or not node.is_decision_node():
+            return priors
+        valid_actions, hole_card, round_state = node.declare_action_args
+        self.model.set_action(self.heuristic(hole_card, round_state))
+        action, amount = self.model.declare_action(valid_actions, hole_card, round_state)
+        players = node.game_state["table"].seats.players
+        action, amount = ActionChecker.correct_action(players, node.game_state["next_player"],
+                                                      node.game_state["small_blind_amount"], action, amount)
+        # the heuristic's action may have been merged into (or dropped from) the abstraction: take the closest
+        preferred = min(range(len(actions)), key=lambda i: (actions[i][0] != action, abs(actions[i][1] - amount)))
+        return [(1 - self.weight) * prior + (self.weight if i == preferred else 0) for i, prior in enumerate(priors)]
+
+
 class MCTSNode:
 
-    def __init__(self, emulator, current_game_state, uuid, hole_card, initial_stack, simulation_model=None, declare_action_args=None, parent=None):
+    def __init__(self, emulator, current_game_state, uuid, hole_card, initial_stack, simulation_model=None, declare_action_args=None,
+                 parent=None, action=None, action_abstraction=None, progressive_widening=None, stats=None,
+                 truncated_rollout=None, selection_policy=None, prior=1.0):
         self.emulator = emulator
         self.game_state = current_game_state
         self.uuid = uuid
@@ -171,49 +366,120 @@ class MCTSNode:
             self.simulation_model = MCTSPlayerModel(uuid)
         else:
             self.simulation_model = simulation_model
-        self.expansion_model = MyModel()
+        if action_abstraction is None:
+            self.action_abstraction = ActionAbstraction()
+        else:
+            self.action_abstraction = action_abstraction
+        self.progressive_widening = progressive_widening
+        self.stats = stats
+        self.truncated_rollout = truncated_rollout
+        self.selection_policy = selection_policy
+        self.prior = prior
         self.declare_action_args = declare_action_args
         self.parent = parent
+        self.action = action
         self.initial_stack = initial_stack
         self.children = []
+        self.untried_actions = []
+        self.untried_priors = []
         self.num_playouts = 0
         self.propagated_state_value = 0
 
-    def generate_children(self):
+    def generate_children(self, game_state=None):
+        """
+        Based on the actions available based on the current state of the game, record the actions this
+        node can branch on as unexpanded placeholders in self.untried_actions, then create and return the
+        child for the first one. The other children are only created when selection first reaches them.
+        If a game state is given (a fresh determinization of this node's information set), the children
+        are generated from it instead of self.game_state. Under PUCT selection the actions are ordered by
+        decreasing prior, which is kept in self.untried_priors.
+
+        SIDE EFFECT: Mutates self.children, self.untried_actions and self.untried_priors.
+        """
+        if game_state is None:
+            game_state = self.game_state
+        if self.stats is not None:
+            self.stats.start(SearchStats.EXPANSION)
+        valid_actions = self.emulator.generate_possible_actions(game_state)
+        self.untried_actions = self.action_abstraction.abstract_actions(valid_actions, game_state)
+        if self.selection_policy is not None:
+            priors = self.selection_policy.action_priors(self, self.untried_actions)
+            ranked = sorted(zip(priors, self.untried_actions), key=lambda prior_action: -prior_action[0])
+            self.untried_priors = [prior for prior, _action in ranked]
+            self.untried_actions = [action for _prior, action in ranked]
+        child = self._add_next_child(game_state)
+        if self.stats is not None:
+            self.stats.stop()
+        return child
+
+    def _can_add_child(self):
         """
-        Based on the actions available based on the current state of the game, generate child nodes to
-        this node and append them to self.children.
+        Returns True if this node still has an unexpanded action, the progressive widening limit allows
+        another child and, under PUCT selection, the next action scores better than every child.
+        """
+        if len(self.untried_actions) == 0:
+            return False
+        if self.progressive_widening is not None and\
+                len(self.children) >= self.progressive_widening.max_children(self.num_playouts):
+            return False
+        if self.selection_policy is not None and len(self.children) != 0:
+            untried_value = self.selection_policy.score(self, self.get_node_value(), self.untried_priors[0], 0)
+            return untried_value > max([child.selection_policy_value() for child in self.children])
+        return True
 
-        SIDE EFFECT: Mutates self.children. 
+    def _add_next_child(self, game_state=None):
         """
-        for a in ACTIONS:
-            self.expansion_model.set_action(a)
-            real_action, amount = self.expansion_model.declare_action(*self.declare_action_args)
-            # print(real_action, amount)
-            new_state, events = self.emulator.apply_action(self.game_state, real_action, bet_amount=amount)
-            if is_terminal_state(new_state, self.uuid):
-                # print("GENERATED TERMINAL STATE")
-                self.children.append(MCTSNode(self.emulator, new_state, self.uuid, self.hole_card, self.initial_stack,
-                                              simulation_model=self.simulation_model, parent=self))
-            else:
-                new_args = [events[-1]["valid_actions"], self.hole_card, events[-1]["round_state"]]
-                self.children.append(MCTSNode(self.emulator, new_state, self.uuid, self.hole_card, self.initial_stack,
-                                              simulation_model=self.simulation_model, declare_action_args=new_args,
-                                              parent=self))
-            
+        Creates the child for the next unexpanded action from the given game state (self.game_state by
+        default), appends it to self.children and returns it.
+
+        SIDE EFFECT: Mutates self.children, self.untried_actions and self.untried_priors.
+        """
+        if game_state is None:
+            game_state = self.game_state
+        if self.stats is not None:
+            self.stats.start(SearchStats.EXPANSION)
+        action = self.untried_actions.pop(0)
+        prior = self.untried_priors.pop(0) if len(self.untried_priors) != 0 else 1.0
+        new_state, events = self.emulator.apply_action(game_state, *action)
+        new_args = None
+        if not is_terminal_state(new_state, self.uuid):
+            new_args = [events[-1]["valid_actions"], self.hole_card, events[-1]["round_state"]]
+        child = MCTSNode(self.emulator, new_state, self.uuid, self.hole_card, self.initial_stack,
+                         simulation_model=self.simulation_model, declare_action_args=new_args,
+                         parent=self, action=action, action_abstraction=self.action_abstraction,
+                         progressive_widening=self.progressive_widening, stats=self.stats,
+                         truncated_rollout=self.truncated_rollout, selection_policy=self.selection_policy,
+                         prior=prior)
+        self.children.append(child)
+        if self.stats is not None:
+            self.stats.stop()
+        return child
+
+    def apply_to(self, game_state):
+        """
+        Applies the action that leads from this node's parent to this node onto the given game state and
+        returns the resulting state. Used to walk a determinized game state down the shared tree.
+        """
+        new_state, _ = self.emulator.apply_action(game_state, *self.action, event_level=EventLevel.NONE)
+        return new_state
+
     def select_leaf(self):
         """
         Select a leaf node based on the number of the node's children (should be zero). Selects the child with the maximum 
         UCB1 value at each child iteration.
         """
+        if self.stats is not None:
+            self.stats.start(SearchStats.SELECTION)
         leaf = self
         while len(leaf.children) != 0:
-            leaf = leaf._get_max_child()
+            leaf = leaf._add_next_child() if leaf._can_add_child() else leaf._get_max_child()
+        if self.stats is not None:
+            self.stats.stop()
         return leaf
 
     def _get_max_child(self):
         """
-        Given the children of a MCTSNode, return the node with the highest UCB1 value.
+        Given the children of a MCTSNode, return the node with the highest UCB1 (or PUCT) value.
         """
         bestNode = None
         bestUCBValue = math.inf * -1
@@ -234,25 +500,87 @@ class MCTSNode:
         if self.num_playouts == 0:
             return self
         else:
-            self.generate_children()
-            return self.children[0]
+            return self.generate_children()
 
     def simulate_playout(self):
         """
         Runs simulated playouts of the round by selecting random actions (for both the agent and its opponents)
         until a terminal state is reached (the simulated round is over).
         """
-        if not is_terminal_state(self.game_state, self.uuid):
+        if is_terminal_state(self.game_state, self.uuid):
+            # a terminal leaf is scored directly; otherwise it would stay unvisited and be selected forever
+            next_node = self
+            state_value = compute_state_value(self.game_state, self.uuid, self.initial_stack)
+        else:
             next_node = self.expand()
-            round_end_state, _ = self.emulator.run_until_round_finish(next_node.game_state)
-            next_node.num_playouts += 1
-            next_node.propagated_state_value = compute_state_value(round_end_state, self.uuid, self.initial_stack)
-            next_node.back_propagation()
+            state_value = self.rollout(next_node.game_state)
+        if self.stats is not None:
+            self.stats.start(SearchStats.BACK_PROPAGATION)
+        next_node.num_playouts += 1
+        next_node.propagated_state_value = state_value
+        next_node.back_propagation()
+        if self.stats is not None:
+            self.stats.stop()
+
+    def simulate_determinized_playout(self, game_state):
+        """
+        Runs one information-set MCTS iteration from this (root) node against the given determinization
+        of the hidden cards. Every node is reached by the same public action sequence under every
+        determinization, so the tree is shared while the hidden cards change from playout to playout.
+        """
+        if self.stats is not None:
+            self.stats.start(SearchStats.SELECTION)
+        node = self
+        while len(node.children) != 0 and not is_terminal_state(game_state, self.uuid):
+            if node._can_add_child():
+                node = node._add_next_child(game_state)
+                game_state = node.game_state
+            else:
+                node = node._get_max_child()
+                game_state = node.apply_to(game_state)
+        if self.stats is not None:
+            self.stats.stop()
+
+        if is_terminal_state(game_state, self.uuid):
+            state_value = compute_state_value(game_state, self.uuid, self.initial_stack)
+        else:
+            if node.num_playouts != 0:
+                node = node.generate_children(game_state)
+                game_state = node.game_state
+            state_value = self.rollout(game_state)
+
+        if self.stats is not None:
+            self.stats.start(SearchStats.BACK_PROPAGATION)
+        node.num_playouts += 1
+        node.propagated_state_value += (state_value - node.propagated_state_value) / node.num_playouts
+        node.back_propagation()
+        if self.stats is not None:
+            self.stats.stop()
+
+    def rollout(self, game_state):
+        """
+        Plays the round of the given game state out (or only until the truncated rollout stops) and
+        returns the value of the position for our agent, relative to its stack at the start of the round.
+        """
+        if self.stats is not None:
+            self.stats.start(SearchStats.ROLLOUT)
+        if self.truncated_rollout is None:
+            round_end_state, _ = self.emulator.run_until_round_finish(game_state, EventLevel.NONE)
+            state_value = compute_state_value(round_end_state, self.uuid, self.initial_stack)
+        else:
+            state_value = self.truncated_rollout.run(self.emulator, game_state, self.uuid) - self.initial_stack
+        if self.stats is not None:
+            self.stats.stop()
+        return state_value
 
     def selection_policy_value(self):
         """
-        Computes and returns the UCB1 selection policy for this node.
+        Computes and returns the UCB1 selection policy for this node (or its PUCT score if a selection
+        policy is set).
         """
+        if self.selection_policy is not None:
+            value = self.get_node_value() if self.num_playouts != 0 else self.parent.get_node_value()
+            return self.selection_policy.score(self.parent, value, self.prior, self.num_playouts)
         if self.num_playouts == 0:
             return math.inf
 
@@ -268,8 +596,10 @@ class MCTSNode:
         Recursively propagates state value information back up the tree. This is called after rollout/playout simulation 
         is completed. Backpropagation ends when we hit the root node.
         """
-        # don't compute these values for terminal state; terminal state has no children so the values would be set to 0
-        if self.is_decision_node():
+        # don't compute these values for leaf nodes; a leaf has no children so its playout value would be set to 0
+        if len(self.children) == 0:
+            pass
+        elif self.is_decision_node():
             child_values = [child.propagated_state_value for child in self.children]
             self.propagated_state_value = max(child_values) if len(child_values) > 0 else self.propagated_state_value
         else:
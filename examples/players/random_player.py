@@ -3,8 +3,11 @@ import random as rand
 
 class RandomPlayer(BasePokerPlayer):
 
-  def __init__(self):
+  subscribed_message_types = []
+
+  def __init__(self, rng=None):
     self.fold_ratio = self.call_ratio = raise_ratio = 1.0/3
+    self.rng = rng
 
   def set_action_ratio(self, fold_ratio, call_ratio, raise_ratio):
     ratio = [fold_ratio, call_ratio, raise_ratio]
@@ -16,11 +19,11 @@ class RandomPlayer(BasePokerPlayer):
     action = choice["action"]
     amount = choice["amount"]
     if action == "raise":
-      amount = rand.randrange(amount["min"], max(amount["min"], amount["max"]) + 1)
+      amount = (self.rng or rand).randrange(amount["min"], max(amount["min"], amount["max"]) + 1)
     return action, amount
 
   def __choice_action(self, valid_actions):
-    r = rand.random()
+    r = (self.rng or rand).random()
     if r <= self.fold_ratio:
       return valid_actions[0]
     elif r <= self.call_ratio:
@@ -0,0 +1,183 @@
+import copy
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from pypokerengine.api.emulator import Emulator, EventLevel
+from pypokerengine.engine.poker_constants import PokerConstants as Const
+from pypokerengine.utils.card_utils import gen_cards
+from pypokerengine.utils.equity_utils import StreetEndEvaluator
+from pypokerengine.utils.rng_utils import derive_seed
+from pypokerengine.utils.game_state_utils import restore_game_state, attach_hole_cards
+
+
+def determinize_game_state(round_state, my_uuid, my_hole_card, rng=random):
+    """
+    Given a round state, the uuid and hole card of the player who owns it and a random number generator,
+    return a game state in which the player holds its hole card and every opponent is dealt random hole
+    cards from the rest of the shuffled deck.
+    """
+    return attach_hole_cards(restore_game_state(round_state), { my_uuid: gen_cards(my_hole_card) }, rng)
+
+
+class TruncatedRollout(object):
+    """
+    Plays a rollout out only until stop_street starts, or until nobody can bet any more (everyone left
+    in the hand but one is all-in), and scores the position reached with evaluator (a StreetEndEvaluator
+    by default) instead of stepping the players' models through the rest of the round. By default the
+    rollout stops on the river, whose complete board is scored without sampling. A rollout which starts
+    on or after stop_street is played until the betting of its street closes, so only positions in which
+    every bet is matched are scored.
+    """
+
+    def __init__(self, stop_street=Const.Street.RIVER, evaluator=None):
+        self.stop_street = stop_street
+        self.evaluator = StreetEndEvaluator() if evaluator is None else evaluator
+
+    def run(self, emulator, game_state, uuid):
+        """
+        Given the emulator to play on, a game state and the uuid of a player, return the stack which
+        the player is expected to end the round with.
+        """
+        game_state = emulator.run_until_street(game_state, self.stop_street)
+        players = game_state['table'].seats.players
+        expected_stacks = self.evaluator.expected_stacks(game_state)
+        return [stack for player, stack in zip(players, expected_stacks) if player.uuid == uuid][0]
+
+
+class RolloutWorker(object):
+    """
+    Holds an Emulator on which the player and its opponents' models are registered once, and plays out
+    batches of rollouts against it. Each worker owns copies of the models, so workers can run concurrently.
+    Opponents' models which draw from an rng attribute (e.g. RandomPlayer) are given the worker's random
+    number generator, which is reseeded from the seed of the determinization before every action is played
+    out, so a rollout only depends on its seed and every action faces the same opponents' draws.
+    Rollouts are played to the end of the round, or truncated by truncated_rollout if it is given.
+    """
+
+    def __init__(self, uuid, game_info, my_model, opponents_model, truncated_rollout=None):
+        self.uuid = uuid
+        self.truncated_rollout = truncated_rollout
+        self.rng = random.Random()
+        self.my_model = copy.deepcopy(my_model)
+        opponents_model = copy.deepcopy(opponents_model)
+        if hasattr(opponents_model, 'rng'):
+            opponents_model.rng = self.rng
+        self.emulator = Emulator()
+        self.emulator.set_game_rule(game_info['player_num'], game_info['rule']['max_round'],
+                                    game_info['rule']['small_blind_amount'], game_info['rule']['ante'])
+        for player_info in game_info['seats']:
+            uuid = player_info['uuid']
+            self.emulator.register_player(uuid, self.my_model if uuid == self.uuid else opponents_model)
+
+    def run(self, round_state, hole_card, actions, seeds):
+        """
+        Plays every action out against the determinization generated from each seed, and returns the
+        final (or expected, when rollouts are truncated) stacks of the player as one list per action, in
+        the order of the seeds.
+        """
+        results = [[] for _ in actions]
+        restored_state = restore_game_state(round_state)
+        my_hole_card = { self.uuid: gen_cards(hole_card) }
+        for seed in seeds:
+            self.rng.seed(seed)
+            game_state = attach_hole_cards(restored_state, my_hole_card, self.rng)
+            rollout_seed = derive_seed(seed, "rollout")
+            for i, action in enumerate(actions):
+                self.rng.seed(rollout_seed)
+                self.my_model.set_action(action)
+                results[i].append(self._play_out(game_state))
+        return results
+
+    def _play_out(self, game_state):
+        if self.truncated_rollout is not None:
+            return self.truncated_rollout.run(self.emulator, game_state, self.uuid)
+        round_finished_state, _events = self.emulator.run_until_round_finish(game_state, EventLevel.NONE)
+        return [player for player in round_finished_state['table'].seats.players if player.uuid == self.uuid][0].stack
+
+
+class SerialRolloutExecutor(object):
+    """
+    Runs rollout batches one after another on a single worker in the calling thread.
+    """
+
+    max_workers = 1
+
+    def start(self, worker_args, master_seed):
+        self.worker = RolloutWorker(*worker_args)
+
+    def map(self, batches):
+        return [self.worker.run(*batch) for batch in batches]
+
+    def shutdown(self):
+        pass
+
+
+class ThreadRolloutExecutor(object):
+    """
+    Runs rollout batches on a thread pool in which every thread holds its own warm worker.
+    Rollouts are CPU-bound, so this mostly helps when the player models release the GIL.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.pool = None
+
+    def start(self, worker_args, master_seed):
+        self.shutdown()
+        self.worker_args = worker_args
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def map(self, batches):
+        return list(self.pool.map(self._run, batches))
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def _run(self, batch):
+        if not hasattr(self.local, 'worker'):
+            self.local.worker = RolloutWorker(*self.worker_args)
+        return self.local.worker.run(*batch)
+
+
+class ProcessRolloutExecutor(object):
+    """
+    Runs rollout batches on a process pool. Every process builds its worker once when it starts, and
+    seeds its global random module from the master seed and the seeds of the batches it runs, so the
+    opponents' models which draw from the global random module are reproducible too.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.pool = None
+
+    def start(self, worker_args, master_seed):
+        self.shutdown()
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_process_worker,
+                                        initargs=(worker_args, master_seed))
+
+    def map(self, batches):
+        return list(self.pool.map(_run_in_process_worker, batches))
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+_process_worker = None
+_process_master_seed = None
+
+def _init_process_worker(worker_args, master_seed):
+    global _process_worker, _process_master_seed
+    _process_worker = RolloutWorker(*worker_args)
+    _process_master_seed = master_seed
+
+def _run_in_process_worker(batch):
+    seeds = batch[3]
+    if len(seeds) != 0:
+        random.seed(derive_seed(_process_master_seed, "worker", seeds[0]))
+    return _process_worker.run(*batch)
@@ -0,0 +1,118 @@
+import json
+import time
+
+
+class SearchStats(object):
+    """
+    Statistics of one MCTSPlayer decision: wall time split between the selection, expansion, rollout and
+    back propagation phases, the size and depth of the search trees and the visit distribution at their
+    roots. Phases may be nested (e.g. a child created lazily during selection); time spent in the inner
+    phase is only counted for the inner phase.
+    """
+
+    SELECTION = "selection"
+    EXPANSION = "expansion"
+    ROLLOUT = "rollout"
+    BACK_PROPAGATION = "backpropagation"
+    PHASES = [SELECTION, EXPANSION, ROLLOUT, BACK_PROPAGATION]
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.phase_seconds = {phase: 0.0 for phase in self.PHASES}
+        self.roots = []
+        self.started_at = clock()
+        self._phase_stack = []
+        self._phase_started_at = None
+
+    def start(self, phase):
+        """
+        Starts timing the given phase, pausing the phase that is currently running (if any).
+        """
+        now = self.clock()
+        if len(self._phase_stack) != 0:
+            self.phase_seconds[self._phase_stack[-1]] += now - self._phase_started_at
+        self._phase_stack.append(phase)
+        self._phase_started_at = now
+
+    def stop(self):
+        """
+        Stops timing the most recently started phase and resumes the phase it interrupted.
+        """
+        now = self.clock()
+        self.phase_seconds[self._phase_stack.pop()] += now - self._phase_started_at
+        self._phase_started_at = now
+
+    def add_root(self, action, root_node):
+        """
+        Registers the search tree that evaluated the given root action.
+        """
+        self.roots.append((action, root_node))
+
+    def to_record(self, **fields):
+        """
+        Returns the statistics collected so far as a JSON serializable dict, extended with the given fields.
+        """
+        elapsed = self.clock() - self.started_at
+        playouts = sum([root.num_playouts for _, root in self.roots])
+        tree_size, tree_depth = 0, 0
+        for _, root in self.roots:
+            size, depth = tree_size_and_depth(root)
+            tree_size += size
+            tree_depth = max(tree_depth, depth)
+
+        record = {
+            "playouts": playouts,
+            "seconds": elapsed,
+            "playouts_per_second": playouts / elapsed if elapsed > 0 else 0.0,
+            "phase_seconds": dict(self.phase_seconds),
+            "tree_size": tree_size,
+            "tree_depth": tree_depth,
+            "root": [root_visit_distribution(action, root) for action, root in self.roots]
+        }
+        record.update(fields)
+        return record
+
+
+class JsonLinesWriter(object):
+    """
+    Stats callback that appends every record it is called with to a JSON lines file.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def __call__(self, record):
+        with open(self.file_path, 'a') as stats_file:
+            stats_file.write(json.dumps(record) + '\n')
+
+
+def tree_size_and_depth(root_node):
+    """
+    Given the root of a search tree, return the number of nodes in the tree and its depth (a tree made
+    of the root alone has depth 0).
+    """
+    size, depth = 0, 0
+    stack = [(root_node, 0)]
+    while len(stack) != 0:
+        node, node_depth = stack.pop()
+        size += 1
+        depth = max(depth, node_depth)
+        stack.extend([(child, node_depth + 1) for child in node.children])
+    return size, depth
+
+
+def root_visit_distribution(action, root_node):
+    """
+    Given a root action and the root of the tree that evaluated it, return the value and visit count of
+    the root and of each of its children.
+    """
+    return {
+        "action": action,
+        "value": root_node.get_node_value(),
+        "playouts": root_node.num_playouts,
+        "children": [{
+            "action": list(child.action),
+            "value": child.get_node_value(),
+            "playouts": child.num_playouts
+        } for child in root_node.children]
+    }
@@ -0,0 +1,243 @@
+import math
+import os
+import traceback
+from statistics import NormalDist
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from data_parsing.running_stats import RunningStats
+
+
+GameJob = namedtuple('GameJob', ['heuristic', 'opponent', 'rounds', 'others', 'playouts', 'game_index'])
+
+
+def cell_name(job):
+    """
+    Given a game job, return the name of the experiment cell it belongs to, which is also the base name of
+    the file the results of the cell are saved to.
+    Cell Name Format: <heuristic_function>_<other-player-algo>_<num-rounds>-rounds_<num-other-players>-others_<num-playouts>-playouts
+    """
+    return "{0}_{1}_{2}-rounds_{3}-others_{4}-playouts".format(
+        job.heuristic.__name__, job.opponent.__name__, job.rounds, job.others, job.playouts)
+
+
+def job_key(job):
+    """
+    Given a game job, return the key identifying it in the checkpoint file.
+    """
+    return "{0}#{1}".format(cell_name(job), job.game_index)
+
+
+def expand_jobs(heuristics, opponents, num_rounds, num_other_players, num_playouts, num_games, rounds_by_opponent=None):
+    """
+    Given the values of every experiment parameter and the number of games to play per cell, return one
+    game job per game of the grid. rounds_by_opponent optionally restricts the numbers of rounds played
+    against the opponents it names (by class name).
+    """
+    rounds_by_opponent = rounds_by_opponent or {}
+    jobs = []
+    for heuristic in heuristics:
+        for opponent in opponents:
+            for rounds in rounds_by_opponent.get(opponent.__name__, num_rounds):
+                for others in num_other_players:
+                    for playouts in num_playouts:
+                        for game_index in range(num_games):
+                            jobs.append(GameJob(heuristic, opponent, rounds, others, playouts, game_index))
+    return jobs
+
+
+def estimate_cost(job, opponent_costs=None):
+    """
+    Given a game job, return an estimate of how long it takes to play: every round asks each player for
+    a few decisions, which cost about num_playouts rollouts for our player and opponent_costs[name]
+    rollouts for an opponent of that class (0 for opponents which do not search).
+    """
+    opponent_cost = (opponent_costs or {}).get(job.opponent.__name__, 0)
+    return job.rounds * (job.others + 1) * (job.playouts + job.others * opponent_cost)
+
+
+class Checkpoint(object):
+    """
+    Keys of the completed jobs, appended to a text file (one key per line, optionally followed by a tab
+    and the value the job produced) as soon as each job completes, so that an interrupted run can be
+    resumed where it stopped.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.values = {}
+        if os.path.exists(file_path):
+            with open(file_path) as checkpoint_file:
+                for line in checkpoint_file:
+                    fields = line.strip().split('\t')
+                    if fields[0]:
+                        self.values[fields[0]] = float(fields[1]) if len(fields) > 1 else None
+
+    def is_completed(self, key):
+        return key in self.values
+
+    def mark_completed(self, key, value=None):
+        with open(self.file_path, 'a') as checkpoint_file:
+            checkpoint_file.write(key + ('\n' if value is None else '\t%r\n' % value))
+        self.values[key] = value
+
+
+def run_jobs(jobs, run_job, checkpoint_path, max_workers=None, opponent_costs=None):
+    """
+    Given game jobs and a picklable function playing one of them, play every job which is not completed
+    yet according to the checkpoint file on a process pool (sized to the number of CPUs by default),
+    longest jobs first so that the pool does not idle on a long tail. A job that raises is reported and
+    left out of the checkpoint, so that it is retried on the next run. Returns the numbers of jobs
+    completed, skipped and failed.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    pending = [job for job in jobs if not checkpoint.is_completed(job_key(job))]
+    pending.sort(key=lambda job: estimate_cost(job, opponent_costs), reverse=True)
+    summary = { "completed": 0, "skipped": len(jobs) - len(pending), "failed": 0 }
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        futures = dict((pool.submit(run_job, job), job) for job in pending)
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                future.result()
+            except Exception:
+                print("job %s failed:\n%s" % (job_key(job), traceback.format_exc()))
+                summary["failed"] += 1
+            else:
+                checkpoint.mark_completed(job_key(job))
+                summary["completed"] += 1
+    return summary
+
+
+def t_quantile(p, dof):
+    """
+    Given a probability and a number of degrees of freedom, return the p-quantile of Student's t
+    distribution, from the normal quantile corrected by its expansion in 1/dof (Abramowitz and Stegun
+    26.7.5, accurate to about 1e-3 from 5 degrees of freedom on).
+    """
+    z = NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / dof + g2 / dof ** 2 + g3 / dof ** 3 + g4 / dof ** 4
+
+
+def confidence_half_width(stats, confidence):
+    """
+    Given the statistics of a cell's games, return the half width of the t confidence interval on their mean.
+    """
+    if stats.count < 2:
+        return math.inf
+    return t_quantile(0.5 + confidence / 2, stats.count - 1) * stats.standard_error()
+
+
+def spent_alpha(count, max_games, alpha):
+    """
+    Given a number of games out of max_games, return the part of alpha that the tests run after the games
+    up to that one may spend in total (the Pocock-type spending function of Lan and DeMets).
+    """
+    return alpha * math.log(1 + (math.e - 1) * min(1.0, count / max_games))
+
+
+def decision_threshold(count, min_games, max_games, alpha):
+    """
+    Given a number of games, return how many standard errors the mean of a cell has to differ from 0 by to
+    be decided after that game. The cell is tested after every game from min_games on, each test spending
+    its share of alpha (see spent_alpha), so by the union bound the cell is wrongly decided with
+    probability at most alpha however long it is played.
+    """
+    previous = spent_alpha(count - 1, max_games, alpha) if count > min_games else 0.0
+    return t_quantile(1 - (spent_alpha(count, max_games, alpha) - previous) / 2, count - 1)
+
+
+def is_cell_decided(stats, target_width, min_games, max_games, confidence, decision_alpha=None):
+    """
+    Given the statistics of the values of a cell's games, return True once the cell needs no more games:
+    it reached max_games, or it has at least min_games and either the t confidence interval on its mean
+    is at most target_width wide, or (if decision_alpha is given) the mean differs from 0 according to the
+    sequential test of decision_threshold. A cell whose games all had the same value is never decided
+    before max_games, as its standard error says nothing about its spread yet.
+
+    The precision rule stops on the observed spread, so the intervals of the stopped cells only have about
+    their nominal coverage; the decision rule is the only one whose error rate holds under this optional
+    stopping.
+    """
+    if stats.count >= max_games:
+        return True
+    if stats.count < max(min_games, 2) or stats.variance() == 0:
+        return False
+    if 2 * confidence_half_width(stats, confidence) <= target_width:
+        return True
+    if decision_alpha is None:
+        return False
+    return abs(stats.mean) >= decision_threshold(stats.count, min_games, max_games, decision_alpha) * stats.standard_error()
+
+
+def run_sequential(cells, run_job, checkpoint_path, target_width, min_games=20, max_games=100, confidence=0.95,
+                   decision_alpha=None, max_workers=None, opponent_costs=None, max_failures=3):
+    """
+    Given one game job per experiment cell and a picklable function playing a job and returning the value
+    measured on it (e.g. our player's profit), keep playing games of every cell until is_cell_decided says
+    it has enough of them. The process pool is always given a game of the cell whose mean is the most
+    uncertain: cells with fewer than min_games games (longest first), then the cells with the largest
+    standard error counting the games in flight. Completed games are checkpointed with their value, so a
+    rerun resumes every cell with its statistics. A cell is abandoned after max_failures failed games.
+    Returns the statistics by cell name.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    stats, next_index, in_flight, failures = {}, {}, {}, {}
+    for cell in cells:
+        name = cell_name(cell)
+        stats[name], next_index[name], in_flight[name], failures[name] = RunningStats(), 0, 0, 0
+        for key, value in checkpoint.values.items():
+            cell_key, game_index = key.rsplit('#', 1)
+            if cell_key == name:
+                if value is not None:
+                    stats[name].add(value)
+                next_index[name] = max(next_index[name], int(game_index) + 1)
+
+    def priority(cell):
+        name = cell_name(cell)
+        planned = stats[name].count + in_flight[name]
+        uncertainty = math.sqrt(stats[name].variance() / planned) if stats[name].count > 1 else math.inf
+        return (planned < min_games, uncertainty, estimate_cost(cell, opponent_costs))
+
+    def next_cell():
+        candidates = [cell for cell in cells
+                      if failures[cell_name(cell)] < max_failures
+                      and stats[cell_name(cell)].count + in_flight[cell_name(cell)] < max_games
+                      and not is_cell_decided(stats[cell_name(cell)], target_width, min_games, max_games,
+                                              confidence, decision_alpha)]
+        return max(candidates, key=priority) if len(candidates) != 0 else None
+
+    max_workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        while True:
+            while len(futures) < max_workers:
+                cell = next_cell()
+                if cell is None:
+                    break
+                name = cell_name(cell)
+                job = cell._replace(game_index=next_index[name])
+                next_index[name] += 1
+                in_flight[name] += 1
+                futures[pool.submit(run_job, job)] = job
+            if len(futures) == 0:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = futures.pop(future)
+                name = cell_name(job)
+                in_flight[name] -= 1
+                try:
+                    value = future.result()
+                except Exception:
+                    print("job %s failed:\n%s" % (job_key(job), traceback.format_exc()))
+                    failures[name] += 1
+                else:
+                    checkpoint.mark_completed(job_key(job), value)
+                    stats[name].add(value)
+    return stats
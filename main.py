@@ -1,37 +1,41 @@
-import json
+import random
+import time
 from pypokerengine.api.game import setup_config, start_poker
 from examples.players.honest_player import HonestPlayer
 from examples.players.random_player import RandomPlayer
 from examples.players.mcts_player import MCTSPlayer, random_action, \
     nyu_heuristic_function, custom_heuristic
-from examples.players.emulator_player import EmulatorPlayer
-from threading import Thread
-from multiprocessing import Process
+from examples.players.emulator_player import EmulatorPlayer, NB_SIMULATION
+from pypokerengine.utils.rng_utils import derive_seed, make_rng
+from experiment_scheduler import expand_jobs, run_jobs, run_sequential, job_key, confidence_half_width
+from data_parsing.result_store import ResultStore, game_record
 
 INITIAL_STACK = 200
 SMALL_BLIND = 5
 
 
 RESULTS_DIR = './gameplay_data/'
+RESULT_STORE_FILE = RESULTS_DIR + 'results.ndjson'
 NUM_GAMES = 10
+MASTER_SEED = 0
 
 
-def play_game_with_settings(max_rounds, num_other_players, opponent_player, result_file_name, num_playouts, heuristic_function):
+def play_game_with_settings(max_rounds, num_other_players, opponent_player, result_store, num_playouts, heuristic_function, seed=None):
     """
     Given the settings for the maximum number of rounds in a game, the number of other players, the
-    type of other players, the file name to save results to, and the number of MCTS playouts to run,
-    runs an instance of the MCTSPlayer against those other players and saves the game results to a given
-    file path.
+    type of other players, the result store to save results to, the number of MCTS playouts to run and
+    the seed of the game, runs an instance of the MCTSPlayer against those other players and appends the
+    game results (with the game settings, seed and duration) to the given result store.
+    The dealer and every player draw from their own random stream derived from the seed of the game.
     """
+    if seed is not None:
+        random.seed(seed)
+    started_at = time.time()
     config = setup_config(max_round=max_rounds, initial_stack=INITIAL_STACK, small_blind_amount=SMALL_BLIND)
-    our_player = MCTSPlayer(num_playouts, heuristic_function)
-    our_player.set_opponents_model(RandomPlayer())
+    our_player = MCTSPlayer(num_playouts, heuristic_function, seed=derive_stream_seed(seed, "Stonks"))
+    our_player.set_opponents_model(RandomPlayer(rng=derive_rng(seed, "Stonks", "opponents_model")))
 
-    other_players = [opponent_player() for _ in range(num_other_players)]
-
-    for player in other_players:
-        if isinstance(player, EmulatorPlayer):
-            player.set_opponents_model(RandomPlayer())
+    other_players = [create_player(opponent_player, seed, "Player" + str(i + 1)) for i in range(num_other_players)]
 
     config.register_player(name="Stonks", algorithm=our_player)
     player_number = 1
@@ -40,16 +44,33 @@ def play_game_with_settings(max_rounds, num_other_players, opponent_player, resu
         config.register_player(name=p_name, algorithm=player)
         player_number += 1
         
-    game_result = start_poker(config, verbose=1)
+    game_result = start_poker(config, verbose=0, rng=derive_rng(seed, "dealer"))
     result_data = {}
     for player in game_result["players"]:
         result_data[player["name"]] =  player['stack']
 
-    result_file_name = open(result_file_name, 'a')
-    result_file_name.write(json.dumps(result_data))
-    result_file_name.close()
+    result_store.append(game_record(heuristic_function.__name__, opponent_player.__name__, max_rounds,
+                                    num_other_players, num_playouts, seed, time.time() - started_at, result_data))
 
     print(result_data)
+    return result_data
+
+def derive_stream_seed(seed, *keys):
+    return derive_seed(seed, *keys) if seed is not None else None
+
+def derive_rng(seed, *keys):
+    return make_rng(seed, *keys) if seed is not None else None
+
+def create_player(player_class, seed, name):
+    """
+    Given the class of an opponent, the seed of the game and the name of the opponent, return the opponent,
+    drawing from its own random stream derived from the seed of the game.
+    """
+    if issubclass(player_class, EmulatorPlayer):
+        player = player_class(seed=derive_stream_seed(seed, name))
+        player.set_opponents_model(RandomPlayer(rng=derive_rng(seed, name, "opponents_model")))
+        return player
+    return player_class(rng=derive_rng(seed, name))
 
 HEURISTICS = [nyu_heuristic_function, custom_heuristic, random_action]
 OPPONENT_ALGORITHMS = [RandomPlayer, HonestPlayer, EmulatorPlayer]
@@ -57,37 +78,45 @@ NUM_ROUNDS = [5, 10, 15, 20]
 NUM_OTHER_PLAYERS = [1, 3, 5, 7]
 NUM_PLAYOUTS = [100, 1000, 10000, 100000]
 
-def gather_data(heuristic_function):
-    """
-    Given a heuristic function, gather data on the average profit of all the games played 
-    given certain game parameters (i.e., opponent algorithms, number of rounds, etc.).
-    """
-    # Result File Name Format: <heuristic_function>_<other-player-algo>_<num-rounds>_<num-other-players>_<num-playouts>
-    threads = []
-    for opp_algo in OPPONENT_ALGORITHMS:
-        threads.append(Thread(target=run_game_with_heuristic_and_opponent_models, args=(opp_algo, heuristic_function)))
-    [thread.start() for thread in threads]
-    [thread.join() for thread in threads]
-
-def run_game_with_heuristic_and_opponent_models(opponent_algorithm, heuristic_function):
+# EmulatorPlayer games are slow, so only the shorter games are played against it
+ROUNDS_BY_OPPONENT = {'EmulatorPlayer': [5, 10]}
+# rollouts run per decision by the opponents which search, used to order the jobs longest first
+OPPONENT_COSTS = {'EmulatorPlayer': 4 * NB_SIMULATION}
+CHECKPOINT_FILE = RESULTS_DIR + 'completed_jobs.txt'
+
+# 'fixed' plays NUM_GAMES games per cell, 'sequential' plays the games of a cell until the CONFIDENCE
+# interval on Stonks' average profit is CI_TARGET_WIDTH chips wide (or a sequential test with overall
+# error rate DECISION_ALPHA says the profit differs from 0), between MIN_GAMES and MAX_GAMES games
+EXPERIMENT_MODE = 'fixed'
+CI_TARGET_WIDTH = 50
+CONFIDENCE = 0.95
+DECISION_ALPHA = 0.05
+MIN_GAMES = 20
+MAX_GAMES = 100
+SEQUENTIAL_CHECKPOINT_FILE = RESULTS_DIR + 'completed_sequential_jobs.txt'
+
+def run_game_job(job):
     """
-    Given an opponent algorithm and a heuristic function, generate JSON data with the results of playing games
-    (with different settings) with those guidelines.
+    Given a game job of the experiment grid, play its game with a seed derived from the job and save the
+    results to the result store. Returns the profit of Stonks.
     """
-    if opponent_algorithm.__name__ == 'EmulatorPlayer':
-        num_rounds_to_run = [5, 10]
-    else:
-        num_rounds_to_run = NUM_ROUNDS
-    for rounds in num_rounds_to_run:
-        for other_players in NUM_OTHER_PLAYERS:
-            for playouts in NUM_PLAYOUTS:
-                result_file_path = RESULTS_DIR + "{0}_{1}_{2}-rounds_{3}-others_{4}-playouts.json".format(heuristic_function.__name__, opponent_algorithm.__name__, rounds, other_players, playouts)
-                for _ in range(NUM_GAMES):
-                    play_game_with_settings(rounds, other_players, opponent_algorithm, result_file_path, playouts, heuristic_function)
+    seed = derive_seed(MASTER_SEED, job_key(job))
+    result_data = play_game_with_settings(job.rounds, job.others, job.opponent, ResultStore(RESULT_STORE_FILE),
+                                          job.playouts, job.heuristic, seed=seed)
+    return result_data["Stonks"] - INITIAL_STACK
 
 if __name__ == '__main__':
-    processes = []
-    for heuristic in HEURISTICS:
-        processes.append(Process(target=gather_data, args=[heuristic]))
-    [process.start() for process in processes]
-    [process.join() for process in processes]
\ No newline at end of file
+    if EXPERIMENT_MODE == 'sequential':
+        cells = expand_jobs(HEURISTICS, OPPONENT_ALGORITHMS, NUM_ROUNDS, NUM_OTHER_PLAYERS, NUM_PLAYOUTS, 1,
+                            rounds_by_opponent=ROUNDS_BY_OPPONENT)
+        stats = run_sequential(cells, run_game_job, SEQUENTIAL_CHECKPOINT_FILE, CI_TARGET_WIDTH, min_games=MIN_GAMES,
+                               max_games=MAX_GAMES, confidence=CONFIDENCE, decision_alpha=DECISION_ALPHA,
+                               opponent_costs=OPPONENT_COSTS)
+        for name in sorted(stats):
+            print("%s: %d games, average profit %.1f +- %.1f" % (
+                name, stats[name].count, stats[name].mean, confidence_half_width(stats[name], CONFIDENCE)))
+    else:
+        jobs = expand_jobs(HEURISTICS, OPPONENT_ALGORITHMS, NUM_ROUNDS, NUM_OTHER_PLAYERS, NUM_PLAYOUTS, NUM_GAMES,
+                           rounds_by_opponent=ROUNDS_BY_OPPONENT)
+        summary = run_jobs(jobs, run_game_job, CHECKPOINT_FILE, opponent_costs=OPPONENT_COSTS)
+        print(summary)
@@ -9,15 +9,31 @@ from pypokerengine.engine.poker_constants import PokerConstants as Const
 from pypokerengine.engine.round_manager import RoundManager
 from pypokerengine.engine.action_checker import ActionChecker
 from pypokerengine.engine.message_builder import MessageBuilder
+from pypokerengine.engine.engine_stats import EngineStats, timed_call
+from pypokerengine.engine.hand_history import HandHistoryRecorder
 from pypokerengine.players import BasePokerPlayer
 from pypokerengine.utils.game_state_utils import deepcopy_game_state
 
 class Emulator(object):
 
-    def __init__(self):
+    def __init__(self, rng=None, stats=None):
         self.game_rule = {}
         self.blind_structure = {}
         self.players_holder = {}
+        self.rng = rng
+        self.stats = stats
+        self.hand_history = None
+
+    def set_stats(self, stats):
+        self.stats = stats
+
+    def set_hand_history(self, writer):
+        """
+        Records the rounds which are started by start_new_round and then played by apply_action or
+        run_until_* to writer (a HandHistoryWriter). Only meant for linear play: the actions applied
+        to copies of a state (as in a tree search) would be mixed into the same round.
+        """
+        self.hand_history = HandHistoryRecorder(writer) if writer is not None else None
 
     def set_game_rule(self, player_num, max_round, small_blind_amount, ante_amount):
         self.game_rule["player_num"] = player_num
@@ -56,16 +72,32 @@ class Emulator(object):
         sb_amount = game_state["small_blind_amount"]
         return ActionChecker.legal_actions(players, player_pos, sb_amount)
 
-    def apply_action(self, game_state, action, bet_amount=0):
+    def apply_action(self, game_state, action, bet_amount=0, event_level=None):
+        event_level = event_level or EventLevel.ALL
         if game_state["street"] == Const.Street.FINISHED:
             game_state, events = self._start_next_round(game_state)
-        updated_state, messages = RoundManager.apply_action(game_state, action, bet_amount)
-        events = [self.create_event(message[1]["message"]) for message in messages]
-        events = [e for e in events if e]
-        if self._is_last_round(updated_state, self.game_rule):
+        message_types = EventLevel.message_types(event_level)
+        if self.hand_history is not None: self.hand_history.action(game_state, action, bet_amount)
+        updated_state, messages = RoundManager.apply_action(game_state, action, bet_amount, None, message_types)
+        if self.hand_history is not None and updated_state["street"] == Const.Street.FINISHED:
+            self.hand_history.finish_round(updated_state)
+        events = self._create_events(messages, event_level)
+        if self._is_last_round(updated_state, self.game_rule) and event_level != EventLevel.NONE:
             events += self._generate_game_result_event(updated_state)
         return updated_state, events
 
+    def apply_action_inplace(self, game_state, action, bet_amount=0, deal_runout=True):
+        """
+        Applies the action to game_state itself, without copying it nor creating events, and returns
+        the undo record to pass to undo_action. Unlike apply_action it does not start the next round.
+        See RoundManager.apply_action_inplace for deal_runout.
+        """
+        return timed_call(self.stats, EngineStats.APPLY_ACTION, None,\
+                RoundManager.apply_action_inplace, game_state, action, bet_amount, deal_runout)
+
+    def undo_action(self, game_state, undo):
+        RoundManager.undo_action(game_state, undo)
+
     def _start_next_round(self, game_state):
         game_finished = game_state["round_count"] == self.game_rule["max_round"]
         game_state, events = self.start_new_round(game_state)
@@ -73,41 +105,87 @@ class Emulator(object):
             raise Exception("Failed to apply action. Because game is already finished.")
         return game_state, events
 
-    def run_until_round_finish(self, game_state):
-        mailbox = []
+    def run_until_round_finish(self, game_state, event_level=None):
+        return _collect_events(self.iter_until_round_finish(game_state, event_level))
+
+    def iter_until_round_finish(self, game_state, event_level=None):
+        """
+        Generator version of run_until_round_finish which yields the events of event_level one by one
+        and returns the game state at the end of the round.
+        """
+        event_level = event_level or EventLevel.ALL
+        stats = self.stats
+        message_types = EventLevel.message_types(event_level)
+        msg = None
         while game_state["street"] != Const.Street.FINISHED:
             next_player_pos = game_state["next_player"]
             next_player_uuid = game_state["table"].seats.players[next_player_pos].uuid
             next_player_algorithm = self.fetch_player(next_player_uuid)
+            if msg is None:
+                msg = timed_call(stats, EngineStats.MESSAGE_BUILD, None,\
+                        MessageBuilder.build_ask_message, next_player_pos, game_state)["message"]
+            action, amount = timed_call(stats, EngineStats.DECLARE_ACTION, next_player_uuid,\
+                    next_player_algorithm.declare_action, msg["valid_actions"], msg["hole_card"], msg["round_state"])
+            if self.hand_history is not None: self.hand_history.action(game_state, action, amount)
+            game_state, messages = timed_call(stats, EngineStats.APPLY_ACTION, None,\
+                    RoundManager.apply_action, game_state, action, amount, stats, message_types)
+            msg = _next_ask_message(messages)
+            for event in self._create_events(messages, event_level):
+                yield event
+            if self.hand_history is not None and game_state["street"] == Const.Street.FINISHED:
+                self.hand_history.finish_round(game_state)
+        if self._is_last_round(game_state, self.game_rule) and event_level != EventLevel.NONE:
+            yield self._generate_game_result_event(game_state)[0]
+        if stats is not None: stats.round_finished()
+        return game_state
+
+    def run_until_street(self, game_state, street):
+        """
+        Plays the round of game_state out on a copy of it, in place and without creating events, until
+        street starts, the round only has its community cards left to deal (see RoundManager.is_runout)
+        or the round finishes, and returns the state reached. A game_state already on or past street but
+        in the middle of its betting is played until that betting closes (the next street starts), so the
+        state returned never has unanswered bets. Rounds are not recorded to the hand history.
+        """
+        game_state = deepcopy_game_state(game_state)
+        if game_state["street"] >= street and not RoundManager.is_street_start(game_state):
+            street = game_state["street"] + 1
+        while game_state["street"] < street and game_state["street"] != Const.Street.FINISHED\
+                and not RoundManager.is_runout(game_state):
+            next_player_pos = game_state["next_player"]
+            next_player_uuid = game_state["table"].seats.players[next_player_pos].uuid
             msg = MessageBuilder.build_ask_message(next_player_pos, game_state)["message"]
-            action, amount = next_player_algorithm.declare_action(\
+            action, amount = self.fetch_player(next_player_uuid).declare_action(\
                     msg["valid_actions"], msg["hole_card"], msg["round_state"])
-            game_state, messages = RoundManager.apply_action(game_state, action, amount)
-            mailbox += messages
-        events = [self.create_event(message[1]["message"]) for message in mailbox]
-        events = [e for e in events if e]
-        if self._is_last_round(game_state, self.game_rule):
-            events += self._generate_game_result_event(game_state)
-        return game_state, events
-
-    def run_until_game_finish(self, game_state):
-        mailbox = []
-        event_box= []
+            self.apply_action_inplace(game_state, action, amount, deal_runout=False)
+        return game_state
+
+    def run_until_game_finish(self, game_state, event_level=None):
+        return _collect_events(self.iter_until_game_finish(game_state, event_level))
+
+    def iter_until_game_finish(self, game_state, event_level=None):
+        """
+        Generator version of run_until_game_finish which yields the events of event_level one by one
+        and returns the game state at the end of the game.
+        """
+        event_level = event_level or EventLevel.ALL
         if game_state["street"] != Const.Street.FINISHED:
-            game_state, events = self.run_until_round_finish(game_state)
-            event_box += events
+            game_state = yield from self.iter_until_round_finish(game_state, event_level)
         while True:
-            game_state, events = self.start_new_round(game_state)
-            event_box += events
-            if Event.GAME_FINISH == events[-1]["type"]: break
-            game_state, events = self.run_until_round_finish(game_state)
-            event_box += events
-            if Event.GAME_FINISH == events[-1]["type"]: break
-        event_box = [e for e in event_box if e]
-        return game_state, event_box
+            game_state, events, game_finished = self._start_new_round(game_state, event_level)
+            for event in events:
+                yield event
+            if game_finished: break
+            game_state = yield from self.iter_until_round_finish(game_state, event_level)
+            if self._is_last_round(game_state, self.game_rule): break
+        return game_state
 
 
-    def start_new_round(self, game_state):
+    def start_new_round(self, game_state, event_level=None):
+        new_state, events, _game_finished = self._start_new_round(game_state, event_level or EventLevel.ALL)
+        return new_state, events
+
+    def _start_new_round(self, game_state, event_level):
         round_count = game_state["round_count"] + 1
         ante, sb_amount = self.game_rule["ante"], self.game_rule["sb_amount"]
         deepcopy = deepcopy_game_state(game_state)
@@ -117,12 +195,24 @@ class Emulator(object):
         ante, sb_amount = update_blind_level(ante, sb_amount, round_count, self.blind_structure)
         deepcopy_table = exclude_short_of_money_players(deepcopy_table, ante, sb_amount)
         is_game_finished = len([1 for p in deepcopy_table.seats.players if p.is_active()])==1
-        if is_game_finished: return deepcopy, self._generate_game_result_event(deepcopy)
-
-        new_state, messages = RoundManager.start_new_round(round_count, sb_amount, ante, deepcopy_table)
+        if is_game_finished:
+            events = self._generate_game_result_event(deepcopy) if event_level != EventLevel.NONE else []
+            return deepcopy, events, True
+
+        message_types = EventLevel.message_types(event_level)
+        new_state, messages = timed_call(self.stats, EngineStats.START_ROUND, None, RoundManager.start_new_round,
+                                         round_count, sb_amount, ante, deepcopy_table, self.rng, self.stats, message_types)
+        if self.hand_history is not None:
+            self.hand_history.start_round(new_state, ante)
+            if new_state["street"] == Const.Street.FINISHED: self.hand_history.finish_round(new_state)
+        return new_state, self._create_events(messages, event_level), False
+
+    def _create_events(self, messages, event_level):
+        if event_level == EventLevel.NONE: return []
         events = [self.create_event(message[1]["message"]) for message in messages]
-        events = [e for e in events if e]
-        return new_state, events
+        if event_level == EventLevel.TERMINAL:
+            return [e for e in events if e and e["type"] in EventLevel.TERMINAL_EVENTS]
+        return [e for e in events if e]
 
     def create_event(self, message):
         message_type = message["message_type"]
@@ -153,6 +243,18 @@ class Emulator(object):
         return [self.create_event(message)]
 
 
+def _collect_events(events_iter):
+    events = []
+    while True:
+        try:
+            events.append(next(events_iter))
+        except StopIteration as finished:
+            return finished.value, events
+
+def _next_ask_message(messages):
+    if len(messages) == 0 or messages[-1][1]["type"] != "ask": return None
+    return messages[-1][1]["message"]
+
 def update_blind_level(ante, sb_amount, round_count, blind_structure):
     level_thresholds = sorted(blind_structure.keys())
     current_level_pos = [r <= round_count for r in level_thresholds].count(True)-1
@@ -246,6 +348,24 @@ class Event:
                 }
 
 
+class EventLevel:
+    """
+    Events which the emulator creates: every event (ALL), only the round and game finish events
+    (TERMINAL) or no event at all (NONE). The messages of the dropped events are not even built.
+    """
+    NONE = "none"
+    TERMINAL = "terminal"
+    ALL = "all"
+    TERMINAL_EVENTS = [Event.ROUND_FINISH, Event.GAME_FINISH]
+
+    @classmethod
+    def message_types(self, event_level):
+        if event_level == self.ALL: return None
+        if event_level == self.TERMINAL: return [MessageBuilder.ROUND_RESULT_MESSAGE]
+        if event_level == self.NONE: return []
+        raise ValueError("Unknown event level [%s]" % event_level)
+
+
 class Action:
     FOLD = "fold"
     CALL = "call"
@@ -1,18 +1,116 @@
+import random
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 from pypokerengine.engine.dealer import Dealer
+from pypokerengine.engine.hand_history import HandHistoryWriter
 from pypokerengine.players import BasePokerPlayer
+from pypokerengine.utils.rng_utils import derive_seed
 
 def setup_config(max_round, initial_stack, small_blind_amount, ante=0):
     return Config(max_round, initial_stack, small_blind_amount, ante)
 
-def start_poker(config, verbose=2):
+def start_poker(config, verbose=2, rng=None, stats=None):
+    """
+    Plays the game of config and returns its result. Once the game is over, the players which define a
+    close() method (e.g. to stop the worker processes they search with) are closed.
+    """
+    dealer = _setup_dealer(config, verbose, rng, stats)
+    try:
+        result_message = dealer.start_game(config.max_round)
+    finally:
+        _close_hand_history(dealer)
+        _close_players(config)
+    return _format_result(result_message)
+
+def start_poker_rounds(config, verbose=2, rng=None, stats=None):
+    """
+    Plays the game like start_poker but yields the result of every round as soon as it is played
+    (see Dealer.play_game). Stop iterating to stop the game early. The players are closed at the end
+    of the game like in start_poker.
+    """
+    dealer = _setup_dealer(config, verbose, rng, stats)
+    try:
+        for round_result in dealer.play_game(config.max_round):
+            yield round_result
+    finally:
+        _close_hand_history(dealer)
+        _close_players(config)
+
+def _setup_dealer(config, verbose, rng, stats):
     config.validation()
-    dealer = Dealer(config.sb_amount, config.initial_stack, config.ante)
+    dealer = Dealer(config.sb_amount, config.initial_stack, config.ante, rng, stats)
     dealer.set_verbose(verbose)
     dealer.set_blind_structure(config.blind_structure)
+    if config.action_deadline is not None:
+        dealer.set_action_deadline(config.action_deadline, config.default_action)
     for info in config.players_info:
         dealer.register_player(info["name"], info["algorithm"])
-    result_message = dealer.start_game(config.max_round)
-    return _format_result(result_message)
+    if config.hand_history_path is not None:
+        dealer.set_hand_history(HandHistoryWriter(config.hand_history_path))
+    return dealer
+
+def _close_hand_history(dealer):
+    if dealer.hand_history is not None: dealer.hand_history.writer.close()
+
+def _close_players(config):
+    for info in config.players_info:
+        close = getattr(info["algorithm"], "close", None)
+        if callable(close): close()
+
+def start_poker_batch(configs, verbose=0, max_workers=None, master_seed=None):
+    """
+    Plays every game of configs on a pool of max_workers processes (in the calling process when
+    max_workers is 1) and yields the result of each game as soon as it finishes, as a dict with the
+    position of the game in configs ("index"), its "seed", the result of start_poker ("result"), the
+    "elapsed" seconds and the formatted traceback of the "error" which aborted it (the other games keep
+    running). Items of configs are Config objects or picklable functions which take the seed and return
+    one. Each game seeds the global random module and the dealer with its seed, which is derived from
+    master_seed and the index of the game, so a batch can be replayed by passing the same master_seed.
+    Games played in the calling process restore the state of its global random module afterwards, and
+    the games not started yet are cancelled when the caller stops iterating.
+    """
+    if master_seed is None: master_seed = random.randrange(2**63)
+    games = [(index, config, derive_seed(master_seed, "game", index)) for index, config in enumerate(configs)]
+    if max_workers == 1:
+        for game in games:
+            random_state = random.getstate()
+            try:
+                result = _play_game(game, verbose)
+            finally:
+                random.setstate(random_state)
+            yield result
+        return
+
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    futures = dict((executor.submit(_play_game, game, verbose), game) for game in games)
+    try:
+        for future in as_completed(futures):
+            index, _config, seed = futures[future]
+            try:
+                result = future.result()
+            except Exception:  # the game or its result could not be sent across processes
+                result = _game_result(index, seed, None, 0.0, traceback.format_exc())
+            yield result
+    finally:
+        # do not wait for the remaining games when the caller stopped iterating
+        for future in futures: future.cancel()
+        executor.shutdown(wait=False)
+
+def _play_game(game, verbose):
+    index, config, seed = game
+    started_at = time.perf_counter()
+    try:
+        random.seed(seed)
+        if not isinstance(config, Config): config = config(seed)
+        result = start_poker(config, verbose, random.Random(derive_seed(seed, "dealer")))
+        return _game_result(index, seed, result, time.perf_counter() - started_at, None)
+    except Exception:
+        return _game_result(index, seed, None, time.perf_counter() - started_at, traceback.format_exc())
+
+def _game_result(index, seed, result, elapsed, error):
+    return { "index": index, "seed": seed, "result": result, "elapsed": elapsed, "error": error }
 
 def _format_result(result_message):
     return {
@@ -25,6 +123,9 @@ class Config(object):
     def __init__(self, max_round, initial_stack, sb_amount, ante):
         self.players_info = []
         self.blind_structure = {}
+        self.action_deadline = None
+        self.default_action = "fold"
+        self.hand_history_path = None
         self.max_round = max_round
         self.initial_stack = initial_stack
         self.sb_amount = sb_amount
@@ -41,6 +142,23 @@ class Config(object):
     def set_blind_structure(self, blind_structure):
         self.blind_structure = blind_structure
 
+    def set_action_deadline(self, deadline, default_action="fold"):
+        """
+        Players which take more than deadline seconds to declare an action play default_action
+        instead ("fold", or "check" which checks when it is free and folds otherwise). Until its late
+        answer is ready, such a player also plays default_action without being asked again, and the
+        notifications sent to it meanwhile are delivered to it afterwards.
+        """
+        self.action_deadline = deadline
+        self.default_action = default_action
+
+    def set_hand_history(self, file_path):
+        """
+        Appends every round of the game to the binary hand history file at file_path
+        (see pypokerengine.engine.hand_history).
+        """
+        self.hand_history_path = file_path
+
     def validation(self):
         player_num = len(self.players_info)
         if player_num < 2:
@@ -1,4 +1,6 @@
 import random
+import threading
+import time
 from collections import OrderedDict
 
 from pypokerengine.engine.poker_constants import PokerConstants as Const
@@ -6,18 +8,25 @@ from pypokerengine.engine.table import Table
 from pypokerengine.engine.player import Player
 from pypokerengine.engine.round_manager import RoundManager
 from pypokerengine.engine.message_builder import MessageBuilder
+from pypokerengine.engine.engine_stats import EngineStats, timed_call
+from pypokerengine.engine.latency_histogram import LatencyHistogram
+from pypokerengine.engine.hand_history import HandHistoryRecorder
+from pypokerengine.players import BasePokerPlayer
 
 class Dealer:
 
-  def __init__(self, small_blind_amount=None, initial_stack=None, ante=None):
+  def __init__(self, small_blind_amount=None, initial_stack=None, ante=None, rng=None, stats=None):
     self.small_blind_amount = small_blind_amount
     self.ante = ante if ante else 0
     self.initial_stack = initial_stack
+    self.rng = rng
+    self.stats = stats
     self.uuid_list = self.__generate_uuid_list()
-    self.message_handler = MessageHandler()
+    self.message_handler = MessageHandler(stats)
     self.message_summarizer = MessageSummarizer(verbose=0)
     self.table = Table()
     self.blind_structure = {}
+    self.hand_history = None
 
   def register_player(self, player_name, algorithm):
     self.__config_check()
@@ -28,7 +37,39 @@ class Dealer:
   def set_verbose(self, verbose):
       self.message_summarizer.verbose = verbose
 
+  def subscribed_message_types(self):
+    """Returns the notification types which have to be built, None meaning every type"""
+    if self.message_summarizer.verbose != 0: return None
+    return self.message_handler.subscribed_message_types()
+
+  def set_stats(self, stats):
+    self.stats = stats
+    self.message_handler.stats = stats
+
+  def set_action_deadline(self, deadline, default_action="fold"):
+    self.message_handler.set_action_deadline(deadline, default_action)
+
+  def set_hand_history(self, writer):
+    """Records every round played from now on to writer (a HandHistoryWriter), None stops recording"""
+    self.hand_history = HandHistoryRecorder(writer) if writer is not None else None
+
+  def get_latency_histograms(self):
+    return self.message_handler.latency_histograms
+
   def start_game(self, max_round):
+    rounds = self.play_game(max_round)
+    while True:
+      try:
+        next(rounds)
+      except StopIteration as finished:
+        return finished.value
+
+  def play_game(self, max_round):
+    """
+    Generator version of start_game which yields the result of every round as soon as it is played
+    (round_count, stacks by uuid, uuids of the winners, pot and elapsed seconds) and returns the game
+    result message. The game stops early when the consumer stops iterating.
+    """
     table = self.table
     self.__notify_game_start(max_round)
     ante, sb_amount = self.ante, self.small_blind_amount
@@ -36,21 +77,41 @@ class Dealer:
       ante, sb_amount = self.__update_forced_bet_amount(ante, sb_amount, round_count, self.blind_structure)
       table = self.__exclude_short_of_money_players(table, ante, sb_amount)
       if self.__is_game_finished(table): break
-      table = self.play_round(round_count, sb_amount, ante, table)
+      started_at = time.perf_counter()
+      state = self.__play_round(round_count, sb_amount, ante, table)
+      table = state["table"]
+      yield self.__round_result(state, round_count, time.perf_counter() - started_at)
       table.shift_dealer_btn()
     return self.__generate_game_result(max_round, table.seats)
 
   def play_round(self, round_count, blind_amount, ante, table):
-    state, msgs = RoundManager.start_new_round(round_count, blind_amount, ante, table)
+    return self.__play_round(round_count, blind_amount, ante, table)["table"]
+
+  def __play_round(self, round_count, blind_amount, ante, table):
+    message_types = self.subscribed_message_types()
+    state, msgs = self.__start_new_round(round_count, blind_amount, ante, table, message_types)
+    if self.hand_history is not None: self.hand_history.start_round(state, ante)
     while True:
       self.__message_check(msgs, state["street"])
       if state["street"] != Const.Street.FINISHED:  # continue the round
         action, bet_amount = self.__publish_messages(msgs)
-        state, msgs = RoundManager.apply_action(state, action, bet_amount)
+        if self.hand_history is not None: self.hand_history.action(state, action, bet_amount)
+        state, msgs = self.__apply_action(state, action, bet_amount, message_types)
       else:  # finish the round after publish round result
         self.__publish_messages(msgs)
         break
-    return state["table"]
+    if self.hand_history is not None: self.hand_history.finish_round(state)
+    if self.stats is not None: self.stats.round_finished()
+    return state
+
+  def __round_result(self, state, round_count, elapsed):
+    return {
+        "round_count": round_count,
+        "stacks": OrderedDict((player.uuid, player.stack) for player in state["table"].seats.players),
+        "winners": state["round_result"]["winners"],
+        "pot": state["round_result"]["pot"],
+        "elapsed": elapsed
+        }
 
 
   def set_small_blind_amount(self, amount):
@@ -71,6 +132,14 @@ class Dealer:
       ante, sb_amount = update_info["ante"], update_info["small_blind"]
     return ante, sb_amount
 
+  def __start_new_round(self, round_count, blind_amount, ante, table, message_types):
+    return timed_call(self.stats, EngineStats.START_ROUND, None, RoundManager.start_new_round,
+        round_count, blind_amount, ante, table, self.rng, self.stats, message_types)
+
+  def __apply_action(self, state, action, bet_amount, message_types):
+    return timed_call(self.stats, EngineStats.APPLY_ACTION, None, RoundManager.apply_action,
+        state, action, bet_amount, self.stats, message_types)
+
   def __register_algorithm_to_message_handler(self, uuid, algorithm):
     self.message_handler.register_algorithm(uuid, algorithm)
 
@@ -81,6 +150,8 @@ class Dealer:
     return uuid
 
   def __notify_game_start(self, max_round):
+    message_types = self.subscribed_message_types()
+    if message_types is not None and MessageBuilder.GAME_START_MESSAGE not in message_types: return
     config = self.__gen_config(max_round)
     start_msg = MessageBuilder.build_game_start_message(config, self.table.seats)
     self.message_handler.process_message(-1, start_msg)
@@ -90,6 +161,7 @@ class Dealer:
     return len([player for player in  table.seats.players if player.is_active()]) == 1
 
   def __message_check(self, msgs, street):
+    if street == Const.Street.FINISHED and len(msgs) == 0: return  # round result is not subscribed
     address, msg = msgs[-1]
     invalid = msg["type"] != 'ask'
     invalid &= street != Const.Street.FINISHED or msg["message"]["message_type"] == 'round_result'
@@ -97,6 +169,7 @@ class Dealer:
       raise Exception("Last message is not ask type. : %s" % msgs)
 
   def __publish_messages(self, msgs):
+    if len(msgs) == 0: return None
     for address, msg in msgs[:-1]:
       self.message_handler.process_message(address, msg)
     self.message_summarizer.summarize_messages(msgs)
@@ -174,34 +247,140 @@ class Dealer:
   def __generate_uuid(self):
     uuid_size = 22
     chars = [chr(code) for code in range(97,123)]
-    return "".join([random.choice(chars) for _ in range(uuid_size)])
+    return "".join([(self.rng or random).choice(chars) for _ in range(uuid_size)])
 
 class MessageHandler:
 
-  def __init__(self):
+  DEFAULT_ACTIONS = ["fold", "check"]
+
+  def __init__(self, stats=None):
     self.algo_owner_map = {}
+    self.subscriptions = {}
+    self.stats = stats
+    self.latency_histograms = {}
+    self.action_deadline = None
+    self.default_action = "fold"
+    self.late_players = {}
+    self.late_players_lock = threading.Lock()
 
   def register_algorithm(self, uuid, algorithm):
     self.algo_owner_map[uuid] = algorithm
+    types = algorithm.subscribed_message_types if isinstance(algorithm, BasePokerPlayer) else None
+    self.subscriptions[uuid] = frozenset(types) if types is not None else None
+
+  def subscribed_message_types(self):
+    """Returns the notification types which some algorithm consumes, None meaning every type"""
+    message_types = set()
+    for types in self.subscriptions.values():
+      if types is None: return None
+      message_types |= types
+    return message_types
+
+  def set_action_deadline(self, deadline, default_action="fold"):
+    if default_action not in self.DEFAULT_ACTIONS:
+      raise ValueError("default_action must be one of %s but was [%s]" % (self.DEFAULT_ACTIONS, default_action))
+    self.action_deadline = deadline
+    self.default_action = default_action
 
   def process_message(self, address, msg):
     receivers = self.__fetch_receivers(address)
-    for receiver in receivers:
+    for uuid, receiver in receivers:
       if msg["type"] == 'ask':
-        return receiver.respond_to_ask(msg["message"])
+        return timed_call(self.stats, EngineStats.DECLARE_ACTION, uuid, self.__ask, uuid, receiver, msg["message"])
       elif msg["type"] == 'notification':
-        receiver.receive_notification(msg["message"])
+        if self.__is_subscribed(uuid, msg["message"]):
+          timed_call(self.stats, EngineStats.RECEIVE_MESSAGE, uuid, self.__notify, uuid, receiver, msg["message"])
       else:
         raise ValueError("Received unexpected message which type is [%s]" % msg["type"])
 
+  def __ask(self, uuid, receiver, message):
+    started_at = time.perf_counter()
+    if self.action_deadline is None:
+      action, timed_out = receiver.respond_to_ask(message), False
+    elif self.__is_late(uuid):
+      action, timed_out = self.__default_action(uuid, message), True
+    else:
+      action, timed_out = self.__respond_to_ask_with_deadline(uuid, receiver, message)
+    if uuid not in self.latency_histograms:
+      self.latency_histograms[uuid] = LatencyHistogram()
+    self.latency_histograms[uuid].add(time.perf_counter() - started_at, timed_out)
+    return action
+
+  # A late player keeps thinking in its worker thread (threads cannot be killed) and its answer is ignored.
+  # Until the worker finishes, the player is not touched from the dealer thread: it gets the default action
+  # without being asked, and its notifications are queued for the worker to deliver once the answer is ready.
+  def __respond_to_ask_with_deadline(self, uuid, receiver, message):
+    response = []
+    def respond():
+      try:
+        result = (receiver.respond_to_ask(message), None)
+      except Exception as error:
+        result = (None, error)
+      with self.late_players_lock:
+        response.append(result)
+      self.__deliver_late_notifications(uuid, receiver)
+    worker = threading.Thread(target=respond)
+    worker.daemon = True
+    worker.start()
+    worker.join(self.action_deadline)
+    with self.late_players_lock:
+      timed_out = len(response) == 0
+      if timed_out: self.late_players[uuid] = []
+    if timed_out:
+      return self.__default_action(uuid, message), True
+    action, error = response[0]
+    if error is not None: raise error
+    return action, False
+
+  def __notify(self, uuid, receiver, message):
+    with self.late_players_lock:
+      if uuid in self.late_players:
+        self.late_players[uuid].append(message)
+        return
+    receiver.receive_notification(message)
+
+  def __deliver_late_notifications(self, uuid, receiver):
+    while True:
+      with self.late_players_lock:
+        pending = self.late_players.get(uuid)
+        if pending is None: return
+        if len(pending) == 0:
+          del self.late_players[uuid]
+          return
+        message = pending.pop(0)
+      try:
+        receiver.receive_notification(message)
+      except Exception:
+        with self.late_players_lock: self.late_players.pop(uuid, None)
+        raise
+
+  def __is_late(self, uuid):
+    with self.late_players_lock:
+      return uuid in self.late_players
+
+  # "check" is only possible when the player has already put the call amount in on this street
+  def __default_action(self, uuid, message):
+    call_amount = message["valid_actions"][1]["amount"]
+    if self.default_action == "check" and self.__street_paid_sum(uuid, message["round_state"]) == call_amount:
+      return "call", call_amount
+    return "fold", 0
+
+  def __street_paid_sum(self, uuid, round_state):
+    histories = round_state["action_histories"].get(round_state["street"], [])
+    paid = [h["amount"] for h in histories if h["uuid"] == uuid and h["action"] not in ["FOLD", "ANTE"]]
+    return paid[-1] if len(paid) != 0 else 0
+
+  def __is_subscribed(self, uuid, message):
+    types = self.subscriptions.get(uuid)
+    return types is None or message["message_type"] in types
 
   def __fetch_receivers(self, address):
     if address == -1:
-      return self.algo_owner_map.values()
+      return self.algo_owner_map.items()
     else:
       if address not in self.algo_owner_map:
         raise ValueError("Received message its address [%s] is unknown" % address)
-      return [self.algo_owner_map[address]]
+      return [(address, self.algo_owner_map[address])]
 
 class MessageSummarizer(object):
 
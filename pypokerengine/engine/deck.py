@@ -22,9 +22,9 @@ class Deck:
   def restore(self):
     self.deck = self.__setup()
 
-  def shuffle(self):
+  def shuffle(self, rng=None):
     if not self.cheat:
-      random.shuffle(self.deck)
+      (rng or random).shuffle(self.deck)
 
   # serialize format : [cheat_flg, chat_card_ids, deck_card_ids]
   def serialize(self):
@@ -0,0 +1,71 @@
+import time
+
+class EngineStats:
+  """
+  Call counts and wall time of the engine (round start, action application and, as part of them,
+  message building and showdown evaluation) and of the players (declare_action and receive_* callbacks,
+  also broken down by player uuid). Pass it to Dealer or Emulator to enable the instrumentation; they
+  skip every measurement when no stats object is given. If a callback is given, it is called with
+  to_dict() every callback_interval finished rounds.
+  """
+
+  START_ROUND = "start_round"
+  APPLY_ACTION = "apply_action"
+  MESSAGE_BUILD = "message_build"
+  SHOWDOWN = "showdown"
+  DECLARE_ACTION = "declare_action"
+  RECEIVE_MESSAGE = "receive_message"
+  CATEGORIES = [START_ROUND, APPLY_ACTION, MESSAGE_BUILD, SHOWDOWN, DECLARE_ACTION, RECEIVE_MESSAGE]
+  ENGINE_CATEGORIES = [START_ROUND, APPLY_ACTION]
+  PLAYER_CATEGORIES = [DECLARE_ACTION, RECEIVE_MESSAGE]
+
+  def __init__(self, callback=None, callback_interval=1, clock=time.perf_counter):
+    self.callback = callback
+    self.callback_interval = callback_interval
+    self.clock = clock
+    self.rounds = 0
+    self.counts = { category: 0 for category in self.CATEGORIES }
+    self.seconds = { category: 0.0 for category in self.CATEGORIES }
+    self.player_counts = {}
+    self.player_seconds = {}
+
+  def add(self, category, seconds, uuid=None):
+    self.counts[category] += 1
+    self.seconds[category] += seconds
+    if uuid is not None:
+      if uuid not in self.player_counts:
+        self.player_counts[uuid] = { category: 0 for category in self.PLAYER_CATEGORIES }
+        self.player_seconds[uuid] = { category: 0.0 for category in self.PLAYER_CATEGORIES }
+      self.player_counts[uuid][category] += 1
+      self.player_seconds[uuid][category] += seconds
+
+  def round_finished(self):
+    self.rounds += 1
+    if self.callback is not None and self.rounds % self.callback_interval == 0:
+      self.callback(self.to_dict())
+
+  def engine_seconds(self):
+    return sum([self.seconds[category] for category in self.ENGINE_CATEGORIES])
+
+  def player_seconds_total(self):
+    return sum([self.seconds[category] for category in self.PLAYER_CATEGORIES])
+
+  def to_dict(self):
+    return {
+        "rounds": self.rounds,
+        "engine_seconds": self.engine_seconds(),
+        "player_seconds": self.player_seconds_total(),
+        "categories": { category: { "count": self.counts[category], "seconds": self.seconds[category] }
+          for category in self.CATEGORIES },
+        "players": { uuid: { category: { "count": self.player_counts[uuid][category],
+          "seconds": self.player_seconds[uuid][category] } for category in self.PLAYER_CATEGORIES }
+          for uuid in self.player_counts }
+        }
+
+def timed_call(stats, category, uuid, func, *args):
+  """Returns func(*args), adding its wall time to category of stats (and of uuid if given) unless stats is None"""
+  if stats is None: return func(*args)
+  started_at = stats.clock()
+  result = func(*args)
+  stats.add(category, stats.clock() - started_at, uuid)
+  return result
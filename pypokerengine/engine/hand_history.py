@@ -0,0 +1,196 @@
+import mmap
+import struct
+from array import array
+
+from pypokerengine.engine.action_checker import ActionChecker
+
+class HandHistory:
+  """
+  Compact binary format of played rounds. A file starts with MAGIC followed by one record per round,
+  each prefixed by its length (uint32). A record holds the rule of the round, the seats (uuid, stack
+  at the start of the round, stack at its end and hole cards as card ids), the board, the actions as
+  (street, seat, action code, amount), the pot and the seats of the winners. Decoded rounds are dicts:
+
+    { "round_count", "small_blind_amount", "ante", "dealer_btn", "sb_pos", "bb_pos",
+      "seats": [{ "uuid", "stack", "end_stack", "hole_card" }],
+      "actions": [{ "street", "seat", "action", "amount" }],
+      "board", "pot", "winners" }
+  """
+
+  MAGIC = b"PPHH\x01"
+  ACTIONS = ["fold", "call", "raise"]
+  ACTION_CODES = { action: code for code, action in enumerate(ACTIONS) }
+
+  LENGTH = struct.Struct("<I")
+  RULE = struct.Struct("<IIIBBBB")
+  SEAT = struct.Struct("<IIBB")
+  ACTION = struct.Struct("<BBBI")
+  POT = struct.Struct("<IB")
+
+  @classmethod
+  def encode(self, hand):
+    parts = [self.RULE.pack(hand["round_count"], hand["small_blind_amount"], hand["ante"],
+      len(hand["seats"]), hand["dealer_btn"], hand["sb_pos"], hand["bb_pos"])]
+    for seat in hand["seats"]:
+      uuid = seat["uuid"].encode("utf-8")
+      hole_card = (list(seat["hole_card"]) + [0, 0])[:2]
+      parts += [bytes([len(uuid)]), uuid, self.SEAT.pack(seat["stack"], seat["end_stack"], *hole_card)]
+    parts += [bytes([len(hand["board"])]), bytes(hand["board"])]
+    parts.append(struct.pack("<H", len(hand["actions"])))
+    parts += [self.ACTION.pack(action["street"], action["seat"], self.ACTION_CODES[action["action"]],
+      action["amount"]) for action in hand["actions"]]
+    parts += [self.POT.pack(hand["pot"], len(hand["winners"])), bytes(hand["winners"])]
+    payload = b"".join(parts)
+    return self.LENGTH.pack(len(payload)) + payload
+
+  @classmethod
+  def decode(self, buf, offset=0):
+    round_count, sb_amount, ante, nb_seat, dealer_btn, sb_pos, bb_pos = self.RULE.unpack_from(buf, offset)
+    offset += self.RULE.size
+    seats = []
+    for _ in range(nb_seat):
+      uuid_size = buf[offset]
+      uuid = bytes(buf[offset+1:offset+1+uuid_size]).decode("utf-8")
+      offset += 1 + uuid_size
+      stack, end_stack, card1, card2 = self.SEAT.unpack_from(buf, offset)
+      offset += self.SEAT.size
+      seats.append({ "uuid": uuid, "stack": stack, "end_stack": end_stack,
+        "hole_card": [card for card in [card1, card2] if card != 0] })
+    board_size = buf[offset]
+    board = list(buf[offset+1:offset+1+board_size])
+    offset += 1 + board_size
+    nb_action = struct.unpack_from("<H", buf, offset)[0]
+    offset += 2
+    actions = []
+    for _ in range(nb_action):
+      street, seat, code, amount = self.ACTION.unpack_from(buf, offset)
+      offset += self.ACTION.size
+      actions.append({ "street": street, "seat": seat, "action": self.ACTIONS[code], "amount": amount })
+    pot, nb_winner = self.POT.unpack_from(buf, offset)
+    offset += self.POT.size
+    winners = list(buf[offset:offset+nb_winner])
+    return {
+        "round_count": round_count,
+        "small_blind_amount": sb_amount,
+        "ante": ante,
+        "dealer_btn": dealer_btn,
+        "sb_pos": sb_pos,
+        "bb_pos": bb_pos,
+        "seats": seats,
+        "actions": actions,
+        "board": board,
+        "pot": pot,
+        "winners": winners
+        }
+
+
+class HandHistoryWriter:
+  """Appends encoded rounds to file_path (which gets the format header when it is new or empty)"""
+
+  def __init__(self, file_path):
+    self.file = open(file_path, "ab")
+    if self.file.tell() == 0: self.file.write(HandHistory.MAGIC)
+
+  def write(self, hand):
+    self.file.write(HandHistory.encode(hand))
+
+  def close(self):
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+
+class HandHistoryReader:
+  """
+  Memory-maps a hand history file and indexes the offset of every record by walking the length
+  prefixes, so rounds are only decoded when they are iterated over or accessed by index.
+  """
+
+  def __init__(self, file_path):
+    self.file = open(file_path, "rb")
+    self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+    if self.buf[:len(HandHistory.MAGIC)] != HandHistory.MAGIC:
+      self.close()
+      raise ValueError("[%s] is not a hand history file" % file_path)
+    self.offsets = self.__index()
+
+  def __len__(self):
+    return len(self.offsets)
+
+  def __getitem__(self, idx):
+    return HandHistory.decode(self.buf, self.offsets[idx])
+
+  def __iter__(self):
+    for offset in self.offsets:
+      yield HandHistory.decode(self.buf, offset)
+
+  def close(self):
+    self.buf.close()
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def __index(self):
+    offsets = array("Q")
+    offset, size = len(HandHistory.MAGIC), len(self.buf)
+    while offset + HandHistory.LENGTH.size <= size:
+      length = HandHistory.LENGTH.unpack_from(self.buf, offset)[0]
+      if offset + HandHistory.LENGTH.size + length > size: break  # truncated by an interrupted write
+      offsets.append(offset + HandHistory.LENGTH.size)
+      offset += HandHistory.LENGTH.size + length
+    return offsets
+
+
+class HandHistoryRecorder:
+  """
+  Collects the round played by a Dealer or an Emulator (start_round after the round is dealt, action
+  before every action is applied, finish_round once it is over) and writes it to writer.
+  """
+
+  def __init__(self, writer):
+    self.writer = writer
+    self.hand = None
+
+  def start_round(self, state, ante):
+    table = state["table"]
+    players = table.seats.players
+    self.hand = {
+        "round_count": state["round_count"],
+        "small_blind_amount": state["small_blind_amount"],
+        "ante": ante,
+        "dealer_btn": table.dealer_btn,
+        "sb_pos": table.sb_pos(),
+        "bb_pos": table.bb_pos(),
+        "seats": [{ "uuid": player.uuid, "stack": player.stack + player.pay_info.amount,
+          "hole_card": [card.to_id() for card in player.hole_card] } for player in players],
+        "actions": []
+        }
+
+  def action(self, state, action, amount):
+    if self.hand is None: return
+    players = state["table"].seats.players
+    action, amount = ActionChecker.correct_action(\
+        players, state["next_player"], state["small_blind_amount"], action, amount)
+    self.hand["actions"].append({ "street": state["street"], "seat": state["next_player"],
+      "action": action, "amount": amount if action != "fold" else 0 })
+
+  def finish_round(self, state):
+    if self.hand is None: return
+    players = state["table"].seats.players
+    uuids = [player.uuid for player in players]
+    for seat, player in zip(self.hand["seats"], players):
+      seat["end_stack"] = player.stack
+    round_result = state["round_result"]
+    self.hand["board"] = [card.to_id() for card in round_result["community_card"]]
+    self.hand["pot"] = round_result["pot"]
+    self.hand["winners"] = [uuids.index(uuid) for uuid in round_result["winners"]]
+    self.writer.write(self.hand)
+    self.hand = None
@@ -0,0 +1,52 @@
+from bisect import bisect_left
+
+class LatencyHistogram:
+  """
+  Histogram of the decision latencies of one player, in seconds. The buckets are bounded by powers of
+  two from 1ms up to about 2 minutes (plus one bucket for the slower decisions), so percentiles are
+  reported as the upper bound of the bucket they fall into. Decisions which missed the action deadline
+  are counted in timeouts (their latency is the deadline).
+  """
+
+  BUCKET_BOUNDS = [0.001 * 2**i for i in range(18)]
+
+  def __init__(self, bounds=None):
+    self.bounds = bounds if bounds else self.BUCKET_BOUNDS
+    self.bucket_counts = [0] * (len(self.bounds) + 1)
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+    self.timeouts = 0
+
+  def add(self, seconds, timed_out=False):
+    self.bucket_counts[bisect_left(self.bounds, seconds)] += 1
+    self.count += 1
+    self.total += seconds
+    self.max = max(self.max, seconds)
+    if timed_out: self.timeouts += 1
+
+  def mean(self):
+    return self.total / self.count if self.count else 0.0
+
+  def percentile(self, percent):
+    if self.count == 0: return 0.0
+    rank = percent / 100.0 * self.count
+    cumulative = 0
+    for idx, bucket_count in enumerate(self.bucket_counts):
+      cumulative += bucket_count
+      if cumulative >= rank and bucket_count != 0:
+        return min(self.bounds[idx], self.max) if idx < len(self.bounds) else self.max
+    return self.max
+
+  def to_dict(self):
+    return {
+        "count": self.count,
+        "mean": self.mean(),
+        "max": self.max,
+        "p50": self.percentile(50),
+        "p90": self.percentile(90),
+        "p99": self.percentile(99),
+        "timeouts": self.timeouts,
+        "bucket_bounds": self.bounds,
+        "bucket_counts": self.bucket_counts
+        }
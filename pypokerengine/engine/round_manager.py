@@ -7,39 +7,172 @@ from pypokerengine.engine.poker_constants import PokerConstants as Const
 from pypokerengine.engine.action_checker import ActionChecker
 from pypokerengine.engine.game_evaluator import GameEvaluator
 from pypokerengine.engine.message_builder import MessageBuilder
+from pypokerengine.engine.engine_stats import EngineStats
 
 class RoundManager:
 
   @classmethod
-  def start_new_round(self, round_count, small_blind_amount, ante_amount, table):
+  def start_new_round(self, round_count, small_blind_amount, ante_amount, table, rng=None, stats=None, message_types=None):
     _state = self.__gen_initial_state(round_count, small_blind_amount, table)
     state = self.__deep_copy_state(_state)
     table = state["table"]
 
-    table.deck.shuffle()
+    table.deck.shuffle(rng)
     self.__correct_ante(ante_amount, table.seats.players)
     self.__correct_blind(small_blind_amount, table)
     self.__deal_holecard(table.deck, table.seats.players)
-    start_msg = self.__round_start_message(round_count, table)
-    state, street_msgs = self.__start_street(state)
+    start_msg = self.__round_start_message(round_count, table, stats, message_types)
+    state, street_msgs = self.__start_street(state, stats, message_types)
     return state, start_msg + street_msgs
 
   @classmethod
-  def apply_action(self, original_state, action, bet_amount):
+  def apply_action(self, original_state, action, bet_amount, stats=None, message_types=None):
     state = self.__deep_copy_state(original_state)
     state = self.__update_state_by_action(state, action, bet_amount)
-    update_msg = self.__update_message(state, action, bet_amount)
+    update_msg = self.__update_message(state, action, bet_amount, stats, message_types)
     if self.__is_everyone_agreed(state):
       [player.save_street_action_histories(state["street"]) for player in state["table"].seats.players]
       state["street"] += 1
-      state, street_msgs = self.__start_street(state)
-      return state, [update_msg] + street_msgs
+      state, street_msgs = self.__start_street(state, stats, message_types)
+      return state, update_msg + street_msgs
     else:
       state["next_player"] = state["table"].next_ask_waiting_player_pos(state["next_player"])
       next_player_pos = state["next_player"]
       next_player = state["table"].seats.players[next_player_pos]
-      ask_message = (next_player.uuid, MessageBuilder.build_ask_message(next_player_pos, state))
-      return state, [update_msg, ask_message]
+      ask_message = (next_player.uuid, self.__build_message(stats, MessageBuilder.build_ask_message, next_player_pos, state))
+      return state, update_msg + [ask_message]
+
+  @classmethod
+  def apply_action_inplace(self, state, action, bet_amount, deal_runout=True):
+    """
+    Applies the action to state itself (no copy and no message) and returns the undo record which
+    undo_action takes to put state back exactly as it was. The record only holds what the action
+    changed: the acting player's chips, pay info and history size, the street histories saved, the
+    number of community cards drawn and, when the round ended, the objects replaced by the showdown.
+    If deal_runout is False, a round which nobody can bet in any more is left at the start of its
+    next street (see is_runout) instead of being dealt out to the showdown.
+    """
+    if state["street"] == Const.Street.FINISHED:
+      raise ValueError("Street is already finished [street = %d]" % state["street"])
+    player = state["table"].seats.players[state["next_player"]]
+    undo = {
+        "street": state["street"],
+        "next_player": state["next_player"],
+        "player": (player, player.stack, player.pay_info.amount, player.pay_info.status, len(player.action_histories)),
+        "saved_street": None,
+        "community_card_num": 0,
+        "showdown": None
+        }
+    self.__update_state_by_action(state, action, bet_amount)
+    if self.__is_everyone_agreed(state):
+      players = state["table"].seats.players
+      undo["saved_street"] = (state["street"], [player.round_action_histories[state["street"]] for player in players])
+      [player.save_street_action_histories(state["street"]) for player in players]
+      state["street"] += 1
+      self.__start_street_inplace(state, undo, deal_runout)
+    else:
+      state["next_player"] = state["table"].next_ask_waiting_player_pos(state["next_player"])
+    return undo
+
+  @classmethod
+  def is_runout(self, state):
+    """
+    Returns True if state is at the start of a street (before its cards are dealt) and only has its
+    community cards left to deal: two players or more are in the hand but at most one can still bet.
+    """
+    seats = state["table"].seats
+    return state["street"] in [Const.Street.FLOP, Const.Street.TURN, Const.Street.RIVER] and\
+        seats.count_active_players() >= 2 and seats.count_ask_wait_players() <= 1 and\
+        self.is_street_start(state)
+
+  @classmethod
+  def is_street_start(self, state):
+    """Returns True if nobody has acted yet on the street of state, so that every bet of the round is matched"""
+    return all([len(player.action_histories) == 0 for player in state["table"].seats.players])
+
+  @classmethod
+  def undo_action(self, state, undo):
+    table = state["table"]
+    if undo["showdown"] is not None:
+      self.__undo_showdown(state, undo["showdown"])
+    for _ in range(undo["community_card_num"]):
+      table.deck.deck.append(table._community_card.pop())
+    if undo["saved_street"] is not None:
+      street, round_action_histories = undo["saved_street"]
+      for player, histories in zip(table.seats.players, round_action_histories):
+        player.action_histories = player.round_action_histories[street]
+        player.round_action_histories[street] = histories
+    player, stack, amount, status, history_size = undo["player"]
+    player.stack = stack
+    player.pay_info.amount, player.pay_info.status = amount, status
+    del player.action_histories[history_size:]
+    state["street"], state["next_player"] = undo["street"], undo["next_player"]
+
+  @classmethod
+  def __start_street_inplace(self, state, undo, deal_runout=True):
+    table = state["table"]
+    state["next_player"] = table.next_ask_waiting_player_pos(table.sb_pos()-1)
+    street = state["street"]
+    if not deal_runout and self.is_runout(state):
+      return
+    if street == Const.Street.PREFLOP:
+      for i in range(2):
+        state["next_player"] = table.next_ask_waiting_player_pos(state["next_player"])
+    elif street in [Const.Street.FLOP, Const.Street.TURN, Const.Street.RIVER]:
+      card_num = 3 if street == Const.Street.FLOP else 1
+      for card in table.deck.draw_cards(card_num):
+        table.add_community_card(card)
+      undo["community_card_num"] += card_num
+    elif street == Const.Street.SHOWDOWN:
+      return self.__showdown_inplace(state, undo)
+    else:
+      raise ValueError("Street is already finished [street = %d]" % street)
+    if table.seats.count_ask_wait_players() <= 1:
+      state["street"] += 1
+      self.__start_street_inplace(state, undo, deal_runout)
+
+  @classmethod
+  def __showdown_inplace(self, state, undo):
+    table = state["table"]
+    winners, _hand_info, prize_map = GameEvaluator.judge(table)
+    undo["showdown"] = {
+        "prize_map": prize_map,
+        "round_result": state.get("round_result"),
+        "deck": table.deck.deck,
+        "community_card": table._community_card,
+        "players": [(player.hole_card, player.round_action_histories, player.action_histories, player.pay_info)
+          for player in table.seats.players]
+        }
+    self.__prize_to_winners(table.seats.players, prize_map)
+    state["round_result"] = self.__round_result(winners, prize_map, state["table"])
+    table.reset()
+    state["street"] += 1
+
+  @classmethod
+  def __undo_showdown(self, state, showdown):
+    table = state["table"]
+    table.deck.deck, table._community_card = showdown["deck"], showdown["community_card"]
+    for player, saved in zip(table.seats.players, showdown["players"]):
+      player.hole_card, player.round_action_histories, player.action_histories, player.pay_info = saved
+    for idx, prize in showdown["prize_map"].items():
+      table.seats.players[idx].stack -= prize
+    if showdown["round_result"] is None:
+      state.pop("round_result", None)
+    else:
+      state["round_result"] = showdown["round_result"]
+
+  # Notifications of the message types which are not listed in message_types (if given) are not built.
+  @classmethod
+  def __is_wanted(self, message_types, message_type):
+    return message_types is None or message_type in message_types
+
+  @classmethod
+  def __build_message(self, stats, builder, *args):
+    if stats is None: return builder(*args)
+    started_at = stats.clock()
+    message = builder(*args)
+    stats.add(EngineStats.MESSAGE_BUILD, stats.clock() - started_at)
+    return message
 
   @classmethod
   def __correct_ante(self, ante_amount, players):
@@ -69,53 +202,70 @@ class RoundManager:
       player.add_holecard(deck.draw_cards(2))
 
   @classmethod
-  def __start_street(self, state):
+  def __start_street(self, state, stats=None, message_types=None):
     next_player_pos = state["table"].next_ask_waiting_player_pos(state["table"].sb_pos()-1)
     state["next_player"] = next_player_pos
     street = state["street"]
     if street == Const.Street.PREFLOP:
-      return self.__preflop(state)
+      return self.__preflop(state, stats, message_types)
     elif street == Const.Street.FLOP:
-      return self.__flop(state)
+      return self.__flop(state, stats, message_types)
     elif street == Const.Street.TURN:
-      return self.__turn(state)
+      return self.__turn(state, stats, message_types)
     elif street == Const.Street.RIVER:
-      return self.__river(state)
+      return self.__river(state, stats, message_types)
     elif street == Const.Street.SHOWDOWN:
-      return self.__showdown(state)
+      return self.__showdown(state, stats, message_types)
     else:
       raise ValueError("Street is already finished [street = %d]" % street)
 
   @classmethod
-  def __preflop(self, state):
+  def __preflop(self, state, stats, message_types):
     for i in range(2):
       state["next_player"] = state["table"].next_ask_waiting_player_pos(state["next_player"])
-    return self.__forward_street(state)
+    return self.__forward_street(state, stats, message_types)
 
   @classmethod
-  def __flop(self, state):
+  def __flop(self, state, stats, message_types):
     for card in state["table"].deck.draw_cards(3):
       state["table"].add_community_card(card)
-    return self.__forward_street(state)
+    return self.__forward_street(state, stats, message_types)
 
   @classmethod
-  def __turn(self, state):
+  def __turn(self, state, stats, message_types):
     state["table"].add_community_card(state["table"].deck.draw_card())
-    return self.__forward_street(state)
+    return self.__forward_street(state, stats, message_types)
 
   @classmethod
-  def __river(self, state):
+  def __river(self, state, stats, message_types):
     state["table"].add_community_card(state["table"].deck.draw_card())
-    return self.__forward_street(state)
+    return self.__forward_street(state, stats, message_types)
 
   @classmethod
-  def __showdown(self, state):
-    winners, hand_info, prize_map = GameEvaluator.judge(state["table"])
+  def __showdown(self, state, stats, message_types):
+    if stats is None:
+      winners, hand_info, prize_map = GameEvaluator.judge(state["table"])
+    else:
+      started_at = stats.clock()
+      winners, hand_info, prize_map = GameEvaluator.judge(state["table"])
+      stats.add(EngineStats.SHOWDOWN, stats.clock() - started_at)
     self.__prize_to_winners(state["table"].seats.players, prize_map)
-    result_message = MessageBuilder.build_round_result_message(state["round_count"], winners, hand_info, state)
+    state["round_result"] = self.__round_result(winners, prize_map, state["table"])
+    result_msg = []
+    if self.__is_wanted(message_types, MessageBuilder.ROUND_RESULT_MESSAGE):
+      result_msg = [(-1, self.__build_message(stats, MessageBuilder.build_round_result_message,
+        state["round_count"], winners, hand_info, state))]
     state["table"].reset()
     state["street"] += 1
-    return state, [(-1, result_message)]
+    return state, result_msg
+
+  @classmethod
+  def __round_result(self, winners, prize_map, table):
+    return {
+        "winners": [winner.uuid for winner in winners],
+        "pot": sum(prize_map.values()),
+        "community_card": table.get_community_card()
+        }
 
   @classmethod
   def __prize_to_winners(self, players, prize_map):
@@ -123,24 +273,28 @@ class RoundManager:
       players[idx].append_chip(prize)
 
   @classmethod
-  def __round_start_message(self, round_count, table):
+  def __round_start_message(self, round_count, table, stats, message_types):
+    if not self.__is_wanted(message_types, MessageBuilder.ROUND_START_MESSAGE): return []
     players = table.seats.players
-    gen_msg = lambda idx: (players[idx].uuid, MessageBuilder.build_round_start_message(round_count, idx, table.seats))
+    gen_msg = lambda idx: (players[idx].uuid,
+        self.__build_message(stats, MessageBuilder.build_round_start_message, round_count, idx, table.seats))
     return reduce(lambda acc, idx: acc + [gen_msg(idx)], range(len(players)), [])
 
   @classmethod
-  def __forward_street(self, state):
+  def __forward_street(self, state, stats, message_types):
     table = state["table"]
-    street_start_msg = [(-1, MessageBuilder.build_street_start_message(state))]
-    if table.seats.count_active_players() == 1: street_start_msg = []
+    street_start_msg = []
+    if table.seats.count_active_players() != 1 and\
+        self.__is_wanted(message_types, MessageBuilder.STREET_START_MESSAGE):
+      street_start_msg = [(-1, self.__build_message(stats, MessageBuilder.build_street_start_message, state))]
     if table.seats.count_ask_wait_players() <= 1:
       state["street"] += 1
-      state, messages = self.__start_street(state)
+      state, messages = self.__start_street(state, stats, message_types)
       return state, street_start_msg + messages
     else:
       next_player_pos = state["next_player"]
       next_player = table.seats.players[next_player_pos]
-      ask_message = [(next_player.uuid, MessageBuilder.build_ask_message(next_player_pos, state))]
+      ask_message = [(next_player.uuid, self.__build_message(stats, MessageBuilder.build_ask_message, next_player_pos, state))]
       return state, street_start_msg + ask_message
 
   @classmethod
@@ -177,9 +331,10 @@ class RoundManager:
     player.pay_info.update_by_pay(need_amount)
 
   @classmethod
-  def __update_message(self, state, action, bet_amount):
-    return (-1, MessageBuilder.build_game_update_message(
-      state["next_player"], action, bet_amount, state))
+  def __update_message(self, state, action, bet_amount, stats, message_types):
+    if not self.__is_wanted(message_types, MessageBuilder.GAME_UPDATE_MESSAGE): return []
+    return [(-1, self.__build_message(stats, MessageBuilder.build_game_update_message,
+      state["next_player"], action, bet_amount, state))]
 
   @classmethod
   def __is_everyone_agreed(self, state):
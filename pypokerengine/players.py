@@ -10,8 +10,15 @@ class BasePokerPlayer(object):
   - receive_street_start_message
   - receive_game_update_message
   - receive_round_result_message
+
+  Players which only consume some notifications can list their message types
+  (e.g. ["game_start_message", "round_start_message"]) in subscribed_message_types.
+  The dealer then neither delivers the other notifications to them nor builds
+  notifications which no player subscribes to. None subscribes to every message.
   """
 
+  subscribed_message_types = None
+
   def __init__(self):
     pass
 
@@ -7,9 +7,9 @@ from pypokerengine.engine.hand_evaluator import HandEvaluator
 def gen_cards(cards_str):
     return [Card.from_str(s) for s in cards_str]
 
-def estimate_hole_card_win_rate(nb_simulation, nb_player, hole_card, community_card=None):
+def estimate_hole_card_win_rate(nb_simulation, nb_player, hole_card, community_card=None, rng=None):
     if not community_card: community_card = []
-    win_count = sum([_montecarlo_simulation(nb_player, hole_card, community_card) for _ in range(nb_simulation)])
+    win_count = sum([_montecarlo_simulation(nb_player, hole_card, community_card, rng) for _ in range(nb_simulation)])
     return 1.0 * win_count / nb_simulation
 
 def gen_deck(exclude_cards=None):
@@ -30,21 +30,21 @@ def evaluate_hand(hole_card, community_card):
             "strength": HandEvaluator.eval_hand(hole_card, community_card)
             }
 
-def _montecarlo_simulation(nb_player, hole_card, community_card):
-    community_card = _fill_community_card(community_card, used_card=hole_card+community_card)
-    unused_cards = _pick_unused_card((nb_player-1)*2, hole_card + community_card)
+def _montecarlo_simulation(nb_player, hole_card, community_card, rng=None):
+    community_card = _fill_community_card(community_card, used_card=hole_card+community_card, rng=rng)
+    unused_cards = _pick_unused_card((nb_player-1)*2, hole_card + community_card, rng)
     opponents_hole = [unused_cards[2*i:2*i+2] for i in range(nb_player-1)]
     opponents_score = [HandEvaluator.eval_hand(hole, community_card) for hole in opponents_hole]
     my_score = HandEvaluator.eval_hand(hole_card, community_card)
     return 1 if my_score >= max(opponents_score) else 0
 
-def _fill_community_card(base_cards, used_card):
+def _fill_community_card(base_cards, used_card, rng=None):
     need_num = 5 - len(base_cards)
-    return base_cards + _pick_unused_card(need_num, used_card)
+    return base_cards + _pick_unused_card(need_num, used_card, rng)
 
-def _pick_unused_card(card_num, used_card):
+def _pick_unused_card(card_num, used_card, rng=None):
     used = [card.to_id() for card in used_card]
     unused = [card_id for card_id in range(1, 53) if card_id not in used]
-    choiced = random.sample(unused, card_num)
+    choiced = (rng or random).sample(unused, card_num)
     return [Card.from_id(card_id) for card_id in choiced]
 
@@ -0,0 +1,73 @@
+import itertools
+import math
+
+from pypokerengine.engine.card import Card
+from pypokerengine.engine.hand_evaluator import HandEvaluator
+from pypokerengine.engine.game_evaluator import GameEvaluator
+from pypokerengine.engine.poker_constants import PokerConstants as Const
+from pypokerengine.utils.rng_utils import make_rng
+
+class StreetEndEvaluator(object):
+    """
+    Scores a game state stopped before the end of its round (see Emulator.run_until_street) by the
+    stacks its players are expected to end the round with: their stack behind plus their equity in
+    each pot (side pots included) over the runouts of the community cards left to deal.
+
+    The runouts are enumerated when there are at most nb_sample of them, and nb_sample of them are
+    drawn otherwise from a random number generator seeded by the cards, so that a position always gets
+    the same value. The hand scores of the last cache_size positions are kept, so scoring a position
+    again (with other bets) only splits the pots.
+    """
+
+    def __init__(self, nb_sample=20, cache_size=10000):
+        self.nb_sample = nb_sample
+        self.cache_size = cache_size
+        self.cache = {}
+
+    def expected_stacks(self, game_state):
+        """
+        Returns the expected stacks of the players of game_state at the end of its round, in seat order.
+        The stacks of a finished round are returned as they are.
+        """
+        players = game_state["table"].seats.players
+        stacks = [player.stack for player in players]
+        if game_state["street"] == Const.Street.FINISHED:
+            return stacks
+        scores = self._fetch_scores(game_state["table"])
+        for pot in GameEvaluator.create_pot(players):
+            contenders = [players.index(player) for player in pot["eligibles"] if player.is_active()]
+            if len(contenders) == 0: continue
+            for runout_scores in scores:
+                best_score = max([runout_scores[idx] for idx in contenders])
+                winners = [idx for idx in contenders if runout_scores[idx] == best_score]
+                prize = 1.0 * int(pot["amount"] / len(winners)) / len(scores)
+                for idx in winners:
+                    stacks[idx] += prize
+        return stacks
+
+    def _fetch_scores(self, table):
+        players = table.seats.players
+        community_card_ids = tuple([card.to_id() for card in table.get_community_card()])
+        hole_card_ids = tuple([(idx, tuple([card.to_id() for card in player.hole_card]))
+            for idx, player in enumerate(players) if player.is_active()])
+        deck_ids = tuple(sorted([card.to_id() for card in table.deck.deck]))
+        key = (community_card_ids, hole_card_ids, deck_ids)
+        if key not in self.cache:
+            if len(self.cache) >= self.cache_size: self.cache.clear()
+            self.cache[key] = self._gen_scores(key)
+        return self.cache[key]
+
+    def _gen_scores(self, key):
+        community_card_ids, hole_card_ids, deck_ids = key
+        need_num = 5 - len(community_card_ids)
+        if math.comb(len(deck_ids), need_num) <= self.nb_sample:
+            runouts = itertools.combinations(deck_ids, need_num)
+        else:
+            rng = make_rng(key)
+            runouts = [rng.sample(deck_ids, need_num) for _ in range(self.nb_sample)]
+        hole_cards = [(idx, [Card.from_id(cid) for cid in ids]) for idx, ids in hole_card_ids]
+        scores = []
+        for runout in runouts:
+            community_card = [Card.from_id(cid) for cid in community_card_ids + tuple(runout)]
+            scores.append({ idx: HandEvaluator.eval_hand(hole_card, community_card) for idx, hole_card in hole_cards })
+        return scores
@@ -8,14 +8,20 @@ from pypokerengine.engine.player import Player
 from pypokerengine.engine.pay_info import PayInfo
 from pypokerengine.engine.data_encoder import DataEncoder
 from pypokerengine.engine.poker_constants import PokerConstants as Const
+from pypokerengine.engine.round_manager import RoundManager
 
 def restore_game_state(round_state):
+    """
+    Rebuilds the game state which round_state was encoded from. The parts of the restoration which
+    only depend on round_state are kept for the last round_state object passed, so restoring the same
+    (unmodified) round_state for every rollout of a decision only rebuilds the objects of the table.
+    """
     return {
             "round_count": round_state["round_count"],
             "small_blind_amount": round_state["small_blind_amount"],
             "street": _street_flg_translator[round_state["street"]],
             "next_player": round_state["next_player"],
-            "table": _restore_table(round_state)
+            "table": _restore_table(round_state, _fetch_restore_plan(round_state))
             }
 
 def attach_hole_card_from_deck(game_state, uuid):
@@ -44,6 +50,51 @@ def attach_hole_card(game_state, uuid, hole_card):
     target[0].hole_card = hole_card
     return deepcopy
 
+def attach_hole_cards(game_state, hole_cards, rng=None):
+    """
+    Returns a copy of game_state in which the players of hole_cards (a dict of uuid to list of Card)
+    hold their cards and every other player is dealt two cards from the deck, shuffled with rng first
+    if it is given. The known cards are taken out of the deck, and game_state is copied only once.
+    """
+    return gen_hole_card_attached_states(game_state, hole_cards, 1, rng)[0]
+
+def gen_hole_card_attached_states(game_state, hole_cards, nb_state, rng=None):
+    """
+    Returns nb_state copies of game_state whose hole cards are attached as by attach_hole_cards (with
+    the same rng, so that every copy is dealt differently when rng is given).
+    """
+    uuids = [player.uuid for player in game_state["table"].seats.players]
+    for uuid in hole_cards:
+        if uuid not in uuids:
+            raise Exception('The player whose uuid is "%s" is not found in passed game_state.' % uuid)
+    known_mask = reduce(lambda mask, card: mask | 1 << card.to_id(),
+            [card for cards in hole_cards.values() for card in cards], 0)
+    serial = game_state["table"].serialize()
+    states = []
+    for _ in range(nb_state):
+        table = Table.deserialize(serial)
+        _deal_hole_cards(table, hole_cards, known_mask, rng)
+        states.append({
+            "round_count": game_state["round_count"],
+            "small_blind_amount": game_state["small_blind_amount"],
+            "street": game_state["street"],
+            "next_player": game_state["next_player"],
+            "table": table
+            })
+    return states
+
+def _deal_hole_cards(table, hole_cards, known_mask, rng):
+    deck = table.deck
+    if known_mask != 0:
+        deck.deck = [card for card in deck.deck if not known_mask >> card.to_id() & 1]
+    if rng is not None:
+        rng.shuffle(deck.deck)
+    for player in table.seats.players:
+        if player.uuid in hole_cards:
+            player.hole_card = hole_cards[player.uuid][::]
+        else:
+            player.hole_card = deck.draw_cards(2)
+
 def replace_community_card(game_state, community_card):
     deepcopy = deepcopy_game_state(game_state)
     deepcopy["table"]._community_card = community_card
@@ -59,6 +110,52 @@ def deepcopy_game_state(game_state):
             "table": tabledeepcopy
             }
 
+def replay_game_state(hand, action_index=None):
+    """
+    Rebuilds the game state of a recorded round (see pypokerengine.engine.hand_history) just before
+    its action_index-th action (after all of its actions if action_index is None). The round is dealt
+    once from a cheat deck holding the recorded cards and the actions are then applied in place.
+    Players are named by their uuid and the cards which were not dealt are left in id order.
+    """
+    game_state = _start_replay(hand)
+    actions = hand["actions"] if action_index is None else hand["actions"][:action_index]
+    for action in actions:
+        _replay_action(game_state, action)
+    return game_state
+
+def iter_decision_points(hands):
+    """
+    Yields (hand, action_index, game_state) for every recorded action of hands, game_state being the
+    state in which the action was declared. The same game_state object is updated in place from one
+    decision to the next, so take a copy (deepcopy_game_state) of the states which are kept.
+    """
+    for hand in hands:
+        game_state = _start_replay(hand)
+        for action_index, action in enumerate(hand["actions"]):
+            yield hand, action_index, game_state
+            _replay_action(game_state, action)
+
+def _start_replay(hand):
+    hole_card_ids = reduce(lambda acc, seat: acc + seat["hole_card"], hand["seats"], [])
+    used_ids = hole_card_ids + hand["board"]
+    card_ids = used_ids + [cid for cid in range(1, 53) if cid not in used_ids]
+    table = Table(cheat_deck=Deck(cheat=True, cheat_card_ids=card_ids))
+    for seat in hand["seats"]:
+        player = Player(seat["uuid"], seat["stack"], seat["uuid"])
+        if seat["stack"] == 0: player.pay_info.update_to_fold()
+        table.seats.sitdown(player)
+    table.dealer_btn = hand["dealer_btn"]
+    table.set_blind_pos(hand["sb_pos"], hand["bb_pos"])
+    game_state, _messages = RoundManager.start_new_round(\
+            hand["round_count"], hand["small_blind_amount"], hand["ante"], table, message_types=[])
+    return game_state
+
+def _replay_action(game_state, action):
+    if game_state["next_player"] != action["seat"] or game_state["street"] != action["street"]:
+        raise ValueError("Recorded action %s does not match the replayed state (street = %d, next_player = %s)"
+                % (action, game_state["street"], game_state["next_player"]))
+    RoundManager.apply_action_inplace(game_state, action["action"], action["amount"])
+
 _street_flg_translator = {
         "preflop": Const.Street.PREFLOP,
         "flop": Const.Street.FLOP,
@@ -67,67 +164,67 @@ _street_flg_translator = {
         "showdown": Const.Street.SHOWDOWN
         }
 
-def _restore_table(round_state):
-    table = Table()
+# (round_state, restore plan) of the last restored round_state, replaced as a whole to stay thread safe
+_last_restore_plan = (None, None)
+
+def _fetch_restore_plan(round_state):
+    global _last_restore_plan
+    cached_round_state, plan = _last_restore_plan
+    if cached_round_state is not round_state:
+        plan = _gen_restore_plan(round_state)
+        _last_restore_plan = (round_state, plan)
+    return plan
+
+def _gen_restore_plan(round_state):
+    community_card_ids = [Card.from_str(s).to_id() for s in round_state["community_card"]]
+    exclude_mask = reduce(lambda mask, cid: mask | 1 << cid, community_card_ids, 0)
+    seats_info = round_state["seats"]
+    seat_index = {}
+    for idx, info in enumerate(seats_info): seat_index.setdefault(info["uuid"], idx)
+    round_action_histories = [[None for _ in range(4)] for _ in seats_info]
+    action_histories = [[] for _ in seats_info]
+    pay_amounts = [0 for _ in seats_info]
+
+    histories = round_state["action_histories"]
+    ordered_street_names = sorted(histories.keys(), key=lambda x:_street_flg_translator[x])
+    current_street_name = ordered_street_names[-1]
+    for street_name in ordered_street_names:
+        street_flg = _street_flg_translator[street_name]
+        if street_name != current_street_name:
+            for player_histories in round_action_histories: player_histories[street_flg] = []
+        for action_history in histories[street_name]:
+            idx = seat_index[action_history["uuid"]]
+            if street_name == current_street_name:
+                action_histories[idx].append(action_history)
+            else:
+                round_action_histories[idx][street_flg].append(action_history)
+            pay_amounts[idx] += _fetch_pay_amount(action_history)
+
+    return {
+            "community_card_ids": community_card_ids,
+            "deck_ids": [cid for cid in range(1, 53) if not exclude_mask >> cid & 1],
+            "players": [(info["uuid"], info["stack"], info["name"], round_action_histories[idx],
+                action_histories[idx], pay_amounts[idx], _pay_info_state_translator[info["state"]])
+                for idx, info in enumerate(seats_info)]
+            }
+
+def _restore_table(round_state, plan):
+    table = Table(cheat_deck=Deck(deck_ids=plan["deck_ids"]))
     table.dealer_btn = round_state["dealer_btn"]
     table.set_blind_pos(round_state["small_blind_pos"], round_state["big_blind_pos"])
-    _restore_community_card_on_table(table, round_state["community_card"])
-    table.deck = _restore_deck(round_state["community_card"])
-    table.seats = _restore_seats(round_state["seats"], round_state["action_histories"])
+    for cid in plan["community_card_ids"]:
+        table.add_community_card(Card.from_id(cid))
+    table.seats = Seats()
+    table.seats.players = [_restore_player(*player_plan) for player_plan in plan["players"]]
     return table
 
-def _restore_community_card_on_table(table, card_data):
-    for str_card in card_data:
-        table.add_community_card(Card.from_str(str_card))
-
-def _restore_deck(str_exclude_cards):
-    deck = Deck()
-    exclude_ids = [Card.to_id(Card.from_str(s)) for s in str_exclude_cards]
-    deck_cards = [Card.from_id(cid) for cid in range(1, 53) if cid not in exclude_ids]
-    deck.deck = deck_cards
-    return deck
-
-def _restore_seats(seats_info, action_histories):
-    players = [Player(info["uuid"], info["stack"], info["name"]) for info in seats_info]
-    players_state = [info["state"] for info in seats_info]
-    _restore_action_histories_on_players(players, action_histories)
-    _restore_pay_info_on_players(players, players_state, action_histories)
-    seats = Seats()
-    seats.players = players
-    return seats
-
-def _restore_action_histories_on_players(players, round_action_histories):
-    ordered_street_names = sorted(round_action_histories.keys(), key=lambda x:_street_flg_translator[x])
-    current_street_name = ordered_street_names[-1]
-    past_street_names = ordered_street_names[:-1]
-
-    # restore round_action_histories
-    for street_name in past_street_names:
-        street_flg = _street_flg_translator[street_name]
-        action_histories = round_action_histories[street_name]
-        for player in players: player.round_action_histories[street_flg] = []
-        for action_history in action_histories:
-            player = _find_user_by_uuid(players, action_history["uuid"])
-            player.round_action_histories[street_flg].append(action_history)
-
-    # resotre action_histories
-    for action_history in round_action_histories[current_street_name]:
-        player = _find_user_by_uuid(players, action_history["uuid"])
-        player.action_histories.append(action_history)
-
-def _restore_pay_info_on_players(players, players_state, round_action_histories):
-    _restore_pay_info_status_on_players(players, players_state)
-    _restore_pay_info_amount_on_players(players, round_action_histories)
-
-def _restore_pay_info_amount_on_players(players, round_action_histories):
-    ordered_street_names = sorted(round_action_histories.keys(), key=lambda x:_street_flg_translator[x])
-    all_histories = reduce(lambda ary, key: ary + round_action_histories[key], ordered_street_names, [])
-    for action_history in all_histories:
-        player = _find_user_by_uuid(players, action_history["uuid"])
-        player.pay_info.amount += _fetch_pay_amount(action_history)
-
-def _find_user_by_uuid(players, uuid):
-    return [player for player in players if player.uuid==uuid][0]
+def _restore_player(uuid, stack, name, round_action_histories, action_histories, pay_amount, pay_status):
+    player = Player(uuid, stack, name)
+    player.round_action_histories = [histories[::] if histories is not None else None
+            for histories in round_action_histories]
+    player.action_histories = action_histories[::]
+    player.pay_info = PayInfo(pay_amount, pay_status)
+    return player
 
 def _fetch_pay_amount(action_history):
     action = action_history["action"]
@@ -140,10 +237,6 @@ def _fetch_pay_amount(action_history):
     raise Exception("Unexpected type of action_history is passed => %s" % action_history)
 
 
-def _restore_pay_info_status_on_players(players, players_state):
-    for player, state_str in zip(players, players_state):
-        player.pay_info.status = _pay_info_state_translator[state_str]
-
 _pay_info_state_translator = {
         DataEncoder.PAY_INFO_PAY_TILL_END_STR: PayInfo.PAY_TILL_END,
         DataEncoder.PAY_INFO_ALLIN_STR: PayInfo.ALLIN,
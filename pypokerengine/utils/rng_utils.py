@@ -0,0 +1,10 @@
+import hashlib
+import random
+
+def derive_seed(master_seed, *keys):
+    material = repr((master_seed,) + keys).encode("utf-8")
+    return int(hashlib.sha256(material).hexdigest()[:16], 16)
+
+def make_rng(master_seed, *keys):
+    return random.Random(derive_seed(master_seed, *keys))
+
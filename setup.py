@@ -10,9 +10,11 @@ setup(
     keywords = 'python poker emgine ai',
     url = 'https://github.com/ishikota/PyPokerEngine',
     packages = [pkg for pkg in find_packages() if pkg != "tests"],
+    python_requires = '>=3.8',
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "License :: OSI Approved :: MIT License",
+        "Programming Language :: Python :: 3 :: Only",
     ],
     )
 
@@ -0,0 +1,41 @@
+import shutil
+import tempfile
+from os.path import join
+
+from tests.base_unittest import BaseUnitTest
+from data_parsing.result_store import ResultStore, game_record, load_records
+from data_parsing.get_data_points import build_profit_table, profit_table_of_records
+
+STORE_FILE_NAME = "results.ndjson"
+
+class GetDataPointsTest(BaseUnitTest):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        store = ResultStore(join(self.tmp_dir, STORE_FILE_NAME))
+        for seed in range(11):
+            store.append(game_record("h", "RandomPlayer", 5 * (1 + seed % 2), 1, 100, seed, 1.5,
+                                     { "Stonks": 150 + 10 * seed, "Player1": 250 - 10 * seed }))
+        with open(join(self.tmp_dir, "h_RandomPlayer_5-rounds_1-others_100-playouts.json"), 'w') as result_file:
+            result_file.write('{"Stonks": 300, "Player1": 100}{"Stonks": 0, "Player1": 400}')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_profit_table_of_records(self):
+        table = profit_table_of_records(load_records(self.tmp_dir, STORE_FILE_NAME), "Stonks", 200)
+        self.eq([("h", "RandomPlayer", 5, 1, 100), ("h", "RandomPlayer", 10, 1, 100)], sorted(table))
+        five_rounds = table[("h", "RandomPlayer", 5, 1, 100)]
+        profits = [150 + 10 * seed - 200 for seed in range(0, 11, 2)] + [100, -200]
+        self.eq(len(profits), five_rounds.count)
+        self.assertAlmostEqual(1.0 * sum(profits) / len(profits), five_rounds.mean)
+
+    def test_build_profit_table_is_independent_of_workers(self):
+        expected = profit_table_of_records(load_records(self.tmp_dir, STORE_FILE_NAME), "Stonks", 200)
+        for max_workers in [1, 2, 3]:
+            table = build_profit_table(self.tmp_dir, STORE_FILE_NAME, "Stonks", 200, max_workers=max_workers)
+            self.eq(sorted(expected), sorted(table))
+            for combination, stats in expected.items():
+                self.eq(stats.count, table[combination].count)
+                self.assertAlmostEqual(stats.mean, table[combination].mean)
+                self.assertAlmostEqual(stats.variance(), table[combination].variance())
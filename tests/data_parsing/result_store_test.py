@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+import tempfile
+from os import listdir
+from os.path import join
+
+from tests.base_unittest import BaseUnitTest
+from data_parsing.result_store import ResultStore, game_record, legacy_records, load_records,\
+        decode_concatenated_json, LEGACY_FILE_NAME_PATTERN
+
+GAMEPLAY_DATA_DIR = join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'gameplay_data')
+
+class ResultStoreTest(BaseUnitTest):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = ResultStore(join(self.tmp_dir, "results.ndjson"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_append_and_read_records(self):
+        records = [game_record("h", "RandomPlayer", 5, others, 100, seed, 1.5, { "Stonks": 250, "Player1": 150 })
+                   for others, seed in [(1, 10), (3, 11), (1, 12)]]
+        for record in records:
+            self.store.append(record)
+        self.eq(records, list(self.store.records()))
+        self.eq([records[0], records[2]], list(self.store.records(others=1)))
+        self.eq([records[1]], list(self.store.records(others=3, seed=11)))
+
+    def test_missing_store_has_no_records(self):
+        self.eq([], list(self.store.records()))
+
+    def test_truncated_last_line_is_skipped(self):
+        record = game_record("h", "RandomPlayer", 5, 1, 100, 1, 1.5, { "Stonks": 250 })
+        self.store.append(record)
+        line = json.dumps(record)
+        with open(self.store.file_path, 'a') as store_file:
+            store_file.write(line[:len(line) // 2])
+        self.eq([record], list(self.store.records()))
+
+    def test_byte_ranges_read_every_record_once(self):
+        records = [game_record("h", "RandomPlayer", 5, 1, 100, seed, 1.5, { "Stonks": seed * 7 }) for seed in range(13)]
+        for record in records:
+            self.store.append(record)
+        size = os.path.getsize(self.store.file_path)
+        for nb_range in range(1, 30):
+            ranges = self.store.byte_ranges(nb_range)
+            self.true(len(ranges) <= nb_range)
+            self.eq(0, ranges[0][0])
+            self.eq(size, ranges[-1][1])
+            self.eq([start for start, _end in ranges[1:]], [end for _start, end in ranges[:-1]])
+            read = [record for start, end in ranges for record in self.store.records_between(start, end)]
+            self.eq(records, read)
+
+    def test_records_between_line_boundaries(self):
+        records = [game_record("h", "RandomPlayer", 5, 1, 100, seed, 1.5, { "Stonks": 200 }) for seed in range(3)]
+        for record in records:
+            self.store.append(record)
+        first_line_size = len(json.dumps(records[0], sort_keys=True)) + 1
+        # a range ending on a newline keeps the line before it, the next one starts with the following line
+        self.eq([records[0]], list(self.store.records_between(0, first_line_size)))
+        self.eq(records[1:], list(self.store.records_between(first_line_size, None)))
+        # a range splitting a line mid-record leaves the line to the range it starts in
+        self.eq(records[:2], list(self.store.records_between(0, first_line_size + 1)))
+        self.eq(records[2:], list(self.store.records_between(first_line_size + 1, None)))
+
+    def test_missing_store_has_no_byte_ranges(self):
+        self.eq([], self.store.byte_ranges(4))
+        self.eq([], list(self.store.records_between(0, 10)))
+
+    def test_decode_concatenated_json(self):
+        self.eq([{ "a": 1 }, { "b": { "c": 2 } }], decode_concatenated_json('{"a": 1}{"b": {"c": 2}}\n'))
+
+    def test_legacy_records(self):
+        file_path = join(self.tmp_dir, "nyu_heuristic_function_RandomPlayer_10-rounds_3-others_100-playouts.json")
+        with open(file_path, 'w') as result_file:
+            result_file.write('{"Stonks": 300, "Player1": 100}{"Stonks": 0, "Player1": 400}')
+        records = legacy_records(file_path)
+        self.eq(2, len(records))
+        self.eq(game_record("nyu_heuristic_function", "RandomPlayer", 10, 3, 100, None, None,
+                            { "Stonks": 300, "Player1": 100 }), records[0])
+        self.assertRaises(ValueError, legacy_records, join(self.tmp_dir, "results.ndjson"))
+
+    def test_legacy_records_match_split_averages(self):
+        file_names = [name for name in sorted(listdir(GAMEPLAY_DATA_DIR)) if LEGACY_FILE_NAME_PATTERN.match(name)]
+        self.true(len(file_names) != 0)
+        for file_name in file_names:
+            file_path = join(GAMEPLAY_DATA_DIR, file_name)
+            stacks = [record["stacks"]["Stonks"] for record in legacy_records(file_path)]
+            self.assertAlmostEqual(split_average_profit(file_path, "Stonks", 200), 1.0 * sum(stacks) / len(stacks) - 200)
+
+    def test_load_records(self):
+        record = game_record("nyu_heuristic_function", "RandomPlayer", 10, 3, 100, 1, 1.5, { "Stonks": 250 })
+        self.store.append(record)
+        with open(join(self.tmp_dir, "nyu_heuristic_function_RandomPlayer_10-rounds_3-others_100-playouts.json"), 'w') as result_file:
+            result_file.write('{"Stonks": 300}')
+        with open(join(self.tmp_dir, "nyu_heuristic_function_RandomPlayer_5-rounds_3-others_100-playouts.json"), 'w') as result_file:
+            result_file.write('{"Stonks": 0}')
+        records = load_records(self.tmp_dir, "results.ndjson", rounds=10)
+        self.eq([250, 300], [record["stacks"]["Stonks"] for record in records])
+
+def split_average_profit(file_name, bot_name, initial_stack):
+    # how get_data_points averaged the legacy files before they were parsed as records
+    with open(file_name, 'r') as gameplay_data_file:
+        results = gameplay_data_file.read().split('}')[:-1]
+    stacks = [json.loads(result + '}')[bot_name] for result in results]
+    return (sum(stacks) / len(stacks)) - initial_stack
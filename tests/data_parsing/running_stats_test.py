@@ -0,0 +1,46 @@
+import math
+
+from tests.base_unittest import BaseUnitTest
+from data_parsing.running_stats import RunningStats
+
+SAMPLES = [12.0, -40.0, 3.5, 0.0, 250.0, -200.0, 17.25, 8.0, -1.0]
+
+class RunningStatsTest(BaseUnitTest):
+
+    def test_add(self):
+        stats = self.__stats_of(SAMPLES)
+        mean = sum(SAMPLES) / len(SAMPLES)
+        variance = sum([(sample - mean) ** 2 for sample in SAMPLES]) / (len(SAMPLES) - 1)
+        self.eq(len(SAMPLES), stats.count)
+        self.assertAlmostEqual(mean, stats.mean)
+        self.assertAlmostEqual(variance, stats.variance())
+        self.assertAlmostEqual(math.sqrt(variance / len(SAMPLES)), stats.standard_error())
+
+    def test_merge_matches_single_pass(self):
+        expected = self.__stats_of(SAMPLES)
+        for split in range(len(SAMPLES) + 1):
+            stats = self.__stats_of(SAMPLES[:split])
+            stats.merge(self.__stats_of(SAMPLES[split:]))
+            self.eq(expected.count, stats.count)
+            self.assertAlmostEqual(expected.mean, stats.mean)
+            self.assertAlmostEqual(expected.variance(), stats.variance())
+
+    def test_merge_several_parts(self):
+        expected = self.__stats_of(SAMPLES)
+        stats = RunningStats()
+        for start in range(0, len(SAMPLES), 2):
+            stats.merge(self.__stats_of(SAMPLES[start:start + 2]))
+        self.eq(expected.count, stats.count)
+        self.assertAlmostEqual(expected.mean, stats.mean)
+        self.assertAlmostEqual(expected.variance(), stats.variance())
+
+    def test_few_samples(self):
+        self.eq(0.0, RunningStats().variance())
+        self.eq(math.inf, RunningStats().standard_error())
+        self.eq(0.0, self.__stats_of([5.0]).variance())
+
+    def __stats_of(self, samples):
+        stats = RunningStats()
+        for sample in samples:
+            stats.add(sample)
+        return stats
@@ -0,0 +1,176 @@
+import math
+import random
+
+from tests.base_unittest import BaseUnitTest
+from pypokerengine.api.emulator import Emulator, EventLevel
+from pypokerengine.players import BasePokerPlayer
+from pypokerengine.engine.poker_constants import PokerConstants as Const
+from pypokerengine.api.game import setup_config, start_poker
+from examples.players.random_player import RandomPlayer
+from examples.players.fold_man import FoldMan
+from examples.players.emulator_player import EmulatorPlayer, MyModel, paired_z_score, split_seeds
+from examples.players.rollout_executor import RolloutWorker, SerialRolloutExecutor, ThreadRolloutExecutor,\
+        ProcessRolloutExecutor, TruncatedRollout
+
+MY_UUID = "uuid-1"
+OPPONENT_UUID = "uuid-2"
+HOLE_CARD = ["SA", "HA"]
+ACTIONS = [MyModel.FOLD, MyModel.CALL, MyModel.MIN_RAISE, MyModel.MAX_RAISE]
+
+class EmulatorPlayerTest(BaseUnitTest):
+
+    def setUp(self):
+        self.valid_actions = [
+                { "action": "fold", "amount": 0 },
+                { "action": "call", "amount": 10 },
+                { "action": "raise", "amount": { "min": 15, "max": 100 } }
+                ]
+
+    def test_actions_share_determinizations(self):
+        player = self._gen_player(FakeExecutor(lambda action, seed: seed % 7), nb_simulation=10, confidence_z=None, min_simulation=5)
+        player.declare_action(self.valid_actions, HOLE_CARD, {})
+        self.eq(10, len(player.executor.seen_seeds[0]))
+        for action in ACTIONS:
+            self.eq(player.executor.seen_seeds[0], player.executor.seen_seeds[action])
+
+    def test_stop_early_when_best_action_dominates(self):
+        profits = { MyModel.FOLD: 0, MyModel.CALL: 50, MyModel.MIN_RAISE: 20, MyModel.MAX_RAISE: 10 }
+        executor = FakeExecutor(lambda action, seed: 100 + profits[action] + seed % 3)
+        player = self._gen_player(executor, nb_simulation=1000, confidence_z=3.0, min_simulation=10)
+        action, amount = player.declare_action(self.valid_actions, HOLE_CARD, {})
+        self.eq(10, len(executor.seen_seeds[0]))
+        self.eq(("call", 10), (action, amount))
+
+    def test_decisions_use_distinct_seeds(self):
+        player = self._gen_player(FakeExecutor(lambda action, seed: 100), nb_simulation=5, confidence_z=None, min_simulation=5)
+        player.declare_action(self.valid_actions, HOLE_CARD, {})
+        player.declare_action(self.valid_actions, HOLE_CARD, {})
+        seeds = player.executor.seen_seeds[0]
+        self.eq(10, len(set(seeds)))
+
+    def test_split_seeds(self):
+        self.eq([[1, 2], [3, 4], [5]], split_seeds([1, 2, 3, 4, 5], 3))
+        self.eq([[1], [2]], split_seeds([1, 2], 4))
+
+    def test_paired_z_score(self):
+        self.eq(math.inf, paired_z_score([0, 0, 0]))
+        self.eq(-math.inf, paired_z_score([-1, -1]))
+        self.assertAlmostEqual(2 * math.sqrt(3), paired_z_score([1, 3, 1, 3]))
+
+    def test_executor_is_shut_down_after_last_round(self):
+        executor = ShutdownRecordingExecutor()
+        player = EmulatorPlayer(nb_simulation=4, min_simulation=4, executor=executor, seed=1)
+        player.set_opponents_model(RandomPlayer())
+        config = setup_config(max_round=2, initial_stack=100, small_blind_amount=5)
+        config.register_player("emulator", player)
+        config.register_player("folder", FoldMan())
+        start_poker(config, verbose=0)
+        self.eq(["start", "shutdown", "shutdown"], executor.calls)
+
+    def _gen_player(self, executor, **kwargs):
+        player = EmulatorPlayer(executor=executor, seed=1, **kwargs)
+        player.set_uuid(MY_UUID)
+        player.my_model = MyModel()
+        return player
+
+class RolloutExecutorTest(BaseUnitTest):
+
+    def setUp(self):
+        emulator = Emulator()
+        emulator.set_game_rule(2, 10, 5, 0)
+        players_info = {
+                MY_UUID: { "name": "p1", "stack": 100 },
+                OPPONENT_UUID: { "name": "p2", "stack": 100 }
+                }
+        initial_state = emulator.generate_initial_game_state(players_info)
+        _game_state, events = emulator.start_new_round(initial_state)
+        self.round_state = events[-1]["round_state"]
+        game_info = {
+                "player_num": 2,
+                "rule": { "max_round": 10, "small_blind_amount": 5, "ante": 0 },
+                "seats": self.round_state["seats"]
+                }
+        self.worker_args = (MY_UUID, game_info, MyModel(), RandomPlayer())
+
+    def test_worker_is_deterministic_for_seeds(self):
+        worker = RolloutWorker(*self.worker_args)
+        results = worker.run(self.round_state, HOLE_CARD, ACTIONS, [1, 2, 3])
+        self.eq(4, len(results))
+        self.eq([3, 3, 3, 3], [len(action_results) for action_results in results])
+        self.eq(results, worker.run(self.round_state, HOLE_CARD, ACTIONS, [1, 2, 3]))
+
+    def test_executors_agree(self):
+        batches = [(self.round_state, HOLE_CARD, ACTIONS, seeds) for seeds in [[1, 2], [3], [4, 5]]]
+        expected = self._map(SerialRolloutExecutor(), batches)
+        self.eq(expected, self._map(ThreadRolloutExecutor(max_workers=2), batches))
+        self.eq(expected, self._map(ProcessRolloutExecutor(max_workers=2), batches))
+
+    def test_truncated_rollouts(self):
+        worker_args = self.worker_args + (TruncatedRollout(Const.Street.FLOP),)
+        worker = RolloutWorker(*worker_args)
+        results = worker.run(self.round_state, HOLE_CARD, ACTIONS, [1, 2, 3])
+        self.eq([90, 90, 90], results[MyModel.FOLD])
+        self.true(all([0 <= stack <= 200 for action_results in results for stack in action_results]))
+        batches = [(self.round_state, HOLE_CARD, ACTIONS, seeds) for seeds in [[1, 2], [3]]]
+        self.eq([results], self._map(SerialRolloutExecutor(), [(self.round_state, HOLE_CARD, ACTIONS, [1, 2, 3])], worker_args))
+        self.eq(self._map(SerialRolloutExecutor(), batches, worker_args),
+                self._map(ProcessRolloutExecutor(max_workers=2), batches, worker_args))
+
+    def test_truncated_rollout_from_river_raise(self):
+        emulator = Emulator(rng=random.Random(1))
+        emulator.set_game_rule(2, 10, 5, 0)
+        for uuid in [MY_UUID, OPPONENT_UUID]:
+            emulator.register_player(uuid, CallModel())
+        players_info = { MY_UUID: { "name": "p1", "stack": 100 }, OPPONENT_UUID: { "name": "p2", "stack": 100 } }
+        for _ in range(8):
+            game_state, _events = emulator.start_new_round(emulator.generate_initial_game_state(players_info))
+            while game_state["street"] != Const.Street.RIVER:
+                call_amount = emulator.generate_possible_actions(game_state)[1]["amount"]
+                game_state, _events = emulator.apply_action(game_state, "call", call_amount)
+            raiser = game_state["table"].seats.players[game_state["next_player"]].uuid
+            game_state, _events = emulator.apply_action(game_state, "raise", 50)
+            finished_state, _events = emulator.run_until_round_finish(game_state, EventLevel.NONE)
+            expected = [p.stack for p in finished_state["table"].seats.players if p.uuid == raiser][0]
+            self.true(expected in [40, 100, 160])
+            self.eq(expected, TruncatedRollout().run(emulator, game_state, raiser))
+
+    def _map(self, executor, batches, worker_args=None):
+        executor.start(self.worker_args if worker_args is None else worker_args, 1)
+        try:
+            return executor.map(batches)
+        finally:
+            executor.shutdown()
+
+class CallModel(BasePokerPlayer):
+
+    def declare_action(self, valid_actions, hole_card, round_state):
+        return valid_actions[1]['action'], valid_actions[1]['amount']
+
+class ShutdownRecordingExecutor(SerialRolloutExecutor):
+
+    def __init__(self):
+        self.calls = []
+
+    def start(self, worker_args, master_seed):
+        self.calls.append("start")
+        SerialRolloutExecutor.start(self, worker_args, master_seed)
+
+    def shutdown(self):
+        self.calls.append("shutdown")
+
+class FakeExecutor(object):
+
+    max_workers = 2
+
+    def __init__(self, stack_of):
+        self.stack_of = stack_of
+        self.seen_seeds = { action: [] for action in ACTIONS }
+
+    def map(self, batches):
+        results = []
+        for _round_state, _hole_card, actions, seeds in batches:
+            for action in actions:
+                self.seen_seeds[action] += seeds
+            results.append([[self.stack_of(action, seed) for seed in seeds] for action in actions])
+        return results
+
@@ -0,0 +1,205 @@
+import math
+import random
+
+from tests.base_unittest import BaseUnitTest
+from pypokerengine.api.emulator import Emulator
+from pypokerengine.engine.poker_constants import PokerConstants as Const
+from pypokerengine.utils.card_utils import gen_cards
+from pypokerengine.utils.game_state_utils import restore_game_state, attach_hole_card,\
+        attach_hole_card_from_deck
+from pypokerengine.api.game import setup_config, start_poker
+from examples.players.random_player import RandomPlayer
+from examples.players.fold_man import FoldMan
+from tests.examples.players.emulator_player_test import ShutdownRecordingExecutor
+from examples.players.rollout_executor import TruncatedRollout
+from examples.players.mcts_player import MCTSNode, MCTSPlayer, MCTSPlayerModel, nyu_heuristic_function, random_action,\
+        ActionAbstraction, PotFractionAbstraction, ProgressiveWidening, PUCTSelection, HeuristicPrior
+
+MY_UUID = "uuid-1"
+OPPONENT_UUID = "uuid-2"
+HOLE_CARD = ["SA", "HA"]
+
+class MCTSNodeTest(BaseUnitTest):
+
+    def setUp(self):
+        self.emulator = Emulator()
+        self.emulator.set_game_rule(2, 10, 5, 0)
+        self.model = MCTSPlayerModel(MY_UUID)
+        self.model.set_heuristic(nyu_heuristic_function)
+        self.emulator.register_player(MY_UUID, self.model)
+        self.emulator.register_player(OPPONENT_UUID, RandomPlayer())
+        players_info = {
+                MY_UUID: { "name": "p1", "stack": 100 },
+                OPPONENT_UUID: { "name": "p2", "stack": 100 }
+                }
+        initial_state = self.emulator.generate_initial_game_state(players_info)
+        self.game_state, self.events = self.emulator.start_new_round(initial_state)
+
+    def test_simulate_determinized_playout_shares_tree(self):
+        root = self._gen_root()
+        for _ in range(20):
+            root.simulate_determinized_playout(self._determinize())
+        self.eq(4, len(root.children))
+        self.eq(20, root.num_playouts)
+        self.eq(19, sum([child.num_playouts for child in root.children]))
+        self.eq([('fold', 0), ('call', 10), ('raise', 15), ('raise', 100)], [child.action for child in root.children])
+
+    def test_truncated_rollout(self):
+        root = self._gen_root(truncated_rollout=TruncatedRollout(Const.Street.FLOP))
+        for _ in range(20):
+            root.simulate_determinized_playout(self._determinize())
+        self.eq(20, root.num_playouts)
+        self.true(all([-100 <= child.get_node_value() <= 100 for child in root.children]))
+        fold_child = [child for child in root.children if child.action[0] == 'fold'][0]
+        self.eq(5, fold_child.get_node_value())
+
+    def test_children_are_created_lazily(self):
+        root = self._gen_root()
+        root.simulate_playout()
+        root.select_leaf().simulate_playout()
+        self.eq(1, len(root.children))
+        self.eq([('call', 10), ('raise', 15), ('raise', 100)], root.untried_actions)
+        root.select_leaf().simulate_playout()
+        self.eq(2, len(root.children))
+        self.eq(2, len(root.untried_actions))
+
+    def test_leaf_keeps_playout_value_on_back_propagation(self):
+        root = self._gen_root()
+        root.propagated_state_value = 42
+        root.back_propagation()
+        self.eq(42, root.get_node_value())
+
+    def test_abstract_actions_drop_duplicated_actions(self):
+        game_state = self._determinize()
+        valid_actions = self.emulator.generate_possible_actions(game_state)
+        abstraction = ActionAbstraction([MCTSPlayerModel.CALL, MCTSPlayerModel.CALL, MCTSPlayerModel.MIN_RAISE])
+        self.eq([('call', 10), ('raise', 15)], abstraction.abstract_actions(valid_actions, game_state))
+
+    def test_abstract_actions_drop_fold_when_check_is_free(self):
+        game_state, _ = self.emulator.apply_action(self._determinize(), 'call', 10)
+        valid_actions = self.emulator.generate_possible_actions(game_state)
+        actions = ActionAbstraction().abstract_actions(valid_actions, game_state)
+        self.eq([('call', 10), ('raise', 15), ('raise', 100)], actions)
+
+    def test_pot_fraction_abstraction(self):
+        game_state = self._determinize()
+        valid_actions = self.emulator.generate_possible_actions(game_state)
+        actions = PotFractionAbstraction([0.5, 1.0, 20.0]).abstract_actions(valid_actions, game_state)
+        self.eq([('fold', 0), ('call', 10), ('raise', 15), ('raise', 17), ('raise', 25), ('raise', 100)], actions)
+
+    def test_progressive_widening_adds_children_with_visits(self):
+        root = self._gen_root(progressive_widening=ProgressiveWidening(1.0, 0.5))
+        root.simulate_playout()
+        for _ in range(5):
+            root.select_leaf().simulate_playout()
+        self.eq(3, len(root.children))
+        self.eq(1, len(root.untried_actions))
+
+    def test_heuristic_prior(self):
+        prior = HeuristicPrior(nyu_heuristic_function, weight=0.5)
+        opponent_node = self._gen_root()
+        self.eq([0.25, 0.25], prior.action_priors(opponent_node, [('fold', 0), ('call', 10), ('raise', 15), ('raise', 100)])[:2])
+        game_state, events = self.emulator.apply_action(self._determinize(), 'call', 10)
+        args = [events[-1]["valid_actions"], HOLE_CARD, events[-1]["round_state"]]
+        my_node = MCTSNode(self.emulator, game_state, MY_UUID, HOLE_CARD, 100, declare_action_args=args)
+        priors = prior.action_priors(my_node, [('call', 10), ('raise', 15), ('raise', 100)])
+        self.eq([1.0 / 6, 0.5 + 1.0 / 6, 1.0 / 6], priors)
+
+    def test_puct_expands_actions_by_prior(self):
+        root = self._gen_root(selection_policy=PUCTSelection(FixedPrior([0.1, 0.2, 0.3, 0.4]), constant=2.0))
+        root.simulate_playout()
+        root.select_leaf().simulate_playout()
+        self.eq([('raise', 100)], [child.action for child in root.children])
+        self.eq([('raise', 15), ('call', 10), ('fold', 0)], root.untried_actions)
+        self.eq([0.3, 0.2, 0.1], root.untried_priors)
+        child = root.children[0]
+        self.eq(0.4, child.prior)
+        self.assertAlmostEqual(child.get_node_value() / 100.0 + 2.0 * 0.4 * math.sqrt(2) / 2,
+                child.selection_policy_value())
+        for _ in range(10):
+            root.select_leaf().simulate_playout()
+        self.eq(12, root.num_playouts)
+        self.eq(11, sum([child.num_playouts for child in root.children]))
+        self.eq([0.4, 0.3, 0.2, 0.1][:len(root.children)], [child.prior for child in root.children])
+
+    def _gen_root(self, progressive_widening=None, truncated_rollout=None, selection_policy=None):
+        args = [self.events[-1]["valid_actions"], HOLE_CARD, self.events[-1]["round_state"]]
+        return MCTSNode(self.emulator, self._determinize(), MY_UUID, HOLE_CARD, 100,
+                simulation_model=self.model, declare_action_args=args,
+                progressive_widening=progressive_widening, truncated_rollout=truncated_rollout,
+                selection_policy=selection_policy)
+
+    def _determinize(self):
+        game_state = restore_game_state(self.events[-1]["round_state"])
+        game_state["table"].deck.shuffle()
+        game_state = attach_hole_card(game_state, MY_UUID, gen_cards(HOLE_CARD))
+        return attach_hole_card_from_deck(game_state, OPPONENT_UUID)
+
+
+class MCTSPlayerTest(BaseUnitTest):
+
+    def test_executor_is_shut_down_after_last_round(self):
+        player = MCTSPlayer(4, nyu_heuristic_function, seed=1)
+        player.executor = ShutdownRecordingExecutor()
+        player.set_opponents_model(RandomPlayer())
+        config = setup_config(max_round=2, initial_stack=100, small_blind_amount=5)
+        config.register_player("mcts", player)
+        config.register_player("folder", FoldMan())
+        start_poker(config, verbose=0)
+        seats = [{ "uuid": player.uuid, "stack": 95 }, { "uuid": "folder", "stack": 105 }]
+        player.receive_round_result_message([], [], { "round_count": 2, "seats": seats })
+        self.eq(["shutdown", "shutdown"], player.executor.calls)
+
+
+    def test_root_actions_come_from_abstraction(self):
+        records = []
+        player = MCTSPlayer(4, nyu_heuristic_function, seed=1, action_abstraction=MidRaiseAbstraction(),
+                            stats_callback=records.append)
+        player.set_opponents_model(RandomPlayer())
+        config = setup_config(max_round=3, initial_stack=100, small_blind_amount=5)
+        config.register_player("mcts", player)
+        config.register_player("caller", CallPlayer())
+        start_poker(config, verbose=0)
+        self.true(len(records) != 0)
+        for record in records:
+            root_actions = [root["action"] for root in record["root"]]
+            self.true(len(root_actions) <= 2)
+            self.eq('call', root_actions[0][0])
+            self.true(record["best_action"] in root_actions)
+        self.true(any([root["action"][0] == 'raise' for record in records for root in record["root"]]))
+
+
+    def test_random_action_draws_from_player_seed(self):
+        def heuristic_draws(seed):
+            player = MCTSPlayer(4, random_action, seed=seed)
+            player.set_uuid(MY_UUID)
+            player.set_opponents_model(RandomPlayer())
+            player.receive_game_start_message({ "player_num": 2, "seats": [{ "uuid": MY_UUID }, { "uuid": OPPONENT_UUID }],
+                "rule": { "max_round": 10, "small_blind_amount": 5, "ante": 0 } })
+            return [player.player_model.heuristic(HOLE_CARD, {}) for _ in range(20)]
+        random_state = random.getstate()
+        draws = heuristic_draws(1)
+        self.eq(random_state, random.getstate())
+        self.eq(draws, heuristic_draws(1))
+        self.neq(draws, heuristic_draws(2))
+
+
+class MidRaiseAbstraction(ActionAbstraction):
+
+    def candidate_actions(self, valid_actions, game_state):
+        raise_range = valid_actions[2]['amount']
+        return [('call', valid_actions[1]['amount']), ('raise', (raise_range['min'] + raise_range['max']) // 2)]
+
+class CallPlayer(RandomPlayer):
+
+    def declare_action(self, valid_actions, hole_card, round_state):
+        return valid_actions[1]['action'], valid_actions[1]['amount']
+
+
+class FixedPrior(object):
+
+    def __init__(self, priors):
+        self.priors = priors
+
+    def action_priors(self, node, actions):
+        return self.priors[:len(actions)]
@@ -0,0 +1,51 @@
+from tests.base_unittest import BaseUnitTest
+from examples.players.search_stats import SearchStats, tree_size_and_depth
+
+class SearchStatsTest(BaseUnitTest):
+
+    def setUp(self):
+        self.now = [0.0]
+        self.stats = SearchStats(clock=lambda: self.now[0])
+
+    def test_nested_phases_are_timed_exclusively(self):
+        self.stats.start(SearchStats.SELECTION)
+        self.tick(1)
+        self.stats.start(SearchStats.EXPANSION)
+        self.tick(2)
+        self.stats.stop()
+        self.tick(3)
+        self.stats.stop()
+        self.eq(4, self.stats.phase_seconds[SearchStats.SELECTION])
+        self.eq(2, self.stats.phase_seconds[SearchStats.EXPANSION])
+
+    def test_to_record(self):
+        leaf1, leaf2 = Node(3, [], ("call", 10)), Node(1, [], ("fold", 0))
+        self.stats.add_root("CALL", Node(5, [leaf1, leaf2]))
+        self.tick(2)
+        record = self.stats.to_record(round_count=3)
+        self.eq(5, record["playouts"])
+        self.eq(2.5, record["playouts_per_second"])
+        self.eq(3, record["tree_size"])
+        self.eq(1, record["tree_depth"])
+        self.eq(3, record["round_count"])
+        self.eq("CALL", record["root"][0]["action"])
+        self.eq([["call", 10], ["fold", 0]], [child["action"] for child in record["root"][0]["children"]])
+        self.eq([3, 1], [child["playouts"] for child in record["root"][0]["children"]])
+
+    def test_tree_size_and_depth(self):
+        tree = Node(0, [Node(0, [Node(0, [])]), Node(0, [])])
+        self.eq((4, 2), tree_size_and_depth(tree))
+
+    def tick(self, seconds):
+        self.now[0] += seconds
+
+class Node(object):
+
+    def __init__(self, num_playouts, children, action=None):
+        self.num_playouts = num_playouts
+        self.children = children
+        self.action = action
+
+    def get_node_value(self):
+        return 0
+
@@ -0,0 +1,171 @@
+import os
+import shutil
+import tempfile
+
+from tests.base_unittest import BaseUnitTest
+from data_parsing.running_stats import RunningStats
+from experiment_scheduler import GameJob, Checkpoint, cell_name, job_key, expand_jobs, estimate_cost, run_jobs,\
+        t_quantile, spent_alpha, decision_threshold, is_cell_decided, run_sequential
+
+class ExperimentSchedulerTest(BaseUnitTest):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.checkpoint_path = os.path.join(self.tmp_dir, "completed_jobs.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cell_name_and_job_key(self):
+        job = GameJob(heuristic, Opponent, 5, 3, 100, 7)
+        self.eq("heuristic_Opponent_5-rounds_3-others_100-playouts", cell_name(job))
+        self.eq("heuristic_Opponent_5-rounds_3-others_100-playouts#7", job_key(job))
+
+    def test_expand_jobs(self):
+        jobs = expand_jobs([heuristic], [Opponent, SearchingOpponent], [5, 10], [1], [100], 2,
+                           rounds_by_opponent={ "SearchingOpponent": [5] })
+        self.eq(6, len(jobs))
+        self.eq([5, 10], sorted(set([job.rounds for job in jobs if job.opponent is Opponent])))
+        self.eq([5], sorted(set([job.rounds for job in jobs if job.opponent is SearchingOpponent])))
+        self.eq([0, 1], sorted(set([job.game_index for job in jobs])))
+
+    def test_estimate_cost(self):
+        self.eq(5 * 2 * 100, estimate_cost(GameJob(heuristic, Opponent, 5, 1, 100, 0)))
+        costs = { "SearchingOpponent": 50 }
+        self.eq(5 * 2 * (100 + 50), estimate_cost(GameJob(heuristic, SearchingOpponent, 5, 1, 100, 0), costs))
+
+    def test_checkpoint(self):
+        checkpoint = Checkpoint(self.checkpoint_path)
+        checkpoint.mark_completed("a#0")
+        checkpoint.mark_completed("a#1", -12.5)
+        checkpoint = Checkpoint(self.checkpoint_path)
+        self.true(checkpoint.is_completed("a#0"))
+        self.false(checkpoint.is_completed("a#2"))
+        self.eq({ "a#0": None, "a#1": -12.5 }, checkpoint.values)
+
+    def test_run_jobs_plays_longest_jobs_first(self):
+        jobs = [GameJob(heuristic, Opponent, rounds, 1, 100, 0) for rounds in [5, 20, 10]]
+        summary = run_jobs(jobs, play_job, self.checkpoint_path, max_workers=1)
+        self.eq({ "completed": 3, "skipped": 0, "failed": 0 }, summary)
+        self.eq([job_key(jobs[i]) for i in [1, 2, 0]], self.__checkpointed_keys())
+
+    def test_run_jobs_skips_completed_jobs(self):
+        jobs = [GameJob(heuristic, Opponent, 5, 1, 100, index) for index in range(3)]
+        Checkpoint(self.checkpoint_path).mark_completed(job_key(jobs[1]))
+        summary = run_jobs(jobs, play_job, self.checkpoint_path, max_workers=2)
+        self.eq({ "completed": 2, "skipped": 1, "failed": 0 }, summary)
+        self.eq(sorted([job_key(job) for job in jobs]), sorted(self.__checkpointed_keys()))
+        self.eq({ "completed": 0, "skipped": 3, "failed": 0 },
+                run_jobs(jobs, play_job, self.checkpoint_path, max_workers=2))
+
+    def test_run_jobs_retries_failed_jobs(self):
+        jobs = [GameJob(heuristic, Opponent, 5, 1, 100, 0), GameJob(heuristic, Opponent, 5, 1, 100, 1)]
+        summary = run_jobs(jobs, fail_odd_job, self.checkpoint_path, max_workers=2)
+        self.eq({ "completed": 1, "skipped": 0, "failed": 1 }, summary)
+        self.eq([job_key(jobs[0])], self.__checkpointed_keys())
+        summary = run_jobs(jobs, play_job, self.checkpoint_path, max_workers=2)
+        self.eq({ "completed": 1, "skipped": 1, "failed": 0 }, summary)
+
+    def test_t_quantile(self):
+        self.assertAlmostEqual(2.5706, t_quantile(0.975, 5), places=3)
+        self.assertAlmostEqual(2.0930, t_quantile(0.975, 19), places=3)
+        self.assertAlmostEqual(1.9842, t_quantile(0.975, 99), places=3)
+        self.assertAlmostEqual(3.1693, t_quantile(0.995, 10), places=3)
+
+    def test_decision_threshold(self):
+        self.assertAlmostEqual(2.68, decision_threshold(20, 20, 100, 0.05), places=2)
+        self.assertAlmostEqual(4.04, decision_threshold(21, 20, 100, 0.05), places=2)
+        self.true(decision_threshold(21, 20, 100, 0.05) > decision_threshold(20, 20, 100, 0.05))
+        self.assertAlmostEqual(0.05, spent_alpha(100, 100, 0.05))
+        self.assertAlmostEqual(0.05, spent_alpha(150, 100, 0.05))
+        spent = [spent_alpha(20, 100, 0.05)] + [spent_alpha(count, 100, 0.05) - spent_alpha(count - 1, 100, 0.05)
+                                               for count in range(21, 101)]
+        self.assertAlmostEqual(0.05, sum(spent))
+
+    def test_is_cell_decided(self):
+        constant = stats_of([10] * 30)
+        self.false(is_cell_decided(constant, 100, 20, 100, 0.95, 0.05))
+        self.true(is_cell_decided(stats_of([10] * 100), 0, 20, 100, 0.95))
+        spread = stats_of([0, 1] * 5)
+        self.false(is_cell_decided(spread, 100, 20, 100, 0.95))
+        spread = stats_of([0, 1] * 10)
+        self.true(is_cell_decided(spread, 1, 20, 100, 0.95))
+        self.false(is_cell_decided(spread, 0.1, 20, 100, 0.95))
+
+    def test_is_cell_decided_by_sequential_test(self):
+        away_from_zero = stats_of([100, 101] * 10)
+        self.false(is_cell_decided(away_from_zero, 0.1, 20, 100, 0.95))
+        self.true(is_cell_decided(away_from_zero, 0.1, 20, 100, 0.95, decision_alpha=0.05))
+        around_zero = stats_of([-1, 1] * 10)
+        self.false(is_cell_decided(around_zero, 0.1, 20, 100, 0.95, decision_alpha=0.05))
+
+    def test_run_sequential_plays_most_uncertain_cell_first(self):
+        short, long = GameJob(heuristic, Opponent, 5, 1, 100, 0), GameJob(heuristic, Opponent, 20, 1, 100, 0)
+        stats = run_sequential([short, long], alternating_job, self.checkpoint_path, target_width=0,
+                               min_games=3, max_games=6, max_workers=1)
+        self.eq([6, 6], [stats[cell_name(cell)].count for cell in [short, long]])
+        # longest first, then the cell without a variance yet, then the largest standard error
+        order = [(cell_name(cell), index) for cell, index in
+                 [(long, 0), (long, 1), (short, 0), (short, 1), (long, 2), (short, 2),
+                  (long, 3), (long, 4), (long, 5), (short, 3), (short, 4), (short, 5)]]
+        self.eq(["%s#%d" % key for key in order], self.__checkpointed_keys())
+
+    def test_run_sequential_stops_decided_cells(self):
+        constant, spread, positive = [GameJob(heuristic, Opponent, rounds, 1, 100, 0) for rounds in [5, 10, 100]]
+        stats = run_sequential([constant, spread, positive], sequential_job, self.checkpoint_path, target_width=1,
+                               min_games=4, max_games=8, decision_alpha=0.05, max_workers=1)
+        self.eq(8, stats[cell_name(constant)].count)
+        self.eq(4, stats[cell_name(spread)].count)
+        self.eq(4, stats[cell_name(positive)].count)
+
+    def test_run_sequential_resumes_from_checkpoint(self):
+        cell = GameJob(heuristic, Opponent, 5, 1, 100, 0)
+        checkpoint = Checkpoint(self.checkpoint_path)
+        for index in range(3):
+            checkpoint.mark_completed("%s#%d" % (cell_name(cell), index), alternating_job(cell._replace(game_index=index)))
+        stats = run_sequential([cell], alternating_job, self.checkpoint_path, target_width=0,
+                               min_games=3, max_games=5, max_workers=1)
+        self.eq(5, stats[cell_name(cell)].count)
+        self.assertAlmostEqual(2.0, stats[cell_name(cell)].mean)
+        self.eq(["%s#%d" % (cell_name(cell), index) for index in range(5)], self.__checkpointed_keys())
+        stats = run_sequential([cell], fail_odd_job, self.checkpoint_path, target_width=0,
+                               min_games=3, max_games=5, max_workers=1)
+        self.eq(5, stats[cell_name(cell)].count)
+        self.eq(5, len(self.__checkpointed_keys()))
+
+    def __checkpointed_keys(self):
+        with open(self.checkpoint_path) as checkpoint_file:
+            return [line.strip().split('\t')[0] for line in checkpoint_file]
+
+def heuristic(hole_card, round_state):
+    return 0
+
+class Opponent(object):
+    pass
+
+class SearchingOpponent(object):
+    pass
+
+def play_job(job):
+    return job.rounds
+
+def fail_odd_job(job):
+    if job.game_index % 2 == 1:
+        raise ValueError("game %d failed" % job.game_index)
+    return job.rounds
+
+def alternating_job(job):
+    return job.rounds * (job.game_index % 2)
+
+def sequential_job(job):
+    if job.rounds == 5:
+        return 7
+    if job.rounds == 10:
+        return job.game_index % 2 / 10.0
+    return job.rounds + job.game_index % 2
+
+def stats_of(samples):
+    stats = RunningStats()
+    for sample in samples:
+        stats.add(sample)
+    return stats
@@ -1,15 +1,21 @@
+import os
+import random
+import shutil
+import tempfile
 from collections import OrderedDict
 from functools import reduce
 
 from nose.tools import raises
 from tests.base_unittest import BaseUnitTest
-from pypokerengine.api.emulator import Emulator, Event
+from pypokerengine.api.emulator import Emulator, Event, EventLevel
 from pypokerengine.utils.game_state_utils import restore_game_state, attach_hole_card,\
         attach_hole_card_from_deck, replace_community_card_from_deck
 from pypokerengine.engine.card import Card
 from pypokerengine.engine.pay_info import PayInfo
 from pypokerengine.engine.game_evaluator import GameEvaluator
 from pypokerengine.engine.poker_constants import PokerConstants as Const
+from pypokerengine.engine.engine_stats import EngineStats
+from pypokerengine.engine.hand_history import HandHistoryWriter, HandHistoryReader
 
 from examples.players.fold_man import FoldMan
 
@@ -116,6 +122,21 @@ class EmulatorTest(BaseUnitTest):
         self.eq(1, len(events))
         self.eq("event_round_finish", events[0]["type"])
 
+    def test_apply_action_inplace_and_undo(self):
+        game_state = restore_game_state(TwoPlayerSample.round_state)
+        game_state = attach_hole_card_from_deck(game_state, "tojrbxmkuzrarnniosuhct")
+        game_state = attach_hole_card_from_deck(game_state, "pwtwlmfciymjdoljkhagxa")
+        self.emu.set_game_rule(2, 10, 5, 0)
+        original = game_state["table"].serialize()
+
+        expected, _ = self.emu.apply_action(game_state, "call", 15)
+        undo = self.emu.apply_action_inplace(game_state, "call", 15)
+        self.eq(Const.Street.RIVER, game_state["street"])
+        self.eq(expected["table"].serialize(), game_state["table"].serialize())
+        self.emu.undo_action(game_state, undo)
+        self.eq(Const.Street.TURN, game_state["street"])
+        self.eq(original, game_state["table"].serialize())
+
     def test_apply_action_game_finish_detect(self):
         game_state = restore_game_state(TwoPlayerSample.round_state)
         game_state = attach_hole_card_from_deck(game_state, "tojrbxmkuzrarnniosuhct")
@@ -175,6 +196,75 @@ class EmulatorTest(BaseUnitTest):
         self.eq("event_ask_player", events[1]["type"])
         self.eq("event_round_finish", events[2]["type"])
 
+    def test_run_until_street(self):
+        game_state = restore_game_state(TwoPlayerSample.round_state)
+        game_state = attach_hole_card_from_deck(game_state, "tojrbxmkuzrarnniosuhct")
+        game_state = attach_hole_card_from_deck(game_state, "pwtwlmfciymjdoljkhagxa")
+        self.emu.set_game_rule(2, 10, 5, 0)
+        self.emu.register_player("tojrbxmkuzrarnniosuhct", TestPlayer([]))
+        self.emu.register_player("pwtwlmfciymjdoljkhagxa", TestPlayer([("call", 15)]))
+        original = game_state["table"].serialize()
+
+        stopped_state = self.emu.run_until_street(game_state, Const.Street.RIVER)
+        self.eq(Const.Street.RIVER, stopped_state["street"])
+        self.eq(5, len(stopped_state["table"].get_community_card()))
+        self.eq(original, game_state["table"].serialize())
+
+    def test_run_until_street_stops_before_runout(self):
+        game_state = restore_game_state(TwoPlayerSample.round_state)
+        game_state = attach_hole_card_from_deck(game_state, "tojrbxmkuzrarnniosuhct")
+        game_state = attach_hole_card_from_deck(game_state, "pwtwlmfciymjdoljkhagxa")
+        self.emu.set_game_rule(2, 10, 5, 0)
+        self.emu.register_player("tojrbxmkuzrarnniosuhct", TestPlayer([("call", 80)]))
+        self.emu.register_player("pwtwlmfciymjdoljkhagxa", TestPlayer([("raise", 80)]))
+
+        stopped_state = self.emu.run_until_street(game_state, Const.Street.FINISHED)
+        self.eq(Const.Street.RIVER, stopped_state["street"])
+        self.eq(4, len(stopped_state["table"].get_community_card()))
+        self.eq([100, 100], [p.pay_info.amount for p in stopped_state["table"].seats.players])
+
+    def test_run_until_round_finish_with_stats(self):
+        game_state = restore_game_state(TwoPlayerSample.round_state)
+        game_state = attach_hole_card_from_deck(game_state, "tojrbxmkuzrarnniosuhct")
+        game_state = attach_hole_card_from_deck(game_state, "pwtwlmfciymjdoljkhagxa")
+        self.emu.set_game_rule(2, 10, 5, 0)
+        self.emu.register_player("tojrbxmkuzrarnniosuhct", TestPlayer([("fold", 0)]))
+        self.emu.register_player("pwtwlmfciymjdoljkhagxa", TestPlayer([("call", 15)]))
+        stats = EngineStats()
+        self.emu.set_stats(stats)
+
+        game_state, events = self.emu.run_until_round_finish(game_state)
+        self.eq(["event_new_street", "event_ask_player", "event_round_finish"], [e["type"] for e in events])
+        self.eq(1, stats.rounds)
+        self.eq(2, stats.counts[EngineStats.DECLARE_ACTION])
+        self.eq(2, stats.counts[EngineStats.APPLY_ACTION])
+        self.eq(2, len(stats.player_counts))
+        self.true(stats.counts[EngineStats.MESSAGE_BUILD] >= 2)
+
+    def test_run_until_round_finish_with_event_level(self):
+        uuids = ["tojrbxmkuzrarnniosuhct", "pwtwlmfciymjdoljkhagxa"]
+        self.emu.set_game_rule(2, 10, 5, 0)
+        results = []
+        for event_level in [EventLevel.NONE, EventLevel.TERMINAL, EventLevel.ALL]:
+            game_state = restore_game_state(TwoPlayerSample.round_state)
+            game_state = attach_hole_card_from_deck(game_state, uuids[0])
+            game_state = attach_hole_card_from_deck(game_state, uuids[1])
+            self.emu.register_player(uuids[0], TestPlayer([("fold", 0)]))
+            self.emu.register_player(uuids[1], TestPlayer([("call", 15)]))
+            game_state, events = self.emu.run_until_round_finish(game_state, event_level)
+            results.append(([p.stack for p in game_state["table"].seats.players], [e["type"] for e in events]))
+        self.eq([], results[0][1])
+        self.eq(["event_round_finish"], results[1][1])
+        self.eq(["event_new_street", "event_ask_player", "event_round_finish"], results[2][1])
+        self.eq(results[0][0], results[1][0])
+        self.eq(results[0][0], results[2][0])
+
+    @raises(ValueError)
+    def test_run_until_round_finish_with_unknown_event_level(self):
+        game_state = restore_game_state(TwoPlayerSample.round_state)
+        self.emu.set_game_rule(2, 10, 5, 0)
+        self.emu.run_until_round_finish(game_state, "hoge")
+
     def test_run_until_round_finish_when_already_finished(self):
         game_state = restore_game_state(TwoPlayerSample.round_state)
         game_state = attach_hole_card_from_deck(game_state, "tojrbxmkuzrarnniosuhct")
@@ -223,6 +313,33 @@ class EmulatorTest(BaseUnitTest):
         self.eq(114, game_state["table"].seats.players[0].stack)
         self.eq(86, game_state["table"].seats.players[1].stack)
 
+    def test_iter_until_game_finish(self):
+        game_state = restore_game_state(TwoPlayerSample.round_state)
+        game_state = attach_hole_card_from_deck(game_state, "tojrbxmkuzrarnniosuhct")
+        game_state = attach_hole_card_from_deck(game_state, "pwtwlmfciymjdoljkhagxa")
+        self.emu.set_game_rule(2, 10, 5, 1)
+        self.emu.register_player("tojrbxmkuzrarnniosuhct", FoldMan())
+        self.emu.register_player("pwtwlmfciymjdoljkhagxa", FoldMan())
+
+        events = self.emu.iter_until_game_finish(game_state, EventLevel.TERMINAL)
+        self.eq("event_round_finish", next(events)["type"])
+        event_types = [event["type"] for event in events]
+        self.eq(10 - TwoPlayerSample.round_state["round_count"], event_types.count("event_round_finish"))
+        self.eq(["event_game_finish"], event_types[-1:])
+
+    def test_run_until_game_finish_without_events(self):
+        game_state = restore_game_state(TwoPlayerSample.round_state)
+        game_state = attach_hole_card_from_deck(game_state, "tojrbxmkuzrarnniosuhct")
+        game_state = attach_hole_card_from_deck(game_state, "pwtwlmfciymjdoljkhagxa")
+        self.emu.set_game_rule(2, 10, 5, 1)
+        self.emu.register_player("tojrbxmkuzrarnniosuhct", FoldMan())
+        self.emu.register_player("pwtwlmfciymjdoljkhagxa", FoldMan())
+
+        game_state, events = self.emu.run_until_game_finish(game_state, EventLevel.NONE)
+        self.eq([], events)
+        self.eq(114, game_state["table"].seats.players[0].stack)
+        self.eq(86, game_state["table"].seats.players[1].stack)
+
     def test_run_until_game_finish_when_one_player_is_left(self):
         uuids = ["ruypwwoqwuwdnauiwpefsw", "sqmfwdkpcoagzqxpxnmxwm", "uxrdiwvctvilasinweqven"]
         holecards = [[Card.from_str(s) for s in ss] for ss in [["C2","C3"],["HA","CA"],["D5","H6"]]]
@@ -293,6 +410,17 @@ class EmulatorTest(BaseUnitTest):
         self.eq("preflop", events[0]["street"])
         self.eq("tojrbxmkuzrarnniosuhct", events[1]["uuid"])
 
+    def test_start_new_round_with_rng(self):
+        def start(seed):
+            emu = Emulator(rng=random.Random(seed))
+            emu.set_game_rule(2, 10, 5, 0)
+            emu.register_player("tojrbxmkuzrarnniosuhct", FoldMan())
+            emu.register_player("pwtwlmfciymjdoljkhagxa", FoldMan())
+            game_state, _events = emu.start_new_round(restore_game_state(TwoPlayerSample.round_state))
+            return [[str(card) for card in player.hole_card] for player in game_state["table"].seats.players]
+        self.eq(start(1), start(1))
+        self.neq(start(1), start(2))
+
     def test_start_new_round_exclude_no_money_players(self):
         uuids = ["ruypwwoqwuwdnauiwpefsw", "sqmfwdkpcoagzqxpxnmxwm", "uxrdiwvctvilasinweqven"]
         game_state = restore_game_state(ThreePlayerGameStateSample.round_state)
@@ -359,6 +487,29 @@ class EmulatorTest(BaseUnitTest):
         self.eq(1, len(events))
         self.eq("event_game_finish", events[0]["type"])
 
+    def test_record_hand_history(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(tmp_dir, "hands.bin")
+            self.emu.set_game_rule(2, 8, 5, 3)
+            players_info = OrderedDict()
+            players_info["uuid-1"] = { "name": "hoge", "stack": 100 }
+            players_info["uuid-2"] = { "name": "fuga", "stack": 100 }
+            self.emu.register_player("uuid-1", FoldMan())
+            self.emu.register_player("uuid-2", FoldMan())
+            with HandHistoryWriter(file_path) as writer:
+                self.emu.set_hand_history(writer)
+                game_state, _ = self.emu.start_new_round(self.emu.generate_initial_game_state(players_info))
+                game_state, _ = self.emu.run_until_game_finish(game_state, EventLevel.NONE)
+            with HandHistoryReader(file_path) as reader:
+                self.eq(8, len(reader))
+                self.eq(list(range(1, 9)), [hand["round_count"] for hand in reader])
+                self.eq([{ "street": 0, "seat": 1, "action": "fold", "amount": 0 }], reader[0]["actions"])
+                self.eq([p.stack for p in game_state["table"].seats.players],
+                        [seat["end_stack"] for seat in reader[-1]["seats"]])
+        finally:
+            shutil.rmtree(tmp_dir)
+
     def test_generate_initial_game_state(self):
         self.emu.set_game_rule(2, 8, 5, 3)
         p1, p2 = FoldMan(), FoldMan()
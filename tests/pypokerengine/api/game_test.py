@@ -1,7 +1,13 @@
+import os
+import shutil
+import tempfile
+import time
+
 import pypokerengine.api.game as G
 
 from nose.tools import raises
 from tests.base_unittest import BaseUnitTest
+from pypokerengine.engine.hand_history import HandHistoryReader
 from examples.players.fold_man import FoldMan
 
 class GameTest(BaseUnitTest):
@@ -38,6 +44,39 @@ class GameTest(BaseUnitTest):
         self.eq(115, p1["stack"])
         self.eq(85, p2["stack"])
 
+    def test_set_action_deadline(self):
+        config = G.setup_config(1, 100, 10)
+        config.register_player("p1", CallMan())
+        config.register_player("p2", SlowCallMan())
+        config.set_action_deadline(0.01, "fold")
+        result = G.start_poker(config, verbose=0)
+        p1, p2 = [result["players"][i] for i in range(2)]
+        self.eq(110, p1["stack"])
+        self.eq(90, p2["stack"])
+
+    def test_start_poker_rounds(self):
+        config = G.setup_config(3, 100, 10)
+        config.register_player("p1", FoldMan())
+        config.register_player("p2", FoldMan())
+        rounds = G.start_poker_rounds(config, verbose=0)
+        first_round = next(rounds)
+        self.eq(1, first_round["round_count"])
+        self.eq([110, 90], list(first_round["stacks"].values()))
+        rounds.close()
+
+    def test_set_hand_history(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            config = G.setup_config(2, 100, 10)
+            config.register_player("p1", FoldMan())
+            config.register_player("p2", FoldMan())
+            config.set_hand_history(os.path.join(tmp_dir, "hands.bin"))
+            G.start_poker(config, verbose=0)
+            with HandHistoryReader(config.hand_history_path) as reader:
+                self.eq([1, 2], [hand["round_count"] for hand in reader])
+        finally:
+            shutil.rmtree(tmp_dir)
+
     def test_start_poker_validation_when_no_player(self):
         config = G.setup_config(1, 100, 10)
         with self.assertRaises(Exception) as e:
@@ -56,3 +95,80 @@ class GameTest(BaseUnitTest):
         config = G.setup_config(1, 100, 10)
         config.register_player("p1", "dummy")
 
+
+    def test_start_poker_closes_players(self):
+        config = G.setup_config(2, 100, 10)
+        players = [ClosingFoldMan(), ClosingFoldMan()]
+        config.register_player("p1", players[0])
+        config.register_player("p2", players[1])
+        config.set_blind_structure({ 2: { "ante": 0, "small_blind": 60 } })
+        G.start_poker(config, verbose=0)
+        self.eq([1, 1], [player.close_count for player in players])
+
+    def test_start_poker_batch(self):
+        configs = [fold_man_config(0), fold_man_config, one_player_config]
+        results = sorted(G.start_poker_batch(configs, max_workers=2, master_seed=1), key=lambda r: r["index"])
+        self.eq([0, 1, 2], [result["index"] for result in results])
+        stacks = [[player["stack"] for player in result["result"]["players"]] for result in results[:2]]
+        self.eq([[110, 90], [110, 90]], stacks)
+        self.eq(None, results[0]["error"])
+        self.eq(None, results[2]["result"])
+        self.true("At least 2 players are needed" in results[2]["error"])
+        self.eq(3, len(set([result["seed"] for result in results])))
+
+    def test_start_poker_batch_in_calling_process(self):
+        run = lambda: [(r["seed"], r["result"]) for r in G.start_poker_batch([fold_man_config] * 2, max_workers=1, master_seed=1)]
+        results = run()
+        self.eq(2, len(results))
+        self.eq(results, run())
+        self.neq(results[0][0], results[1][0])
+
+    def test_start_poker_batch_in_calling_process_keeps_global_random_state(self):
+        random_state = G.random.getstate()
+        for _result in G.start_poker_batch([fold_man_config], max_workers=1, master_seed=1):
+            self.eq(random_state, G.random.getstate())
+        self.eq(random_state, G.random.getstate())
+
+    def test_start_poker_batch_stops_early(self):
+        started_at = time.time()
+        batch = G.start_poker_batch([slow_call_man_config] * 8, max_workers=2, master_seed=1)
+        result = next(batch)
+        batch.close()
+        self.eq(None, result["error"])
+        self.true(time.time() - started_at < 4.0)
+
+def fold_man_config(seed):
+    config = G.setup_config(1, 100, 10)
+    config.register_player("p1", FoldMan())
+    config.register_player("p2", FoldMan())
+    return config
+
+def slow_call_man_config(seed):
+    config = G.setup_config(1, 100, 10)
+    config.register_player("p1", SlowCallMan())
+    config.register_player("p2", SlowCallMan())
+    return config
+
+def one_player_config(seed):
+    config = G.setup_config(1, 100, 10)
+    config.register_player("p1", FoldMan())
+    return config
+
+class ClosingFoldMan(FoldMan):
+
+    def __init__(self):
+        self.close_count = 0
+
+    def close(self):
+        self.close_count += 1
+
+class CallMan(FoldMan):
+
+    def declare_action(self, valid_actions, hole_card, round_state):
+        return 'call', valid_actions[1]['amount']
+
+class SlowCallMan(CallMan):
+
+    def declare_action(self, valid_actions, hole_card, round_state):
+        time.sleep(0.2)
+        return CallMan.declare_action(self, valid_actions, hole_card, round_state)
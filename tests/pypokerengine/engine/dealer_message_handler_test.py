@@ -1,7 +1,11 @@
+import time
+
+from nose.tools import raises
 from tests.base_unittest import BaseUnitTest
 from mock import Mock
 from pypokerengine.engine.player import Player
 from pypokerengine.engine.dealer import MessageHandler
+from pypokerengine.players import BasePokerPlayer
 
 class MessageHandlerTest(BaseUnitTest):
 
@@ -36,3 +40,109 @@ class MessageHandlerTest(BaseUnitTest):
     p2_algo_args = self.p2_algo.receive_notification.call_args_list[0][0][0]
     self.eq("hoge", p2_algo_args)
 
+  def test_process_message_to_subscribed_algorithms(self):
+    mh = MessageHandler()
+    algos = [SubscribingPlayer(types) for types in [None, ["round_start_message"], []]]
+    [mh.register_algorithm("uuid%d" % idx, algo) for idx, algo in enumerate(algos)]
+    self.eq(None, mh.subscribed_message_types())
+    mh.process_message(-1, self.__notification_msg("round_start_message"))
+    mh.process_message(-1, self.__notification_msg("game_update_message"))
+    self.eq(["round_start_message", "game_update_message"], algos[0].received)
+    self.eq(["round_start_message"], algos[1].received)
+    self.eq([], algos[2].received)
+
+  def test_subscribed_message_types(self):
+    mh = MessageHandler()
+    mh.register_algorithm("uuid1", SubscribingPlayer(["round_start_message"]))
+    mh.register_algorithm("uuid2", SubscribingPlayer(["game_start_message"]))
+    self.eq(set(["round_start_message", "game_start_message"]), mh.subscribed_message_types())
+
+  def test_process_message_records_latency(self):
+    self.p1_algo.respond_to_ask.return_value = "fuga"
+    self.mh.process_message("uuid1", { "type":"ask", "message":"hoge" })
+    self.mh.process_message("uuid1", { "type":"ask", "message":"hoge" })
+    self.eq(2, self.mh.latency_histograms["uuid1"].count)
+    self.false("uuid2" in self.mh.latency_histograms)
+
+  def test_process_message_within_deadline(self):
+    self.mh.set_action_deadline(1)
+    self.p1_algo.respond_to_ask.return_value = ("call", 10)
+    self.eq(("call", 10), self.mh.process_message("uuid1", self.__ask_msg(10)))
+    self.eq(0, self.mh.latency_histograms["uuid1"].timeouts)
+
+  def test_process_message_after_deadline(self):
+    self.mh.set_action_deadline(0.01)
+    self.p1_algo.respond_to_ask.side_effect = lambda message: time.sleep(0.2) or ("raise", 20)
+    self.eq(("fold", 0), self.mh.process_message("uuid1", self.__ask_msg(10)))
+    self.eq(1, self.mh.latency_histograms["uuid1"].timeouts)
+
+  def test_process_message_after_deadline_checks_when_free(self):
+    self.mh.set_action_deadline(0.01, "check")
+    self.p1_algo.respond_to_ask.side_effect = lambda message: time.sleep(0.2) or ("raise", 20)
+    self.p2_algo.respond_to_ask.side_effect = lambda message: time.sleep(0.2) or ("raise", 20)
+    self.eq(("call", 0), self.mh.process_message("uuid1", self.__ask_msg(0)))
+    self.eq(("fold", 0), self.mh.process_message("uuid2", self.__ask_msg(10)))
+
+  def test_process_message_after_deadline_checks_big_blind_option(self):
+    self.mh.set_action_deadline(0.01, "check")
+    self.p1_algo.respond_to_ask.side_effect = lambda message: time.sleep(0.2) or ("raise", 20)
+    self.p2_algo.respond_to_ask.side_effect = lambda message: time.sleep(0.2) or ("raise", 20)
+    histories = [
+        { "action": "SMALLBLIND", "amount": 5, "uuid": "uuid2" },
+        { "action": "BIGBLIND", "amount": 10, "uuid": "uuid1" },
+        { "action": "CALL", "amount": 10, "uuid": "uuid2" }
+        ]
+    self.eq(("call", 10), self.mh.process_message("uuid1", self.__ask_msg(10, histories)))
+    self.eq(("fold", 0), self.mh.process_message("uuid2", self.__ask_msg(10, histories[:2])))
+
+  def test_late_player_is_not_asked_nor_notified_until_it_answers(self):
+    self.mh.set_action_deadline(0.01)
+    answers = []
+    def respond(message):
+      time.sleep(0.2)
+      answers.append(("raise", 20))
+      return answers[-1]
+    self.p1_algo.respond_to_ask.side_effect = respond
+    self.eq(("fold", 0), self.mh.process_message("uuid1", self.__ask_msg(10)))
+    self.mh.process_message(-1, { "type":"notification", "message":"hoge" })
+    self.eq(("fold", 0), self.mh.process_message("uuid1", self.__ask_msg(10)))
+    self.eq(1, self.p1_algo.respond_to_ask.call_count)
+    self.eq(0, self.p1_algo.receive_notification.call_count)
+    self.eq(1, self.p2_algo.receive_notification.call_count)
+    time.sleep(0.4)
+    self.eq(1, len(answers))
+    self.eq("hoge", self.p1_algo.receive_notification.call_args_list[0][0][0])
+    self.eq(2, self.mh.latency_histograms["uuid1"].timeouts)
+    self.p1_algo.respond_to_ask.side_effect = None
+    self.p1_algo.respond_to_ask.return_value = ("call", 10)
+    self.eq(("call", 10), self.mh.process_message("uuid1", self.__ask_msg(10)))
+
+  def test_process_message_with_deadline_raises_player_error(self):
+    self.mh.set_action_deadline(1)
+    self.p1_algo.respond_to_ask.side_effect = ValueError("hoge")
+    self.assertRaises(ValueError, self.mh.process_message, "uuid1", self.__ask_msg(10))
+
+  @raises(ValueError)
+  def test_set_unknown_default_action(self):
+    self.mh.set_action_deadline(1, "raise")
+
+  def __ask_msg(self, call_amount, histories=None):
+    valid_actions = [
+        { "action": "fold", "amount": 0 },
+        { "action": "call", "amount": call_amount },
+        { "action": "raise", "amount": { "min": 20, "max": 100 } }
+        ]
+    round_state = { "street": "preflop", "action_histories": { "preflop": histories or [] } }
+    return { "type":"ask", "message": { "valid_actions": valid_actions, "round_state": round_state } }
+
+  def __notification_msg(self, message_type):
+    return { "type":"notification", "message": { "message_type": message_type } }
+
+class SubscribingPlayer(BasePokerPlayer):
+
+  def __init__(self, subscribed_message_types):
+    self.subscribed_message_types = subscribed_message_types
+    self.received = []
+
+  def receive_notification(self, message):
+    self.received.append(message["message_type"])
@@ -1,6 +1,10 @@
+import random
+import time
+
 from tests.base_unittest import BaseUnitTest
 from mock import patch
 from pypokerengine.engine.dealer import Dealer
+from pypokerengine.engine.engine_stats import EngineStats
 from examples.players.fold_man import FoldMan
 from pypokerengine.engine.pay_info import PayInfo
 from pypokerengine.engine.table import Table
@@ -60,6 +64,60 @@ class DealerTest(BaseUnitTest):
     self.eq(95, player_state[0]["stack"])
     self.eq(105, player_state[1]["stack"])
 
+  def test_play_a_round_with_stats(self):
+    stats = EngineStats()
+    self.dealer.set_stats(stats)
+    algos = [FoldMan() for _ in range(2)]
+    [self.dealer.register_player(name, algo) for name, algo in zip(["hoge", "fuga"], algos)]
+    self.dealer.start_game(1)
+    self.eq(1, stats.rounds)
+    self.eq(1, stats.counts[EngineStats.START_ROUND])
+    self.eq(1, stats.counts[EngineStats.APPLY_ACTION])
+    self.eq(1, stats.counts[EngineStats.DECLARE_ACTION])
+    self.eq(1, stats.counts[EngineStats.SHOWDOWN])
+    self.eq(2, len(stats.player_counts))
+    self.eq(stats.counts[EngineStats.RECEIVE_MESSAGE],
+        sum([counts[EngineStats.RECEIVE_MESSAGE] for counts in stats.player_counts.values()]))
+
+  def test_play_a_round_with_subscriptions(self):
+    algos = [SubscribingMan(types) for types in [["round_result_message"], []]]
+    [self.dealer.register_player(name, algo) for name, algo in zip(["hoge", "fuga"], algos)]
+    self.dealer.table.dealer_btn = 1
+    summary = self.dealer.start_game(1)
+    self.eq(["receive_round_result_message"], algos[0].received_msgs)
+    self.eq([], algos[1].received_msgs)
+    player_state = summary["message"]["game_information"]["seats"]
+    self.eq(95, player_state[0]["stack"])
+    self.eq(105, player_state[1]["stack"])
+
+  def test_play_a_round_without_subscriptions(self):
+    algos = [SubscribingMan([]) for _ in range(2)]
+    [self.dealer.register_player(name, algo) for name, algo in zip(["hoge", "fuga"], algos)]
+    self.dealer.table.dealer_btn = 1
+    summary = self.dealer.start_game(2)
+    player_state = summary["message"]["game_information"]["seats"]
+    self.eq(100, player_state[0]["stack"])
+    self.eq(100, player_state[1]["stack"])
+
+  def test_play_game(self):
+    algos = [FoldMan() for _ in range(2)]
+    [self.dealer.register_player(name, algo) for name, algo in zip(["hoge", "fuga"], algos)]
+    self.dealer.table.dealer_btn = 1
+    uuids = [player.uuid for player in self.dealer.table.seats.players]
+    rounds = list(self.dealer.play_game(2))
+    self.eq([1, 2], [round_result["round_count"] for round_result in rounds])
+    self.eq([95, 105], [rounds[0]["stacks"][uuid] for uuid in uuids])
+    self.eq([uuids[1]], rounds[0]["winners"])
+    self.eq(15, rounds[0]["pot"])
+    self.eq([100, 100], [rounds[1]["stacks"][uuid] for uuid in uuids])
+
+  def test_play_game_stops_early(self):
+    algos = [RecordMan() for _ in range(2)]
+    [self.dealer.register_player(name, algo) for name, algo in zip(["hoge", "fuga"], algos)]
+    for round_result in self.dealer.play_game(10):
+      break
+    self.eq(1, algos[0].received_msgs.count("receive_round_start_message"))
+
   def test_play_two_round(self):
     algos = [FoldMan() for _ in range(2)]
     [self.dealer.register_player(name, algo) for name, algo in zip(["hoge", "fuga"], algos)]
@@ -69,6 +127,18 @@ class DealerTest(BaseUnitTest):
     self.eq(100, player_state[0]["stack"])
     self.eq(100, player_state[1]["stack"])
 
+  def test_big_blind_checks_its_option_after_deadline(self):
+    algos = [CallMan(), SlowMan()]
+    [self.dealer.register_player(name, algo) for name, algo in zip(["limper", "slow"], algos)]
+    self.dealer.table.dealer_btn = 1
+    self.dealer.set_action_deadline(0.02, "check")
+    self.dealer.start_game(1)
+    slow_uuid = self.dealer.table.seats.players[1].uuid
+    slow_actions = [action for action in algos[0].actions if action["player_uuid"] == slow_uuid]
+    self.eq({ "player_uuid": slow_uuid, "action": "call", "amount": 10 }, slow_actions[0])
+    self.eq(["call"], list(set([action["action"] for action in slow_actions])))
+    self.eq(4, self.dealer.get_latency_histograms()[slow_uuid].timeouts)
+
   def test_exclude_short_of_money_player(self):
     algos = [FoldMan() for _ in range(7)]
     [self.dealer.register_player("algo-%d" % idx, algo) for idx, algo in enumerate(algos)]
@@ -156,6 +226,16 @@ class DealerTest(BaseUnitTest):
     result = dealer.start_game(5)
     self.eq(fetch_stacks(result), [58, 109, 133])
 
+  def test_same_rng_seed_plays_same_game(self):
+    def play(seed):
+      dealer = Dealer(5, 100, rng=random.Random(seed))
+      algos = [HoleCardMan() for _ in range(2)]
+      [dealer.register_player(name, algo) for name, algo in zip(["hoge", "fuga"], algos)]
+      dealer.start_game(2)
+      return [player.uuid for player in dealer.table.seats.players], [algo.hole_cards for algo in algos]
+    self.eq(play(1), play(1))
+    self.neq(play(1), play(2))
+
 class RecordMan(FoldMan):
 
   def __init__(self):
@@ -180,3 +260,37 @@ class RecordMan(FoldMan):
   def receive_round_result_message(self, winners, hand_info, round_state):
     self.received_msgs.append("receive_round_result_message")
 
+
+class HoleCardMan(FoldMan):
+
+  def __init__(self):
+    self.hole_cards = []
+
+  def receive_round_start_message(self, round_count, hole_card, seats):
+    self.hole_cards.append(hole_card)
+
+class SubscribingMan(RecordMan):
+
+  def __init__(self, subscribed_message_types):
+    RecordMan.__init__(self)
+    self.subscribed_message_types = subscribed_message_types
+
+  def declare_action(self, valid_actions, hole_card, round_state):
+    return 'fold', 0
+
+class CallMan(FoldMan):
+
+  def __init__(self):
+    self.actions = []
+
+  def declare_action(self, valid_actions, hole_card, round_state):
+    return 'call', valid_actions[1]['amount']
+
+  def receive_game_update_message(self, new_action, round_state):
+    self.actions.append(new_action)
+
+class SlowMan(CallMan):
+
+  def declare_action(self, valid_actions, hole_card, round_state):
+    time.sleep(1)
+    return 'raise', valid_actions[2]['amount']['min']
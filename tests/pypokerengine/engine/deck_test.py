@@ -1,3 +1,5 @@
+import random
+
 from tests.base_unittest import BaseUnitTest
 from pypokerengine.engine.card import Card
 from pypokerengine.engine.deck import Deck
@@ -22,6 +24,13 @@ class DeckTest(BaseUnitTest):
     self.deck.restore()
     self.eq(52, self.deck.size())
 
+  def test_shuffle_with_rng(self):
+    other = Deck()
+    self.deck.shuffle(random.Random(1))
+    other.shuffle(random.Random(1))
+    self.eq(other.serialize(), self.deck.serialize())
+    self.neq(Deck().serialize(), self.deck.serialize())
+
   def test_serialization(self):
     self.deck.draw_cards(5)
     self.deck.shuffle()
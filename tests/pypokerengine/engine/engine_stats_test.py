@@ -0,0 +1,35 @@
+from tests.base_unittest import BaseUnitTest
+from pypokerengine.engine.engine_stats import EngineStats, timed_call
+
+class EngineStatsTest(BaseUnitTest):
+
+  def setUp(self):
+    self.records = []
+    self.stats = EngineStats(callback=self.records.append, callback_interval=2)
+
+  def test_add(self):
+    self.stats.add(EngineStats.APPLY_ACTION, 1.5)
+    self.stats.add(EngineStats.DECLARE_ACTION, 2.0, "uuid-1")
+    self.stats.add(EngineStats.DECLARE_ACTION, 1.0, "uuid-1")
+    self.eq(1, self.stats.counts[EngineStats.APPLY_ACTION])
+    self.eq(2, self.stats.counts[EngineStats.DECLARE_ACTION])
+    self.eq(1.5, self.stats.engine_seconds())
+    self.eq(3.0, self.stats.player_seconds_total())
+    self.eq(2, self.stats.player_counts["uuid-1"][EngineStats.DECLARE_ACTION])
+    self.eq(3.0, self.stats.player_seconds["uuid-1"][EngineStats.DECLARE_ACTION])
+
+  def test_callback_is_called_every_interval(self):
+    self.stats.add(EngineStats.SHOWDOWN, 0.5)
+    self.stats.round_finished()
+    self.eq(0, len(self.records))
+    self.stats.round_finished()
+    self.eq(1, len(self.records))
+    self.eq(2, self.records[0]["rounds"])
+    self.eq({ "count": 1, "seconds": 0.5 }, self.records[0]["categories"][EngineStats.SHOWDOWN])
+
+  def test_timed_call(self):
+    ticks = iter([1.0, 3.5])
+    stats = EngineStats(clock=lambda: next(ticks))
+    self.eq(3, timed_call(stats, EngineStats.DECLARE_ACTION, "uuid-1", max, 1, 3))
+    self.eq(2.5, stats.player_seconds["uuid-1"][EngineStats.DECLARE_ACTION])
+    self.eq(3, timed_call(None, EngineStats.DECLARE_ACTION, "uuid-1", max, 1, 3))
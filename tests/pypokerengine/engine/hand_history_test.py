@@ -0,0 +1,96 @@
+import os
+import random
+import shutil
+import tempfile
+
+from nose.tools import raises
+from tests.base_unittest import BaseUnitTest
+from pypokerengine.engine.dealer import Dealer
+from pypokerengine.engine.hand_history import HandHistory, HandHistoryWriter, HandHistoryReader
+from examples.players.fold_man import FoldMan
+from examples.players.random_player import RandomPlayer
+
+class HandHistoryTest(BaseUnitTest):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.file_path = os.path.join(self.tmp_dir, "hands.bin")
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def test_encode_decode(self):
+    hand = self.__sample_hand(3)
+    encoded = HandHistory.encode(hand)
+    self.eq(len(encoded) - HandHistory.LENGTH.size, HandHistory.LENGTH.unpack_from(encoded)[0])
+    self.eq(hand, HandHistory.decode(encoded, HandHistory.LENGTH.size))
+
+  def test_write_and_read(self):
+    hands = [self.__sample_hand(round_count) for round_count in range(1, 6)]
+    with HandHistoryWriter(self.file_path) as writer:
+      [writer.write(hand) for hand in hands[:3]]
+    with HandHistoryWriter(self.file_path) as writer:
+      [writer.write(hand) for hand in hands[3:]]
+    with HandHistoryReader(self.file_path) as reader:
+      self.eq(5, len(reader))
+      self.eq(hands, list(reader))
+      self.eq(hands[3], reader[3])
+      self.eq(hands[-1], reader[-1])
+
+  def test_read_ignores_truncated_record(self):
+    with HandHistoryWriter(self.file_path) as writer:
+      [writer.write(self.__sample_hand(round_count)) for round_count in range(1, 3)]
+    with open(self.file_path, "ab") as f:
+      f.write(HandHistory.encode(self.__sample_hand(3))[:-4])
+    with HandHistoryReader(self.file_path) as reader:
+      self.eq(2, len(reader))
+
+  @raises(ValueError)
+  def test_read_unknown_file(self):
+    with open(self.file_path, "wb") as f:
+      f.write(b"hoge")
+    HandHistoryReader(self.file_path)
+
+  def test_record_dealer_game(self):
+    dealer = Dealer(5, 100, rng=random.Random(1))
+    algos = [FoldMan(), RandomPlayer(rng=random.Random(2)), RandomPlayer(rng=random.Random(3))]
+    [dealer.register_player(name, algo) for name, algo in zip(["hoge", "fuga", "bar"], algos)]
+    with HandHistoryWriter(self.file_path) as writer:
+      dealer.set_hand_history(writer)
+      rounds = list(dealer.play_game(5))
+    with HandHistoryReader(self.file_path) as reader:
+      hands = list(reader)
+    self.eq(len(rounds), len(hands))
+    for round_result, hand in zip(rounds, hands):
+      uuids = [seat["uuid"] for seat in hand["seats"]]
+      self.eq(round_result["round_count"], hand["round_count"])
+      self.eq(list(round_result["stacks"].values()), [seat["end_stack"] for seat in hand["seats"]])
+      self.eq(round_result["pot"], hand["pot"])
+      self.eq(round_result["winners"], [uuids[seat] for seat in hand["winners"]])
+      self.eq(sum([seat["stack"] for seat in hand["seats"]]), sum([seat["end_stack"] for seat in hand["seats"]]))
+      self.true(len(hand["board"]) in [0, 3, 4, 5])
+    for hand, next_hand in zip(hands, hands[1:]):
+      self.eq([seat["end_stack"] for seat in hand["seats"]], [seat["stack"] for seat in next_hand["seats"]])
+
+  def __sample_hand(self, round_count):
+    return {
+        "round_count": round_count,
+        "small_blind_amount": 5,
+        "ante": 1,
+        "dealer_btn": 2,
+        "sb_pos": 0,
+        "bb_pos": 1,
+        "seats": [
+          { "uuid": "uuid-0", "stack": 100, "end_stack": 94, "hole_card": [1, 52] },
+          { "uuid": "uuid-1", "stack": 100, "end_stack": 117, "hole_card": [13, 14] },
+          { "uuid": "uuid-2", "stack": 0, "end_stack": 0, "hole_card": [] }
+          ],
+        "actions": [
+          { "street": 0, "seat": 0, "action": "raise", "amount": 20 },
+          { "street": 0, "seat": 1, "action": "call", "amount": 20 },
+          { "street": 1, "seat": 0, "action": "fold", "amount": 0 }
+          ],
+        "board": [2, 3, 4],
+        "pot": 42,
+        "winners": [1]
+        }
@@ -0,0 +1,24 @@
+from tests.base_unittest import BaseUnitTest
+from pypokerengine.engine.latency_histogram import LatencyHistogram
+
+class LatencyHistogramTest(BaseUnitTest):
+
+  def setUp(self):
+    self.histogram = LatencyHistogram(bounds=[0.01, 0.1, 1.0])
+
+  def test_add(self):
+    for seconds in [0.005, 0.05, 0.05, 5.0]:
+      self.histogram.add(seconds)
+    self.histogram.add(0.5, timed_out=True)
+    self.eq([1, 2, 1, 1], self.histogram.bucket_counts)
+    self.eq(5, self.histogram.count)
+    self.eq(5.0, self.histogram.max)
+    self.eq(1, self.histogram.timeouts)
+    self.assertAlmostEqual(1.121, self.histogram.mean())
+
+  def test_percentile(self):
+    for seconds in [0.005, 0.05, 0.05, 0.5]:
+      self.histogram.add(seconds)
+    self.eq(0.1, self.histogram.percentile(50))
+    self.eq(0.5, self.histogram.percentile(99))
+    self.eq(0.0, LatencyHistogram().percentile(50))
@@ -1,7 +1,11 @@
+import random
+
+from nose.tools import raises
 from tests.base_unittest import BaseUnitTest
 from mock import patch
 from pypokerengine.engine.round_manager import RoundManager
 from pypokerengine.engine.game_evaluator import GameEvaluator
+from pypokerengine.engine.action_checker import ActionChecker
 from pypokerengine.engine.poker_constants import PokerConstants as Const
 from pypokerengine.engine.player import Player
 from pypokerengine.engine.pay_info import PayInfo
@@ -69,6 +73,23 @@ class RoundManagerTest(BaseUnitTest):
       self.eq((-1, "fuga"), msgs[3])
       self.eq(("uuid2", "bar"), msgs[4])
 
+  def test_message_after_start_round_with_message_types(self):
+    with patch('pypokerengine.engine.message_builder.MessageBuilder.build_round_start_message', return_value="hoge") as round_start,\
+         patch('pypokerengine.engine.message_builder.MessageBuilder.build_street_start_message', return_value="fuga") as street_start,\
+         patch('pypokerengine.engine.message_builder.MessageBuilder.build_ask_message', return_value="bar"):
+      _, msgs = RoundManager.start_new_round(1, 5, 0, self.__setup_table(), message_types=[])
+      self.eq([("uuid2", "bar")], msgs)
+      self.false(round_start.called)
+      self.false(street_start.called)
+
+  def test_message_after_apply_action_with_message_types(self):
+    with patch('pypokerengine.engine.message_builder.MessageBuilder.build_game_update_message', return_value="boo") as update:
+      state, _ = self.__start_round()
+      _, msgs  = RoundManager.apply_action(state, "call", 10, message_types=["street_start_message"])
+      self.eq(1, len(msgs))
+      self.eq("ask_message", msgs[0][1]["message"]["message_type"])
+      self.false(update.called)
+
   def test_state_after_start_round(self):
     state, msgs = self.__start_round()
     self.eq(2, state["next_player"])
@@ -363,6 +384,65 @@ class RoundManagerTest(BaseUnitTest):
     [check(key) for key in ["round_count", "small_blind_amount", "street", "next_player"]]
 
 
+  def test_apply_action_inplace_matches_apply_action(self):
+    rng = random.Random(1)
+    for _ in range(20):
+      state, _ = self.__start_round()
+      inplace_state, _ = self.__start_round()
+      undos, serials = [], []
+      while state["street"] != Const.Street.FINISHED:
+        serials.append(self.__serialize(inplace_state))
+        action, amount = self.__random_action(state, rng)
+        state, _ = RoundManager.apply_action(state, action, amount)
+        undos.append(RoundManager.apply_action_inplace(inplace_state, action, amount))
+        self.eq(self.__serialize(state), self.__serialize(inplace_state))
+        self.eq(state.get("round_result"), inplace_state.get("round_result"))
+      for undo, serial in reversed(list(zip(undos, serials))):
+        RoundManager.undo_action(inplace_state, undo)
+        self.eq(serial, self.__serialize(inplace_state))
+      self.false("round_result" in inplace_state)
+
+  @raises(ValueError)
+  def test_apply_action_inplace_when_round_finished(self):
+    state, _ = self.__start_round()
+    state["street"] = Const.Street.FINISHED
+    RoundManager.apply_action_inplace(state, "fold", 0)
+
+  def test_apply_action_inplace_without_runout(self):
+    state, _ = self.__start_round()
+    serial = self.__serialize(state)
+    undos = [RoundManager.apply_action_inplace(state, "raise", 100, deal_runout=False)]
+    self.false(RoundManager.is_runout(state))
+    undos.append(RoundManager.apply_action_inplace(state, "call", 100, deal_runout=False))
+    self.false(RoundManager.is_runout(state))
+    undos.append(RoundManager.apply_action_inplace(state, "fold", 0, deal_runout=False))
+    self.true(RoundManager.is_runout(state))
+    self.eq(Const.Street.FLOP, state["street"])
+    self.eq(0, len(state["table"].get_community_card()))
+    self.eq(2, len([p for p in state["table"].seats.players if p.pay_info.status == PayInfo.ALLIN]))
+    for undo in reversed(undos):
+      RoundManager.undo_action(state, undo)
+    self.eq(serial, self.__serialize(state))
+
+  def test_apply_action_inplace_deals_runout(self):
+    state, _ = self.__start_round()
+    for action, amount in [("raise", 100), ("call", 100), ("fold", 0)]:
+      RoundManager.apply_action_inplace(state, action, amount)
+    self.eq(Const.Street.FINISHED, state["street"])
+    self.eq(5, len(state["round_result"]["community_card"]))
+
+  def __random_action(self, state, rng):
+    valid_actions = ActionChecker.legal_actions(state["table"].seats.players, state["next_player"], state["small_blind_amount"])
+    action = rng.choice(valid_actions)
+    if action["action"] == "raise":
+      if action["amount"]["max"] == -1: return "call", valid_actions[1]["amount"]
+      return "raise", rng.choice([action["amount"]["min"], action["amount"]["max"]])
+    return action["action"], action["amount"]
+
+  def __serialize(self, state):
+    return [state["street"], state["next_player"], state["table"].serialize(),
+        [player.round_action_histories for player in state["table"].seats.players]]
+
   def __start_round(self):
     table = self.__setup_table()
     round_count = 1
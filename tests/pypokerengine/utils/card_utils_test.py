@@ -1,3 +1,4 @@
+import random
 import pypokerengine.utils.card_utils as U
 
 from mock import patch
@@ -19,17 +20,22 @@ class CardUtilsTest(BaseUnitTest):
         mock_return = community + [Card.from_str("D7")]
         with patch('pypokerengine.utils.card_utils._fill_community_card', side_effect=[mock_return]):
             U._montecarlo_simulation(3, my_cards, community)
-            U._fill_community_card.assert_called_with(community, used_card=my_cards+community)
+            U._fill_community_card.assert_called_with(community, used_card=my_cards+community, rng=None)
 
         mock_return = [U.gen_cards(a) for a in [["D7"], ["DK", "HK", "H8", "SA"]]]
         with patch('pypokerengine.utils.card_utils._pick_unused_card', side_effect=mock_return):
             self.eq(1, U._montecarlo_simulation(3, my_cards, community))
-            U._pick_unused_card.assert_called_with(4, Any(list))
+            U._pick_unused_card.assert_called_with(4, Any(list), None)
 
         mock_return = [U.gen_cards(a) for a in [["S7"], ["DK", "HK", "H8", "SA"]]]
         with patch('pypokerengine.utils.card_utils._pick_unused_card', side_effect=mock_return):
             self.eq(0, U._montecarlo_simulation(3, my_cards, community))
-            U._pick_unused_card.assert_called_with(4, Any(list))
+            U._pick_unused_card.assert_called_with(4, Any(list), None)
+
+    def test_estimate_hole_card_win_rate_with_rng(self):
+        hole_card = U.gen_cards(["D6", "D2"])
+        rates = [U.estimate_hole_card_win_rate(50, 3, hole_card, rng=random.Random(7)) for _ in range(2)]
+        self.eq(rates[0], rates[1])
 
     def test_gen_deck(self):
         deck = U.gen_deck()
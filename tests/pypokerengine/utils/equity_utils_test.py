@@ -0,0 +1,90 @@
+from tests.base_unittest import BaseUnitTest
+from pypokerengine.utils.equity_utils import StreetEndEvaluator
+from pypokerengine.utils.card_utils import gen_cards
+from pypokerengine.engine.game_evaluator import GameEvaluator
+from pypokerengine.engine.poker_constants import PokerConstants as Const
+from pypokerengine.engine.pay_info import PayInfo
+from pypokerengine.engine.player import Player
+from pypokerengine.engine.table import Table
+from pypokerengine.engine.card import Card
+from pypokerengine.engine.deck import Deck
+
+class StreetEndEvaluatorTest(BaseUnitTest):
+
+    def test_complete_board_is_scored_by_showdown(self):
+        game_state = self.__setup_state(Const.Street.RIVER, ["D2", "C5", "H9", "SJ", "D7"], [
+            (["SA", "HA"], 50, 50, PayInfo.PAY_TILL_END),
+            (["SK", "HK"], 50, 50, PayInfo.PAY_TILL_END)
+            ])
+        self.eq([150, 50], StreetEndEvaluator().expected_stacks(game_state))
+
+    def test_runout_is_enumerated(self):
+        game_state = self.__setup_state(Const.Street.RIVER, ["D2", "C5", "H9", "SJ"], [
+            (["SA", "HA"], 0, 100, PayInfo.ALLIN),
+            (["S9", "HJ"], 20, 100, PayInfo.PAY_TILL_END)
+            ])
+        expected = [0, 0]
+        deck_ids = [card.to_id() for card in game_state["table"].deck.deck]
+        for cid in deck_ids:
+            table = Table.deserialize(game_state["table"].serialize())
+            table.add_community_card(Card.from_id(cid))
+            _winners, _hand_info, prize_map = GameEvaluator.judge(table)
+            for idx, prize in prize_map.items():
+                expected[idx] += 1.0 * prize / len(deck_ids)
+        stacks = StreetEndEvaluator(nb_sample=44).expected_stacks(game_state)
+        self.eq(44, len(deck_ids))
+        self.assertAlmostEqual(expected[0], stacks[0])
+        self.assertAlmostEqual(20 + expected[1], stacks[1])
+        self.assertAlmostEqual(220, sum(stacks))
+
+    def test_side_pot(self):
+        game_state = self.__setup_state(Const.Street.RIVER, ["D2", "C5", "H9", "SJ", "D7"], [
+            (["SA", "HA"], 0, 30, PayInfo.ALLIN),
+            (["SK", "HK"], 10, 100, PayInfo.PAY_TILL_END),
+            (["SQ", "HQ"], 40, 100, PayInfo.PAY_TILL_END),
+            (["S3", "H4"], 90, 10, PayInfo.FOLDED)
+            ])
+        self.eq([100, 10 + 140, 40, 90], StreetEndEvaluator().expected_stacks(game_state))
+
+    def test_finished_round(self):
+        game_state = self.__setup_state(Const.Street.FINISHED, [], [
+            (["SA", "HA"], 120, 0, PayInfo.PAY_TILL_END),
+            (["SK", "HK"], 80, 0, PayInfo.PAY_TILL_END)
+            ])
+        self.eq([120, 80], StreetEndEvaluator().expected_stacks(game_state))
+
+    def test_sampled_runouts_only_depend_on_position(self):
+        game_state = self.__setup_state(Const.Street.FLOP, ["D2", "C5", "H9"], [
+            (["SA", "HA"], 0, 100, PayInfo.ALLIN),
+            (["S9", "HJ"], 0, 100, PayInfo.ALLIN)
+            ])
+        evaluator = StreetEndEvaluator(nb_sample=10)
+        stacks = evaluator.expected_stacks(game_state)
+        self.eq(stacks, evaluator.expected_stacks(game_state))
+        self.eq(stacks, StreetEndEvaluator(nb_sample=10).expected_stacks(game_state))
+        self.eq(1, len(evaluator.cache))
+        self.eq(10, len(evaluator.cache.popitem()[1]))
+        self.assertAlmostEqual(200, sum(stacks))
+
+    def test_cache_size(self):
+        evaluator = StreetEndEvaluator(cache_size=1)
+        for board in [["D2", "C5", "H9", "SJ", "D7"], ["D2", "C5", "H9", "SJ", "D8"]]:
+            evaluator.expected_stacks(self.__setup_state(Const.Street.RIVER, board, [
+                (["SA", "HA"], 50, 50, PayInfo.PAY_TILL_END),
+                (["SK", "HK"], 50, 50, PayInfo.PAY_TILL_END)
+                ]))
+            self.eq(1, len(evaluator.cache))
+
+    def __setup_state(self, street, community_card, seats):
+        used_ids = [card.to_id() for card in gen_cards(community_card)]
+        table = Table()
+        for idx, (hole_card, stack, amount, status) in enumerate(seats):
+            player = Player("uuid%d" % idx, stack)
+            player.add_holecard(gen_cards(hole_card))
+            player.pay_info.amount, player.pay_info.status = amount, status
+            table.seats.sitdown(player)
+            used_ids += [card.to_id() for card in player.hole_card]
+        for card in gen_cards(community_card):
+            table.add_community_card(card)
+        table.deck = Deck(deck_ids=[cid for cid in range(1, 53) if cid not in used_ids])
+        return { "round_count": 1, "small_blind_amount": 5, "street": street, "next_player": 0, "table": table }
@@ -1,9 +1,22 @@
+import os
+import random
+import shutil
+import tempfile
+
 from nose.tools import raises
 from tests.base_unittest import BaseUnitTest
 from pypokerengine.utils.game_state_utils import restore_game_state,\
         attach_hole_card, replace_community_card,\
-        attach_hole_card_from_deck, replace_community_card_from_deck
+        attach_hole_card_from_deck, replace_community_card_from_deck,\
+        replay_game_state, iter_decision_points,\
+        attach_hole_cards, gen_hole_card_attached_states
 from pypokerengine.engine.card import Card
+from pypokerengine.utils.card_utils import gen_cards
+from pypokerengine.engine.pay_info import PayInfo
+from pypokerengine.engine.dealer import Dealer
+from pypokerengine.engine.data_encoder import DataEncoder
+from pypokerengine.engine.hand_history import HandHistoryWriter, HandHistoryReader
+from examples.players.random_player import RandomPlayer
 from pypokerengine.engine.poker_constants import PokerConstants as Const
 
 class GameStateUtils(BaseUnitTest):
@@ -16,6 +29,44 @@ class GameStateUtils(BaseUnitTest):
         self.eq(44, processed2["table"].deck.size())
         self.eq(48, game_state["table"].deck.size())
 
+    def test_attach_hole_cards(self):
+        game_state = restore_game_state(ThreePlayerGameStateSample.round_state)
+        known = gen_cards(["SA", "HA"])
+        processed = attach_hole_cards(game_state, { "sqmfwdkpcoagzqxpxnmxwm": known }, random.Random(1))
+        players = processed["table"].seats.players
+        self.eq(known, players[1].hole_card)
+        self.eq([2, 2, 2], [len(player.hole_card) for player in players])
+        dealt = [card.to_id() for player in players for card in player.hole_card]
+        deck = [card.to_id() for card in processed["table"].deck.deck]
+        self.eq(6, len(set(dealt)))
+        self.eq(52 - 4 - 6, len(deck))
+        self.false(any([cid in deck for cid in dealt]))
+        self.eq(0, len(game_state["table"].seats.players[0].hole_card))
+        self.eq(48, game_state["table"].deck.size())
+
+    def test_attach_hole_cards_without_rng_draws_like_attach_hole_card_from_deck(self):
+        game_state = restore_game_state(TwoPlayerSample.round_state)
+        expected = attach_hole_card_from_deck(game_state, "tojrbxmkuzrarnniosuhct")
+        expected = attach_hole_card_from_deck(expected, "pwtwlmfciymjdoljkhagxa")
+        processed = attach_hole_cards(game_state, {})
+        self.eq(expected["table"].serialize(), processed["table"].serialize())
+
+    @raises(Exception)
+    def test_attach_hole_cards_to_unknown_player(self):
+        game_state = restore_game_state(TwoPlayerSample.round_state)
+        attach_hole_cards(game_state, { "hoge": gen_cards(["SA", "HA"]) })
+
+    def test_gen_hole_card_attached_states(self):
+        game_state = restore_game_state(TwoPlayerSample.round_state)
+        known = { "tojrbxmkuzrarnniosuhct": gen_cards(["SA", "HA"]) }
+        states = gen_hole_card_attached_states(game_state, known, 10, random.Random(1))
+        self.eq(10, len(states))
+        opponent_cards = [tuple(str(card) for card in state["table"].seats.players[1].hole_card) for state in states]
+        self.true(len(set(opponent_cards)) > 1)
+        self.true(all([state["table"].seats.players[0].hole_card == known["tojrbxmkuzrarnniosuhct"] for state in states]))
+        again = gen_hole_card_attached_states(game_state, known, 10, random.Random(1))
+        self.eq([state["table"].serialize() for state in states], [state["table"].serialize() for state in again])
+
     def test_replace_community_card_from_deck(self):
         origianl = restore_game_state(TwoPlayerSample.round_state)
 
@@ -132,6 +183,79 @@ class GameStateUtils(BaseUnitTest):
         for card in exclude_cards:
             self.assertNotIn(card, deck.deck)
 
+    def test_restore_game_state_twice_returns_independent_states(self):
+        first = restore_game_state(TwoPlayerSample.round_state)
+        first["table"].seats.players[0].action_histories.append("hoge")
+        first["table"].seats.players[0].round_action_histories[Const.Street.PREFLOP].append("hoge")
+        first["table"].seats.players[0].pay_info.update_by_pay(10)
+        first["table"].deck.draw_card()
+        second = restore_game_state(TwoPlayerSample.round_state)
+        self.eq(restore_game_state(ThreePlayerGameStateSample.round_state)["table"].serialize(),
+                restore_game_state(ThreePlayerGameStateSample.round_state)["table"].serialize())
+        player = second["table"].seats.players[0]
+        self.eq(TwoPlayerSample.p1_action_histories, player.action_histories)
+        self.eq(TwoPlayerSample.p1_round_action_histories, player.round_action_histories)
+        self.eq([35, PayInfo.PAY_TILL_END], player.pay_info.serialize())
+        self.eq(48, second["table"].deck.size())
+
+    def test_iter_decision_points(self):
+        round_states, hands = self.__play_recorded_game()
+        replayed = [(hand["round_count"], idx, self.__encode(game_state))
+                for hand, idx, game_state in iter_decision_points(hands)]
+        self.eq(len(round_states), len(replayed))
+        for round_state, (round_count, _idx, replayed_state) in zip(round_states, replayed):
+            self.eq(round_state["round_count"], round_count)
+            self.eq(self.__without_names(round_state), replayed_state)
+
+    def test_replay_game_state(self):
+        round_states, hands = self.__play_recorded_game()
+        hand = max(hands, key=lambda hand: len(hand["actions"]))
+        decisions = [state for state in round_states if state["round_count"] == hand["round_count"]]
+        action_index = len(hand["actions"]) - 1
+        self.eq(self.__without_names(decisions[action_index]), self.__encode(replay_game_state(hand, action_index)))
+        game_state = replay_game_state(hand)
+        self.eq(Const.Street.FINISHED, game_state["street"])
+        self.eq([seat["end_stack"] for seat in hand["seats"]], [p.stack for p in game_state["table"].seats.players])
+
+    @raises(ValueError)
+    def test_replay_game_state_when_action_mismatch(self):
+        _round_states, hands = self.__play_recorded_game()
+        hands[0]["actions"][0]["seat"] = (hands[0]["actions"][0]["seat"] + 1) % len(hands[0]["seats"])
+        replay_game_state(hands[0])
+
+    def __play_recorded_game(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(tmp_dir, "hands.bin")
+            round_states = []
+            dealer = Dealer(5, 100, 1, rng=random.Random(1))
+            for idx in range(3):
+                dealer.register_player("p%d" % idx, RecordingPlayer(round_states, random.Random(idx)))
+            with HandHistoryWriter(file_path) as writer:
+                dealer.set_hand_history(writer)
+                dealer.start_game(5)
+            with HandHistoryReader(file_path) as reader:
+                return round_states, list(reader)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def __encode(self, game_state):
+        return self.__without_names(DataEncoder.encode_round_state(game_state))
+
+    def __without_names(self, round_state):
+        seats = [dict((k, v) for k, v in seat.items() if k != "name") for seat in round_state["seats"]]
+        return dict(round_state, seats=seats)
+
+class RecordingPlayer(RandomPlayer):
+
+    def __init__(self, round_states, rng):
+        RandomPlayer.__init__(self, rng)
+        self.round_states = round_states
+
+    def declare_action(self, valid_actions, hole_card, round_state):
+        self.round_states.append(round_state)
+        return RandomPlayer.declare_action(self, valid_actions, hole_card, round_state)
+
 class TwoPlayerSample:
     valid_actions = [{'action': 'fold', 'amount': 0}, {'action': 'call', 'amount': 15}, {'action': 'raise', 'amount': {'max': 80, 'min': 30}}]
     hole_card = ['CA', 'S3']
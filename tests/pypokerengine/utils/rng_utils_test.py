@@ -0,0 +1,20 @@
+from tests.base_unittest import BaseUnitTest
+from pypokerengine.utils.rng_utils import derive_seed, make_rng
+
+class RngUtilsTest(BaseUnitTest):
+
+    def test_derive_seed_is_deterministic(self):
+        self.eq(derive_seed(42, "worker", 3), derive_seed(42, "worker", 3))
+
+    def test_derive_seed_depends_on_every_key(self):
+        seeds = [derive_seed(42), derive_seed(43), derive_seed(42, 0), derive_seed(42, 1), derive_seed(42, 0, 1)]
+        self.eq(len(seeds), len(set(seeds)))
+
+    def test_derive_seed_range(self):
+        seed = derive_seed(None, "game", 10)
+        self.true(0 <= seed < 2**64)
+
+
+    def test_make_rng(self):
+        self.eq(make_rng(42, "dealer").random(), make_rng(42, "dealer").random())
+        self.neq(make_rng(42, "dealer").random(), make_rng(42, "player").random())